@@ -1,10 +1,18 @@
 from typing import Tuple
 
-from flask import Blueprint, Response, jsonify
+import psycopg2
+from flask import Blueprint, Response, jsonify, request
 
 from auth_utils import role_required
-from db import get_db_cursor
+from book_availability import rebuild_book_availability, verify_book_availability
+from book_similarity import SimilarityUnavailable, refresh_book_similarity
+from catalog_cache import get_catalog_cache
+from catalog_import import import_catalog
+from db import get_db_cursor, get_pool, get_replica_router, prepared_statement_stats
+from parse_utils import ParseError
+from popular_books import get_popular_books
 from response_utils import error_response
+from suggest_index import get_suggest_index
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -69,3 +77,135 @@ def get_stats() -> Tuple[Response, int]:
         ),
         200,
     )
+
+
+@admin_bp.get("/admin/db/stats")
+@role_required("admin")
+def get_db_stats() -> Tuple[Response, int]:
+    """
+    GET /api/admin/db/stats
+    Admin-only endpoint.
+
+    Returns connection pool and prepared statement counters of the serving process:
+      - pool: size, idle, in_use, checkouts, timeouts, ...
+      - replicas: per-replica pool stats + health (empty list without replicas)
+      - prepared_statements: hits, misses, evictions, failures
+    """
+    router = get_replica_router()
+    replicas = []
+    if router is not None:
+        for pool, healthy in zip(router.pools, router.healthy()):
+            replicas.append({**pool.stats(), "healthy": healthy})
+
+    return (
+        jsonify(
+            {
+                "pool": get_pool().stats(),
+                "replicas": replicas,
+                "prepared_statements": prepared_statement_stats(),
+            }
+        ),
+        200,
+    )
+
+
+@admin_bp.get("/admin/cache/stats")
+@role_required("admin")
+def get_cache_stats() -> Tuple[Response, int]:
+    """
+    GET /api/admin/cache/stats
+    Admin-only: counters of this process's catalog response cache
+    (size, hits, misses, evictions, expirations, invalidations, stale_puts)
+    and of the typeahead index (books, keys, age_s, refresh_s) and the popular
+    books leaderboards (leaderboards, loads, oldest_age_s, refresh_s).
+    """
+    return (
+        jsonify(
+            {
+                "catalog": get_catalog_cache().stats(),
+                "suggest": get_suggest_index().stats(),
+                "popular": get_popular_books().stats(),
+            }
+        ),
+        200,
+    )
+
+
+@admin_bp.get("/admin/book-availability/verify")
+@role_required("admin")
+def verify_availability() -> Tuple[Response, int]:
+    """
+    GET /api/admin/book-availability/verify
+    Admin-only: compare book_availability with a recount from Item / Loan.
+    Returns: { "consistent": <bool>, "mismatches": [ {book_id, library_id,
+      expected_total_items, expected_loaned_items, stored_total_items, stored_loaned_items} ] }
+    """
+    try:
+        mismatches = verify_book_availability()
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    return jsonify({"consistent": not mismatches, "mismatches": mismatches}), 200
+
+
+@admin_bp.post("/admin/book-availability/rebuild")
+@role_required("admin")
+def rebuild_availability() -> Tuple[Response, int]:
+    """
+    POST /api/admin/book-availability/rebuild
+    Admin-only: recompute book_availability from Item / Loan.
+    Returns: { "rows": <int> } (number of corrected (book, library) rows)
+    """
+    try:
+        rows = rebuild_book_availability()
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    return jsonify({"rows": rows}), 200
+
+
+@admin_bp.post("/admin/similar-books/refresh")
+@role_required("admin")
+def refresh_similar_books() -> Tuple[Response, int]:
+    """
+    POST /api/admin/similar-books/refresh?full=true
+    Admin-only: recompute the "readers also borrowed" neighbours (book_similarity.py),
+    only for books affected by loans since the last refresh unless full=true.
+    Returns: { "mode": "full"|"incremental", "last_loan_id", "books", "rows" }
+    """
+    full = (request.args.get("full") or "").strip().lower() in ("1", "true", "yes")
+    try:
+        result = refresh_book_similarity(full=full)
+    except SimilarityUnavailable as e:
+        return error_response("similarity_unavailable", str(e), status=503)
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    return jsonify(result), 200
+
+
+@admin_bp.post("/admin/catalog/import")
+@role_required("admin")
+def import_catalog_feed() -> Tuple[Response, int]:
+    """
+    POST /api/admin/catalog/import?format=csv|ndjson
+    Admin-only: stream a CSV / NDJSON feed (the request body) into Book / Item,
+    see catalog_import.py. format defaults to ndjson for an application/x-ndjson
+    body, otherwise csv.
+    Returns: { "rows", "books_inserted", "books_updated", "items_inserted",
+      "items_updated", "rejected": { <reason>: <count> } }
+    """
+    fmt = request.args.get("format") or (
+        "ndjson" if request.mimetype in ("application/x-ndjson", "application/jsonl") else "csv"
+    )
+    try:
+        result = import_catalog(request.stream, fmt)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+    except psycopg2.DataError:
+        # Unparseable rows are rejected per row; this is a value COPY still refused
+        return error_response("invalid_import_file", "Malformed import file.", status=400)
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    return jsonify(result), 200
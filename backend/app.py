@@ -2,19 +2,27 @@ import logging
 import os
 import uuid
 from datetime import timedelta
+from functools import lru_cache
 
 from dotenv import load_dotenv
-from flask import Flask, current_app, g, jsonify, request, send_from_directory
+from flask import Flask, current_app, g, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from werkzeug.exceptions import HTTPException
 
+import compression
+import db
 from admin_routes import admin_bp
 from auth_routes import auth_bp
+from book_availability import availability_cli
 from book_routes import book_bp
+from book_similarity import similarity_cli
+from catalog_import import catalog_cli
+from json_provider import FastJSONProvider
 from loan_routes import loan_bp
 from reservation_routes import reservation_bp
 from response_utils import error_response
+from suggest_index import preload_suggest_index
 from user_routes import user_bp
 
 jwt = JWTManager()
@@ -27,6 +35,8 @@ def create_app() -> Flask:
     load_dotenv()
 
     app = Flask(__name__)
+    # jsonify / error_response / request.get_json (orjson, native date & Decimal)
+    app.json = FastJSONProvider(app)
 
     # Secrets / JWT configuration (override via environment variables)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
@@ -46,6 +56,8 @@ def create_app() -> Flask:
         app,
         resources={r"/api/*": {"origins": cors_origins, "supports_credentials": False}},
     )
+    # Kept for the ASGI entry point (asgi.py), which answers some routes itself
+    app.config["CORS_ORIGINS"] = cors_origins
 
     # Initialize JWT
     jwt.init_app(app)
@@ -60,6 +72,10 @@ def create_app() -> Flask:
         blocklist = current_app.config.get("JWT_BLOCKLIST")
         return jti in blocklist if jti and isinstance(blocklist, set) else False
 
+    # Response compression (Accept-Encoding); registered first so it runs after
+    # every other after_request hook, on the final body and headers
+    compression.init_app(app)
+
     # Request ID middleware (helps correlate logs with responses)
     @app.before_request
     def _attach_request_id():
@@ -70,20 +86,36 @@ def create_app() -> Flask:
     def _inject_response_headers(resp):
         if getattr(g, "request_id", None):
             resp.headers["X-Request-ID"] = g.request_id
+        # Runs after db's commit hook, so commit time is included
+        db_stats = db.request_db_stats()
+        if db_stats is not None:
+            resp.headers["Server-Timing"] = db_stats.server_timing()
         return resp
 
+    # Request-scoped DB session (one connection + transaction per request).
+    # Registered after the header hook so its commit runs first.
+    db.init_app(app)
+
     # Health check
     @app.get("/api/health")
     def health():
         return jsonify({"status": "ok"}), 200
 
-    # Optional: serve OpenAPI spec if present in project root
+    # Optional: serve OpenAPI spec if present in project root.
+    # Read and compressed once per process, not on every request.
+    @lru_cache(maxsize=1)
+    def _openapi_spec() -> compression.PrecompressedFile:
+        return compression.PrecompressedFile(
+            os.path.join(app.root_path, "openapi.yaml"), mimetype="text/yaml"
+        )
+
     @app.get("/api/openapi.yaml")
     def openapi_yaml():
         try:
-            return send_from_directory(directory=".", path="openapi.yaml", mimetype="text/yaml")
-        except Exception:
+            spec = _openapi_spec()
+        except OSError:
             return error_response("not_found", "OpenAPI spec not found.", status=404)
+        return spec.response()
 
     # JWT error handlers (unified JSON errors)
     @jwt.invalid_token_loader
@@ -137,6 +169,12 @@ def create_app() -> Flask:
     app.register_blueprint(user_bp, url_prefix="/api")
     app.register_blueprint(admin_bp, url_prefix="/api")
 
+    # Maintenance commands: flask --app app book-availability verify|rebuild,
+    # flask --app app catalog import FILE
+    app.cli.add_command(availability_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(similarity_cli)
+
     return app
 
 
@@ -144,4 +182,5 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     debug = os.getenv("FLASK_DEBUG", "1") == "1"
     app = create_app()
+    preload_suggest_index()
     app.run(debug=debug)
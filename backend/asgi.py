@@ -0,0 +1,231 @@
+"""
+ASGI entry point: native asyncio versions of the read-heavy GET endpoints,
+everything else delegated to the regular Flask app.
+
+Run with e.g.:
+    uvicorn asgi:app --workers 2
+
+Natively served (async_db / asyncpg, no worker thread blocked per query):
+  - GET /api/books, GET /api/books/<id> (same catalog cache, ETag / 304, Cache-Control)
+  - GET /api/users/<id>/loans, GET /api/loans/overdue (admin)
+  - GET /api/users/<id>/reservations, GET /api/books/<id>/reservations (admin)
+
+Validation, SQL and serialization are shared with the Flask views, JWTs are
+verified by the Flask app's own JWTManager, and errors use the same
+error_payload shape + meta.request_id, so the JSON contract is identical.
+Responses are compressed like the Flask ones (compression.py).
+"""
+
+import logging
+import re
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from flask import Flask
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from werkzeug.datastructures import MultiDict
+
+import async_db
+import book_routes
+import compression
+import loan_routes
+import reservation_routes
+from app import create_app
+from response_utils import error_payload, with_request_id
+from suggest_index import preload_suggest_index
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # pragma: no cover - asgiref ships with the async extras
+    WsgiToAsgi = None
+
+# (match, query args, claims, request headers) -> (payload, status[, response headers]),
+# like a Flask view's return value; payload None with 304
+Handler = Callable[
+    [re.Match, MultiDict, Optional[Dict[str, Any]], Dict[str, str]], Awaitable[Tuple[Any, ...]]
+]
+
+# (path pattern, required auth: None | "login" | "admin", handler)
+_ROUTES: List[Tuple[re.Pattern, Optional[str], Handler]] = [
+    (
+        re.compile(r"/api/books"),
+        None,
+        lambda m, args, user, headers: book_routes.list_books_async(args, headers),
+    ),
+    (
+        re.compile(r"/api/books/(\d+)"),
+        None,
+        lambda m, args, user, headers: book_routes.get_book_async(int(m.group(1)), args, headers),
+    ),
+    (
+        re.compile(r"/api/users/(\d+)/loans"),
+        "login",
+        lambda m, args, user, headers: loan_routes.list_loans_for_user_async(
+            int(m.group(1)), args, user
+        ),
+    ),
+    (
+        re.compile(r"/api/loans/overdue"),
+        "admin",
+        lambda m, args, user, headers: loan_routes.list_overdue_loans_async(args),
+    ),
+    (
+        re.compile(r"/api/users/(\d+)/reservations"),
+        "login",
+        lambda m, args, user, headers: reservation_routes.list_reservations_for_user_async(
+            int(m.group(1)), args, user
+        ),
+    ),
+    (
+        re.compile(r"/api/books/(\d+)/reservations"),
+        "admin",
+        lambda m, args, user, headers: reservation_routes.list_reservations_for_book_async(
+            int(m.group(1)), args
+        ),
+    ),
+]
+
+
+class AsyncAPI:
+    """
+    Minimal ASGI application: matches the native async routes, falls back to
+    the wrapped Flask app (via asgiref's WsgiToAsgi) for anything else.
+    """
+
+    def __init__(self, flask_app: Flask) -> None:
+        self.flask_app = flask_app
+        self.fallback = WsgiToAsgi(flask_app) if WsgiToAsgi is not None else None
+        self.cors_origins = set(flask_app.config.get("CORS_ORIGINS") or [])
+        self.compression_min_bytes = compression.compression_min_bytes()
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
+        if scope["type"] == "http" and scope["method"] == "GET":
+            for pattern, auth, handler in _ROUTES:
+                m = pattern.fullmatch(scope["path"])
+                if m is not None:
+                    await self._dispatch(scope, send, m, auth, handler)
+                    return
+
+        if self.fallback is None:
+            raise RuntimeError("asgiref is required to serve the Flask routes over ASGI.")
+        await self.fallback(scope, receive, send)
+
+    async def _dispatch(
+        self,
+        scope: Dict[str, Any],
+        send: Callable,
+        m: re.Match,
+        auth: Optional[str],
+        handler: Handler,
+    ) -> None:
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        request_id = headers.get("x-request-id") or str(uuid.uuid4())
+
+        user = None
+        status = 200
+        extra_headers: Dict[str, str] = {}
+        if auth is not None:
+            user, payload, status = self._authenticate(headers.get("authorization"), auth)
+
+        if status == 200:
+            args = MultiDict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), True))
+            try:
+                payload, status, *rest = await handler(m, args, user, headers)
+                if rest:
+                    extra_headers = rest[0]
+            except Exception:
+                logging.exception("Unhandled exception")
+                payload, status = error_payload("server_error", "Unexpected server error."), 500
+
+        if status >= 400:
+            with_request_id(payload, request_id)
+
+        vary = ["Accept-Encoding"]
+        response_headers = [(b"x-request-id", request_id.encode("latin-1"))]
+        if status == 304:
+            body = b""
+        else:
+            body = self.flask_app.json.dumps_bytes(payload)
+            encoding = compression.negotiate_encoding(headers.get("accept-encoding"))
+            if encoding is not None and len(body) >= self.compression_min_bytes:
+                body = compression.compress(body, encoding)
+                response_headers.append((b"content-encoding", encoding.encode("latin-1")))
+                if "ETag" in extra_headers:
+                    extra_headers["ETag"] = compression.encoded_etag_header(
+                        extra_headers["ETag"], encoding
+                    )
+            response_headers += [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ]
+        for name, value in extra_headers.items():
+            response_headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+        origin = headers.get("origin")
+        if origin and origin in self.cors_origins:
+            response_headers.append((b"access-control-allow-origin", origin.encode("latin-1")))
+            vary.append("Origin")
+        response_headers.append((b"vary", ", ".join(vary).encode("latin-1")))
+
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _authenticate(
+        self, authorization: Optional[str], auth: str
+    ) -> Tuple[Optional[Dict[str, Any]], Any, int]:
+        """
+        Verify the bearer token with the Flask app's JWTManager (signature, expiry,
+        blocklist) and apply the role requirement. CPU-only, no I/O.
+        Returns (claims, error payload, status); status 200 means authorized.
+        """
+        headers = {"Authorization": authorization} if authorization else {}
+        with self.flask_app.test_request_context(headers=headers):
+            try:
+                verify_jwt_in_request()
+            except Exception:
+                # Like auth_utils._ensure_jwt_verified: expired / revoked / invalid alike
+                return None, error_payload("unauthorized", "Missing or invalid token."), 401
+
+            claims = get_jwt()
+            raw_id = get_jwt_identity()
+
+        try:
+            user_id = int(raw_id)
+        except (TypeError, ValueError):
+            user_id = raw_id
+        user = {
+            "user_id": user_id,
+            "role": claims.get("role"),
+            "library_id": claims.get("library_id"),
+        }
+
+        if auth == "admin" and (user["role"] or "").lower() != "admin":
+            return None, error_payload("forbidden", "Insufficient permissions."), 403
+        return user, None, 200
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await async_db.get_async_pool()
+                except Exception:
+                    # Keep serving: queries retry the pool creation and return db_error
+                    logging.exception("Failed to open async database pool")
+                preload_suggest_index()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_db.close_async_pool()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None) -> AsyncAPI:
+    return AsyncAPI(flask_app or create_app())
+
+
+app = create_asgi_app()
@@ -0,0 +1,91 @@
+"""
+asyncio database engine used by the ASGI entry point (asgi.py).
+
+Sits alongside db.get_db_cursor: same DB_* / DB_POOL_* environment variables,
+same SQL text (psycopg2-style %s placeholders are converted to $n once per
+statement), but connections come from an asyncpg pool so a handful of event-loop
+workers can keep many catalog queries in flight.
+
+asyncpg is optional: the Flask (WSGI) app never imports it at request time.
+"""
+
+import asyncio
+import os
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+from db import to_server_params
+
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - only needed when running asgi.py
+    asyncpg = None
+
+_pool: Optional["asyncpg.Pool"] = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+
+@lru_cache(maxsize=256)
+def _convert(sql: str) -> str:
+    converted = to_server_params(sql)
+    if converted is None:
+        raise ValueError("Statement cannot be run on the async engine.")
+    return converted[0]
+
+
+async def get_async_pool() -> "asyncpg.Pool":
+    """
+    Return the process-wide asyncpg pool, creating it on first use.
+
+    asyncpg prepares and caches statements per connection by itself
+    (statement_cache_size follows DB_PREPARED_STATEMENTS_MAX).
+    """
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if asyncpg is None:
+        raise RuntimeError("asyncpg is not installed (pip install asyncpg).")
+
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                host=os.getenv("DB_HOST", "localhost"),
+                port=int(os.getenv("DB_PORT", "5432")),
+                database=os.getenv("DB_NAME", "library"),
+                user=os.getenv("DB_USER", "postgres"),
+                password=os.getenv("DB_PASSWORD", "postgres"),
+                min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                max_inactive_connection_lifetime=float(os.getenv("DB_POOL_MAX_IDLE_S", "300")),
+                statement_cache_size=int(os.getenv("DB_PREPARED_STATEMENTS_MAX", "64")),
+                # Same as db.get_db_connection: session uses UTC
+                server_settings={"timezone": "UTC"},
+            )
+    return _pool
+
+
+async def close_async_pool() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+def _acquire_timeout() -> float:
+    return float(os.getenv("DB_POOL_TIMEOUT_S", "5"))
+
+
+async def fetch(sql: str, params: Sequence[Any] = ()) -> List[Any]:
+    """Run a read-only statement and return all rows (asyncpg Records, mapping-like)."""
+    pool = await get_async_pool()
+    async with pool.acquire(timeout=_acquire_timeout()) as conn:
+        return await conn.fetch(_convert(sql), *params)
+
+
+async def fetchrow(sql: str, params: Sequence[Any] = ()) -> Optional[Any]:
+    """Run a read-only statement and return the first row or None."""
+    pool = await get_async_pool()
+    async with pool.acquire(timeout=_acquire_timeout()) as conn:
+        return await conn.fetchrow(_convert(sql), *params)
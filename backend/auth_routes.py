@@ -18,7 +18,8 @@ from auth_utils import (  # brute-force protection helpers
     register_failed_login,
 )
 from config import DEFAULT_LIBRARY_ID, DEFAULT_MEMBER_ROLE_ID
-from db import get_db_cursor
+from db import get_db_cursor, use_primary
+from http_cache import PRIVATE_CACHE_CONTROL, conditional_response, etag_for
 from parse_utils import ParseError, parse_date, require_fields
 from password_policy import is_strong_password  # NEW import
 from password_utils import hash_password, verify_password
@@ -172,6 +173,9 @@ def login() -> Tuple[Response, int]:
             meta={"retry_after": retry_after},
         )
 
+    # Credentials must not come from a lagging read replica
+    use_primary()
+
     try:
         with get_db_cursor(commit=False) as cur:
             cur.execute(
@@ -296,18 +300,16 @@ def me() -> Tuple[Response, int]:
     """
     GET /api/me
     Return current user information extracted from the JWT claims.
+    The ETag is derived from the claims themselves (304 without any database access).
     """
     user = get_current_user()
-    return (
-        jsonify(
-            {
-                "user_id": user["user_id"],
-                "role": user["role"],
-                "library_id": user["library_id"],
-            }
-        ),
-        200,
-    )
+    payload = {
+        "user_id": user["user_id"],
+        "role": user["role"],
+        "library_id": user["library_id"],
+    }
+    etag = etag_for("me", payload["user_id"], payload["role"], payload["library_id"])
+    return conditional_response(payload, etag, PRIVATE_CACHE_CONTROL)
 
 
 @auth_bp.post("/me/password")
@@ -334,6 +336,7 @@ def change_password() -> Tuple[Response, int]:
 
     user = get_current_user()
     user_id = user["user_id"]
+    use_primary()
 
     try:
         with get_db_cursor(commit=False) as cur:
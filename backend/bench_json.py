@@ -0,0 +1,97 @@
+"""
+Benchmark: JSON encoding of loan listings, Flask's default provider vs json_provider.
+
+    python bench_json.py [--repeat N]
+
+"default" is the previous path: every row converted by hand (isoformat(),
+float(Decimal)) and encoded by flask.json.provider.DefaultJSONProvider.
+"fast" / "fast-stdlib" pass the database values through _serialize_loan and
+let FastJSONProvider encode them (orjson / stdlib json backend).
+No database needed: the rows are generated like psycopg2 returns them.
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from loan_routes import _serialize_loan
+
+
+def make_loan_rows(n: int) -> List[Dict[str, Any]]:
+    start = datetime(2024, 1, 1, 9, 30, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        loan_date = start + timedelta(hours=i)
+        returned = i % 3 == 0
+        rows.append(
+            {
+                "loan_id": i + 1,
+                "item_id": 1000 + i % 500,
+                "user_id": 1 + i % 200,
+                "loan_date": loan_date,
+                "due_date": (loan_date + timedelta(days=14)).date(),
+                "return_date": loan_date + timedelta(days=10) if returned else None,
+                "fine_paid": Decimal("150.00") if i % 7 == 0 else Decimal("0.00"),
+            }
+        )
+    return rows
+
+
+def serialize_by_hand(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The per-row conversions loan_routes did before the fast provider."""
+    return {
+        "loan_id": row["loan_id"],
+        "item_id": row["item_id"],
+        "user_id": row["user_id"],
+        "loan_date": row["loan_date"].isoformat() if row["loan_date"] else None,
+        "due_date": row["due_date"].isoformat() if row["due_date"] else None,
+        "return_date": row["return_date"].isoformat() if row["return_date"] else None,
+        "fine_paid": float(row["fine_paid"]) if row["fine_paid"] is not None else 0.0,
+    }
+
+
+def _candidates(app: Flask) -> Dict[str, Callable[[List[Dict[str, Any]]], bytes]]:
+    default = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+    candidates = {
+        "default": lambda rows: default.dumps([serialize_by_hand(r) for r in rows]).encode(),
+        "fast": lambda rows: fast.dumps_bytes([_serialize_loan(r) for r in rows]),
+    }
+    if json_provider.orjson is not None:
+        stdlib = json_provider.FastJSONProvider(app)
+        stdlib._encode = json_provider._dumps_stdlib
+        candidates["fast-stdlib"] = lambda rows: stdlib.dumps_bytes(
+            [_serialize_loan(r) for r in rows]
+        )
+    return candidates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    candidates = _candidates(app)
+    for n in (1_000, 10_000):
+        rows = make_loan_rows(n)
+        number = max(1, args.repeat * 1_000 // n)
+        baseline = None
+        print(f"{n} loans ({number} runs, best of 5):")
+        for name, encode in candidates.items():
+            best = min(timeit.repeat(lambda: encode(rows), number=number, repeat=5)) / number
+            baseline = baseline or best
+            print(
+                f"  {name:<12} {best * 1e3:8.2f} ms  {len(encode(rows)):>9} bytes"
+                f"  x{baseline / best:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
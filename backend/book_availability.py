@@ -0,0 +1,133 @@
+"""
+book_availability: per (book, library) item / active loan counters.
+
+The table is kept up to date by triggers on Item and Loan (database/table.sql),
+in the same transaction as the loan / return / item insert. This module holds the
+rebuild and verify operations, exposed as
+
+    flask --app app book-availability verify
+    flask --app app book-availability rebuild
+
+and as admin endpoints (see admin_routes.py).
+"""
+
+from typing import Any, Dict, List
+
+import click
+from flask.cli import AppGroup
+
+from catalog_cache import get_catalog_cache
+from db import get_db_cursor, on_commit
+
+# Counters recomputed from the source tables
+EXPECTED_SQL = """
+    SELECT
+        i.book_id,
+        i.library_id,
+        COUNT(DISTINCT i.item_id) AS total_items,
+        COUNT(l.loan_id) AS loaned_items
+    FROM Item i
+    LEFT JOIN Loan l
+        ON l.item_id = i.item_id
+       AND l.return_date IS NULL
+    GROUP BY i.book_id, i.library_id
+"""
+
+VERIFY_SQL = f"""
+    WITH expected AS ({EXPECTED_SQL})
+    SELECT
+        COALESCE(e.book_id, a.book_id) AS book_id,
+        COALESCE(e.library_id, a.library_id) AS library_id,
+        COALESCE(e.total_items, 0) AS expected_total_items,
+        COALESCE(e.loaned_items, 0) AS expected_loaned_items,
+        COALESCE(a.total_items, 0) AS stored_total_items,
+        COALESCE(a.loaned_items, 0) AS stored_loaned_items
+    FROM expected e
+    FULL JOIN book_availability a
+        ON a.book_id = e.book_id
+       AND a.library_id = e.library_id
+    WHERE COALESCE(e.total_items, 0) <> COALESCE(a.total_items, 0)
+       OR COALESCE(e.loaned_items, 0) <> COALESCE(a.loaned_items, 0)
+    ORDER BY 1, 2
+"""
+
+# Only rows whose counters differ are written (upsert / zero out), so the book
+# version stamps of unaffected books stay unchanged
+REBUILD_SQL = f"""
+    WITH expected AS ({EXPECTED_SQL}),
+    zeroed AS (
+        UPDATE book_availability a
+        SET total_items = 0, loaned_items = 0
+        WHERE (a.total_items <> 0 OR a.loaned_items <> 0)
+          AND NOT EXISTS (
+              SELECT 1 FROM expected e
+              WHERE e.book_id = a.book_id AND e.library_id = a.library_id
+          )
+        RETURNING a.book_id
+    ),
+    upserted AS (
+        INSERT INTO book_availability (book_id, library_id, total_items, loaned_items)
+        SELECT book_id, library_id, total_items, loaned_items FROM expected
+        ON CONFLICT (book_id, library_id) DO UPDATE
+        SET total_items = EXCLUDED.total_items,
+            loaned_items = EXCLUDED.loaned_items
+        WHERE (book_availability.total_items, book_availability.loaned_items)
+              IS DISTINCT FROM (EXCLUDED.total_items, EXCLUDED.loaned_items)
+        RETURNING book_id
+    )
+    SELECT book_id FROM zeroed
+    UNION ALL
+    SELECT book_id FROM upserted
+"""
+
+
+def verify_book_availability() -> List[Dict[str, Any]]:
+    """
+    Compare the stored counters with a full recount.
+    Returns the mismatching (book_id, library_id) rows; empty list means consistent.
+    """
+    with get_db_cursor(commit=False) as cur:
+        cur.execute(VERIFY_SQL)
+        rows = cur.fetchall() or []
+
+    return [{key: int(value) for key, value in row.items()} for row in rows]
+
+
+def rebuild_book_availability() -> int:
+    """
+    Recompute every counter from Item / Loan in one transaction.
+    Item and Loan are locked against writes meanwhile, so no trigger update is lost.
+    Returns the number of (book, library) rows corrected.
+    """
+    with get_db_cursor(commit=True) as cur:
+        cur.execute("LOCK TABLE Item, Loan IN SHARE MODE")
+        cur.execute(REBUILD_SQL)
+        rows = cur.fetchall() or []
+    on_commit(get_catalog_cache().clear)
+    return len(rows)
+
+
+availability_cli = AppGroup("book-availability", help="Maintain the book_availability table.")
+
+
+@availability_cli.command("verify")
+def verify_command() -> None:
+    """Report counters that differ from a recount (exit code 1 if any)."""
+    mismatches = verify_book_availability()
+    for m in mismatches:
+        click.echo(
+            f"book_id={m['book_id']} library_id={m['library_id']}: "
+            f"stored {m['stored_total_items']}/{m['stored_loaned_items']}, "
+            f"expected {m['expected_total_items']}/{m['expected_loaned_items']} "
+            "(total/loaned)"
+        )
+    if mismatches:
+        raise SystemExit(1)
+    click.echo("book_availability is consistent.")
+
+
+@availability_cli.command("rebuild")
+def rebuild_command() -> None:
+    """Recompute the whole table from Item and Loan."""
+    count = rebuild_book_availability()
+    click.echo(f"book_availability rebuilt: {count} rows corrected.")
@@ -1,148 +1,951 @@
-from typing import Optional, Tuple
+import base64
+import csv
+import io
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 
-from flask import Blueprint, Response, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
+from werkzeug.datastructures import ETags
+from werkzeug.http import parse_etags
 
-from db import get_db_cursor
-from parse_utils import ParseError, parse_int
-from response_utils import error_response
+import async_db
+from auth_utils import role_required
+from book_similarity import TOP_K as SIMILAR_TOP_K
+from catalog_cache import cache_bypassed, get_catalog_cache
+from db import RowStream, get_db_cursor
+from http_cache import (
+    catalog_cache_control,
+    conditional_payload,
+    conditional_response,
+    etag_for,
+    has_conditional_request,
+    is_not_modified,
+)
+from parse_utils import ParseError, parse_fields, parse_int
+from popular_books import MAX_LIMIT as POPULAR_MAX_LIMIT
+from popular_books import WINDOWS as POPULAR_WINDOWS
+from popular_books import get_popular_books
+from response_utils import error_payload, error_response
+from suggest_index import MIN_PREFIX_LENGTH, ensure_suggest_index, normalize_text
 
 book_bp = Blueprint("books", __name__)
 
 
-@book_bp.get("/books")
-def list_books() -> Tuple[Response, int]:
+# Public fields of a book (fields= allowlist) and the Book / counter columns each needs
+BOOK_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "book_id": (),
+    "title": ("title",),
+    "author": ("author",),
+    "isbn": ("isbn",),
+    "publication_year": ("publication_year",),
+    "category": ("category",),
+    "total_items": ("total_items",),
+    "available_items": ("total_items", "loaned_items"),
+}
+
+_BOOK_COLUMNS = ("title", "author", "isbn", "publication_year", "category")
+_COUNTER_COLUMNS = ("total_items", "loaned_items")
+
+
+def _book_columns(
+    fields: Optional[Tuple[str, ...]], extra: Tuple[str, ...] = ()
+) -> Optional[Tuple[str, ...]]:
+    """Columns to select for a sparse fieldset (None = every column)."""
+    if fields is None:
+        return None
+    needed = {column for field in fields for column in BOOK_FIELDS[field]} | set(extra)
+    return tuple(c for c in _BOOK_COLUMNS + _COUNTER_COLUMNS if c in needed)
+
+
+def _needs_counters(columns: Optional[Tuple[str, ...]]) -> bool:
+    return columns is None or any(c in _COUNTER_COLUMNS for c in columns)
+
+
+def _catalog_select_sql(
+    by_library: bool, stamps_only: bool = False, columns: Optional[Tuple[str, ...]] = None
+) -> str:
     """
-    GET /api/books
+    SELECT ... FROM Book with total_items / loaned_items per book.
 
-    Query:
-      - q: case-insensitive substring in title/author
-      - category: exact case-insensitive category
-      - library_id: optional integer; if provided, totals/availability for that library only
-      - page: optional integer, default 1
-      - page_size: optional integer, default 20, max 100
+    The counters come from book_availability (kept current by triggers on Item and
+    Loan): a primary key lookup per returned book instead of joining every item and
+    loan of the catalog. With by_library the first parameter is the library_id.
+
+    stamps_only selects just book_id / version (ETag revalidation), without the
+    counters and therefore without a library_id parameter.
+
+    columns narrows the select list (book_id and version are always selected);
+    without counter columns the availability lateral is left out, and so is the
+    library_id parameter.
+    """
+    if stamps_only:
+        return """
+        SELECT b.book_id, b.version
+        FROM Book b
+    """
+    if columns is None:
+        columns = _BOOK_COLUMNS + _COUNTER_COLUMNS
+    select_list = ["b.book_id", "b.version"]
+    select_list += [f"b.{c}" for c in _BOOK_COLUMNS if c in columns]
+    select_list += [f"av.{c}" for c in _COUNTER_COLUMNS if c in columns]
+    sql = f"""
+        SELECT {", ".join(select_list)}
+        FROM Book b
     """
-    q = (request.args.get("q") or "").strip()
-    category = (request.args.get("category") or "").strip()
-    raw_library_id = (request.args.get("library_id") or "").strip()
+    if not _needs_counters(columns):
+        return sql
+    library_filter = " AND a.library_id = %s" if by_library else ""
+    sql += f"""
+        CROSS JOIN LATERAL (
+            SELECT
+                COALESCE(SUM(a.total_items), 0)::int AS total_items,
+                COALESCE(SUM(a.loaned_items), 0)::int AS loaned_items
+            FROM book_availability a
+            WHERE a.book_id = b.book_id{library_filter}
+        ) av
+    """
+    return sql
+
+
+# Sort keys for list_books: SQL expression (matching an index, see database/table.sql)
+# and the row field a keyset cursor stores. publication_year is nullable, NULL sorts as 0.
+SORT_KEYS: Dict[str, Tuple[str, str]] = {
+    "title": ("b.title", "title"),
+    "author": ("b.author", "author"),
+    "publication_year": ("COALESCE(b.publication_year, 0)", "publication_year"),
+}
+
+
+# Upper limit of ids per POST /books/batch request
+BATCH_MAX_BOOK_IDS = 500
+
+# GET /books/export: formats, rows per fetch from the server-side cursor
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_FETCH_ROWS = 2000
+
+
+@dataclass
+class BookListQuery:
+    """
+    Validated list_books request: the statement, its parameters and, in cursor mode,
+    what is needed to build next_cursor (sort key, direction, page size).
+    stamp_sql / stamp_params select the (book_id, version) stamps of the same rows;
+    with include, facet_sql / facet_params count the matches per category.
+    """
+
+    sql: str
+    params: tuple
+    sort: str = "title"
+    descending: bool = False
+    page_size: int = 20
+    cursor_mode: bool = False
+    stamp_sql: str = ""
+    stamp_params: tuple = ()
+    include: Tuple[str, ...] = ()
+    fields: Optional[Tuple[str, ...]] = None
+    category: str = ""
+    facet_sql: str = ""
+    facet_params: tuple = ()
+
+
+# q filter (parameters: q, LIKE-escaped q), shared by the listing and the facet query
+_SEARCH_SQL = """
+        CROSS JOIN (
+            SELECT t.term, plainto_tsquery('simple', t.term) AS tsq
+            FROM (SELECT search_normalize(%s) AS term) t
+        ) s
+        WHERE (
+            b.search_vector @@ s.tsq
+            OR b.search_text LIKE '%%' || search_normalize(%s) || '%%'
+            OR s.term <%% b.search_text
+        )
+"""
+
+# include=... values of list_books
+INCLUDE_OPTIONS = ("facets", "total")
+
+
+def _facets_sql(with_q: bool) -> str:
+    """
+    Per-category book counts of the q match set ('' = no category).
+    Without q they come from book_category_count (maintained by triggers on Book),
+    with q from a single GROUP BY pass over the matches.
+    """
+    if not with_q:
+        return "SELECT category, book_count FROM book_category_count WHERE book_count > 0"
+    return (
+        "SELECT COALESCE(b.category, '') AS category, COUNT(*)::int AS book_count FROM Book b"
+        + _SEARCH_SQL
+        + " GROUP BY 1"
+    )
 
-    # Pagináció
-    page_raw = (request.args.get("page") or "1").strip()
-    page_size_raw = (request.args.get("page_size") or "20").strip()
 
+# Distinct list_books statements kept built; the shape includes the sort and the
+# sparse column set, so it is bounded like the per-connection prepared cache
+LIST_BOOKS_SQL_CACHE_MAX = 256
+
+
+@lru_cache(maxsize=LIST_BOOKS_SQL_CACHE_MAX)
+def _list_books_sql(
+    by_library: bool,
+    with_q: bool,
+    with_category: bool,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    seek: bool = False,
+    cursor_mode: bool = False,
+    stamps_only: bool = False,
+    columns: Optional[Tuple[str, ...]] = None,
+) -> str:
+    """
+    Build the list_books statement for one combination of optional filters / ordering.
+
+    The SQL text depends only on which filters are present, the sort / paging
+    mode and the selected columns, never on their values. That is still many
+    shapes (every fields= subset is one), so neither side keeps all of them:
+    built statements are LRU-cached (LIST_BOOKS_SQL_CACHE_MAX) and each pooled
+    connection prepares at most DB_PREPARED_STATEMENTS_MAX, evicting the least
+    recently used, so the common unfiltered / q pages stay prepared.
+    Parameter order: [library_id], [q, like], [category], [seek key, seek book_id],
+    page_size, [offset] (no offset in cursor mode).
+
+    q search (accent- and case-insensitive via search_normalize, see database/table.sql):
+      - full-text match on Book.search_vector (GIN),
+      - substring match on Book.search_text (pg_trgm GIN; any substring still matches),
+      - typo-tolerant word similarity (pg_trgm <% operator);
+    without an explicit sort, results are ordered by relevance, then title, then
+    book_id (a total order, so OFFSET pages neither repeat nor skip rows).
+
+    With sort (title / author / publication_year) rows are ordered by (key, book_id);
+    seek adds "(key, book_id) > (%s, %s)" so a cursor page is an index range scan
+    instead of an OFFSET that reads and discards every earlier row.
+
+    stamps_only returns the same rows as (book_id, version) only, for ETag checks;
+    columns narrows the select list for a sparse fieldset (see _catalog_select_sql).
+    """
+    sql = _catalog_select_sql(by_library, stamps_only, columns)
+
+    if with_q:
+        sql += _SEARCH_SQL
+    else:
+        sql += " WHERE 1=1"
+
+    if with_category:
+        sql += " AND LOWER(b.category) = %s"
+
+    if sort is None and with_q:
+        sql += """
+        ORDER BY
+            ts_rank_cd(b.search_vector, s.tsq) + word_similarity(s.term, b.search_text) DESC,
+            b.title ASC,
+            b.book_id ASC
+        """
+    else:
+        key = SORT_KEYS[sort or "title"][0]
+        if seek:
+            sql += f" AND ({key}, b.book_id) {'<' if descending else '>'} (%s, %s)"
+        direction = "DESC" if descending else "ASC"
+        sql += f" ORDER BY {key} {direction}, b.book_id {direction}"
+
+    sql += " LIMIT %s" if cursor_mode else " LIMIT %s OFFSET %s"
+    return sql
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input only matches literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _parse_library_id(args: Mapping[str, str]) -> Optional[int]:
+    raw_library_id = (args.get("library_id") or "").strip()
+    if not raw_library_id:
+        return None
+    return parse_int(
+        raw_library_id,
+        field="library_id",
+        error_code="invalid_library_id",
+        message="library_id must be an integer.",
+    )
+
+
+def _parse_include(args: Mapping[str, str]) -> Tuple[str, ...]:
+    """include=facets,total (comma separated, any order). Returns the sorted options."""
+    raw = (args.get("include") or "").strip()
+    if not raw:
+        return ()
+    options = {part.strip() for part in raw.split(",") if part.strip()}
+    if not options <= set(INCLUDE_OPTIONS):
+        raise ParseError(
+            error_code="invalid_include",
+            message="include must be a comma separated list of: facets, total.",
+            status=400,
+        )
+    return tuple(sorted(options))
+
+
+def _parse_sort(args: Mapping[str, str]) -> Tuple[Optional[str], bool]:
+    """
+    sort=title|author|publication_year, "-" prefix for descending.
+    Returns (sort key or None if not given, descending).
+    """
+    raw = (args.get("sort") or "").strip()
+    if not raw:
+        return None, False
+    descending = raw.startswith("-")
+    sort = raw[1:] if descending else raw
+    if sort not in SORT_KEYS:
+        raise ParseError(
+            error_code="invalid_sort",
+            message=(
+                "sort must be one of: title, author, publication_year (prefix - for descending)."
+            ),
+            status=400,
+        )
+    return sort, descending
+
+
+def encode_cursor(sort: str, descending: bool, row: Mapping[str, Any]) -> str:
+    """Opaque keyset cursor pointing after `row` (base64url JSON)."""
+    value = row[SORT_KEYS[sort][1]]
+    if sort == "publication_year" and value is None:
+        value = 0
+    raw = json.dumps({"s": sort, "d": descending, "k": [value, row["book_id"]]})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> Tuple[Any, int]:
+    """
+    Decode a cursor produced by encode_cursor for the same sort / direction.
+    Returns (seek key, seek book_id); raises ParseError invalid_cursor otherwise.
+    """
+    invalid = ParseError(
+        error_code="invalid_cursor",
+        message="cursor is invalid or does not match the requested sort.",
+        status=400,
+    )
     try:
-        page = parse_int(
-            page_raw,
-            field="page",
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key, book_id = data["k"]
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise invalid
+
+    expected_type = int if sort == "publication_year" else str
+    if (
+        data.get("s") != sort
+        or data.get("d") is not descending
+        or not isinstance(key, expected_type)
+        or not isinstance(book_id, int)
+    ):
+        raise invalid
+    return key, book_id
+
+
+def _build_list_books_query(args: Mapping[str, str]) -> BookListQuery:
+    """
+    Validate the list_books query string and return the statement to run.
+    Raises ParseError for invalid pagination / library_id / sort / cursor / fields.
+    Shared by the Flask view and its asyncio variant.
+
+    Two paging modes:
+      - page / page_size (default): LIMIT/OFFSET, plain list response
+      - cursor (present, empty for the first page): keyset paging on (sort key, book_id),
+        response {"items": [...], "next_cursor": ...}
+    include=facets,total turns the response into an object in page mode too.
+    fields=a,b,... narrows both the select list and the serialized items.
+    """
+    q = (args.get("q") or "").strip()
+    category = (args.get("category") or "").strip()
+    sort, descending = _parse_sort(args)
+    include = _parse_include(args)
+    fields = parse_fields(args.get("fields"), allowed=tuple(BOOK_FIELDS))
+    cursor = args.get("cursor")
+    cursor_mode = cursor is not None
+
+    # Pagináció
+    page_raw = (args.get("page") or "1").strip()
+    page_size_raw = (args.get("page_size") or "20").strip()
+
+    page = parse_int(
+        page_raw,
+        field="page",
+        error_code="invalid_pagination",
+        message="page must be an integer.",
+    )
+    page_size = parse_int(
+        page_size_raw,
+        field="page_size",
+        error_code="invalid_pagination",
+        message="page_size must be an integer.",
+    )
+
+    if page <= 0 or page_size <= 0 or page_size > 100:
+        raise ParseError(
             error_code="invalid_pagination",
-            message="page must be an integer.",
+            message=(
+                "page and page_size must be positive, and page_size cannot be greater than 100."
+            ),
+            status=400,
         )
-        page_size = parse_int(
-            page_size_raw,
-            field="page_size",
+
+    if cursor_mode and args.get("page"):
+        raise ParseError(
             error_code="invalid_pagination",
-            message="page_size must be an integer.",
+            message="page cannot be combined with cursor.",
+            status=400,
         )
-    except ParseError as e:
-        return error_response(e.error_code, e.message, status=e.status)
 
-    if page <= 0 or page_size <= 0 or page_size > 100:
-        return error_response(
-            "invalid_pagination",
-            "page and page_size must be positive, and page_size cannot be greater than 100.",
+    offset = (page - 1) * page_size
+
+    library_id = _parse_library_id(args)
+
+    seek = None
+    if cursor_mode:
+        # Keyset order is always a sort key (relevance has no stable seek position)
+        sort = sort or "title"
+        if cursor.strip():
+            seek = decode_cursor(cursor.strip(), sort, descending)
+
+    # A cursor is built from the sort key of the last row, so it is always selected
+    columns = _book_columns(fields, (SORT_KEYS[sort][1],) if cursor_mode else ())
+    # library_id only narrows the counters; without them it is not a parameter
+    by_library = library_id is not None and _needs_counters(columns)
+
+    params: list = []
+    if by_library:
+        params.append(library_id)
+    if q:
+        params.extend([q, _escape_like(q)])
+    if category:
+        params.append(category.lower())
+    if seek is not None:
+        params.extend(seek)
+    if cursor_mode:
+        # One extra row tells whether there is a next page
+        params.append(page_size + 1)
+    else:
+        params.extend([page_size, offset])
+
+    shape = (bool(q), bool(category), sort, descending, seek is not None, cursor_mode)
+    sql = _list_books_sql(by_library, *shape, columns=columns)
+    # The stamps statement has no availability counters, hence no library_id parameter
+    stamp_sql = _list_books_sql(False, *shape, stamps_only=True)
+    stamp_params = params[1:] if by_library else params
+    return BookListQuery(
+        sql=sql,
+        params=tuple(params),
+        sort=sort or "title",
+        descending=descending,
+        page_size=page_size,
+        cursor_mode=cursor_mode,
+        stamp_sql=stamp_sql,
+        stamp_params=tuple(stamp_params),
+        include=include,
+        fields=fields,
+        category=category.lower(),
+        facet_sql=_facets_sql(bool(q)) if include else "",
+        facet_params=(q, _escape_like(q)) if include and q else (),
+    )
+
+
+def _list_books_payload(
+    query: BookListQuery,
+    rows: List[Mapping[str, Any]],
+    facet_rows: Optional[List[Mapping[str, Any]]] = None,
+) -> Any:
+    """
+    Plain list in page mode; {"items", "next_cursor"} in cursor mode;
+    plus "total" / "facets" (from facet_rows) if requested with include.
+    """
+    if not query.cursor_mode and not query.include:
+        return [_serialize_book(row, query.fields) for row in rows]
+
+    payload: Dict[str, Any] = {}
+    if query.cursor_mode:
+        rows = list(rows)
+        next_cursor = None
+        if len(rows) > query.page_size:
+            rows = rows[: query.page_size]
+            next_cursor = encode_cursor(query.sort, query.descending, rows[-1])
+        payload["items"] = [_serialize_book(row, query.fields) for row in rows]
+        payload["next_cursor"] = next_cursor
+    else:
+        payload["items"] = [_serialize_book(row, query.fields) for row in rows]
+
+    counts = [(row["category"], int(row["book_count"])) for row in facet_rows or []]
+    if "total" in query.include:
+        # Facets ignore the category filter; total applies it like the listing does
+        payload["total"] = sum(
+            n for value, n in counts if not query.category or value.lower() == query.category
+        )
+    if "facets" in query.include:
+        payload["facets"] = {
+            "category": [
+                {"value": value, "count": n}
+                for value, n in sorted(counts, key=lambda c: (-c[1], c[0]))
+                if value
+            ]
+        }
+    return payload
+
+
+def _build_get_book_query(book_id: int, args: Mapping[str, str]) -> Tuple[str, tuple]:
+    """
+    Return (sql, params) for get_book; raises ParseError for an invalid library_id.
+    """
+    library_id = _parse_library_id(args)
+
+    params = []
+    if library_id is not None:
+        params.append(library_id)
+
+    sql = _catalog_select_sql(library_id is not None)
+    sql += """
+        WHERE b.book_id = %s
+    """
+    params.append(book_id)
+    return sql, tuple(params)
+
+
+def _build_batch_books_query(data: Mapping[str, Any]) -> Tuple[str, tuple, List[int]]:
+    """
+    Validate a POST /books/batch body and return (sql, params, book_ids).
+    book_ids are deduplicated in request order; raises ParseError on invalid input.
+    """
+    raw_ids = data.get("book_ids")
+    if not isinstance(raw_ids, list) or not raw_ids:
+        raise ParseError(
+            error_code="invalid_book_ids",
+            message="book_ids must be a non-empty array of integers.",
+            status=400,
+        )
+    if len(raw_ids) > BATCH_MAX_BOOK_IDS:
+        raise ParseError(
+            error_code="too_many_book_ids",
+            message=f"At most {BATCH_MAX_BOOK_IDS} book_ids per request.",
             status=400,
         )
 
-    offset = (page - 1) * page_size
+    book_ids = list(
+        dict.fromkeys(
+            parse_int(
+                raw,
+                field="book_ids",
+                error_code="invalid_book_ids",
+                message="book_ids must be a non-empty array of integers.",
+            )
+            for raw in raw_ids
+        )
+    )
 
-    # library_id parse
-    library_id: Optional[int] = None
-    if raw_library_id:
-        try:
-            library_id = parse_int(
-                raw_library_id,
+    params: list = []
+    library_id = data.get("library_id")
+    if library_id is not None:
+        params.append(
+            parse_int(
+                library_id,
                 field="library_id",
                 error_code="invalid_library_id",
                 message="library_id must be an integer.",
             )
-        except ParseError as e:
-            return error_response(e.error_code, e.message, status=e.status)
+        )
 
-    join_item = """
-        LEFT JOIN Item i
-            ON i.book_id = b.book_id
+    # One statement shape for any number of ids (a single array parameter)
+    sql = _catalog_select_sql(library_id is not None)
+    sql += """
+        WHERE b.book_id = ANY(%s)
     """
-    params = []
-    if library_id is not None:
-        join_item += " AND i.library_id = %s"
-        params.append(library_id)
+    params.append(book_ids)
+    return sql, tuple(params), book_ids
 
-    sql = f"""
-        SELECT
-            b.book_id,
-            b.title,
-            b.author,
-            b.isbn,
-            b.publication_year,
-            b.category,
-            COUNT(DISTINCT i.item_id) AS total_items,
-            COUNT(DISTINCT l.item_id) AS loaned_items
-        FROM Book b
-        {join_item}
-        LEFT JOIN Loan l
-            ON l.item_id = i.item_id
-           AND l.return_date IS NULL
-        WHERE 1=1
+
+def _build_export_query(
+    args: Mapping[str, str],
+) -> Tuple[str, tuple, str, Optional[Tuple[str, ...]]]:
+    """
+    Validate GET /books/export and return (sql, params, format, fields): every book
+    in book_id order with its counters. Raises ParseError for invalid
+    format / library_id / fields.
     """
+    fmt = (args.get("format") or "ndjson").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ParseError(
+            error_code="invalid_format",
+            message="format must be one of: ndjson, csv.",
+            status=400,
+        )
+    fields = parse_fields(args.get("fields"), allowed=tuple(BOOK_FIELDS))
+    library_id = _parse_library_id(args)
 
-    if q:
-        sql += " AND (LOWER(b.title) LIKE %s OR LOWER(b.author) LIKE %s)"
-        like = f"%{q.lower()}%"
-        params.extend([like, like])
+    columns = _book_columns(fields)
+    by_library = library_id is not None and _needs_counters(columns)
+    sql = _catalog_select_sql(by_library, columns=columns) + " ORDER BY b.book_id"
+    return sql, (library_id,) if by_library else (), fmt, fields
 
-    if category:
-        sql += " AND LOWER(b.category) = %s"
-        params.append(category.lower())
 
-    sql += """
-        GROUP BY
-            b.book_id,
-            b.title,
-            b.author,
-            b.isbn,
-            b.publication_year,
-            b.category
-        ORDER BY b.title ASC
-        LIMIT %s OFFSET %s
+def _export_chunks(
+    rows: Iterable[Mapping[str, Any]],
+    fmt: str,
+    fields: Optional[Tuple[str, ...]],
+    encode: Callable[[Any], bytes],
+) -> Iterator[bytes]:
+    """Serialized export body: one chunk per EXPORT_FETCH_ROWS books (CSV with a header)."""
+    columns = list(fields or BOOK_FIELDS)
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator="\n")
+    lines: List[bytes] = []
+
+    def flush() -> bytes:
+        if fmt == "csv":
+            data = text.getvalue().encode("utf-8")
+            text.seek(0)
+            text.truncate()
+        else:
+            data = b"".join(lines)
+            lines.clear()
+        return data
+
+    if fmt == "csv":
+        writer.writerow(columns)
+    for n, row in enumerate(rows, 1):
+        book = _serialize_book(row, fields)
+        if fmt == "csv":
+            writer.writerow([book[c] for c in columns])
+        else:
+            lines.append(encode(book) + b"\n")
+        if n % EXPORT_FETCH_ROWS == 0:
+            yield flush()
+    data = flush()
+    if data:
+        yield data
+
+
+# Active reservations of the book (index-only count on unique_active_reservation_idx)
+_QUEUE_LENGTH_SQL = """
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*)::int AS queue_length
+        FROM Reservation r
+        WHERE r.book_id = b.book_id AND r.status IN ('pending', 'ready')
+    ) q
+"""
+
+# One row per library (zero counts included), from the book_availability counters;
+# a single row with library_id NULL when there are no libraries at all
+BOOK_AVAILABILITY_SQL = (
+    """
+    SELECT
+        b.book_id,
+        b.version,
+        q.queue_length,
+        l.library_id,
+        l.name AS library_name,
+        COALESCE(a.total_items, 0) AS total_items,
+        COALESCE(a.loaned_items, 0) AS loaned_items
+    FROM Book b
+    """
+    + _QUEUE_LENGTH_SQL
+    + """
+    LEFT JOIN Library l ON TRUE
+    LEFT JOIN book_availability a
+        ON a.book_id = b.book_id
+       AND a.library_id = l.library_id
+    WHERE b.book_id = %s
+    ORDER BY l.library_id
+"""
+)
+
+# ETag stamp of the breakdown: the book version plus the queue length
+BOOK_AVAILABILITY_STAMP_SQL = (
+    "SELECT b.version, q.queue_length FROM Book b" + _QUEUE_LENGTH_SQL + " WHERE b.book_id = %s"
+)
+
+
+def _serialize_availability(rows: List[Mapping[str, Any]]) -> Dict[str, Any]:
+    libraries = []
+    for row in rows:
+        if row["library_id"] is None:
+            continue
+        total = int(row["total_items"])
+        loaned = int(row["loaned_items"])
+        libraries.append(
+            {
+                "library_id": row["library_id"],
+                "name": row["library_name"],
+                "total_items": total,
+                "loaned_items": loaned,
+                "available_items": max(total - loaned, 0),
+            }
+        )
+    return {
+        "book_id": rows[0]["book_id"],
+        "total_items": sum(lib["total_items"] for lib in libraries),
+        "available_items": sum(lib["available_items"] for lib in libraries),
+        "reservation_queue_length": int(rows[0]["queue_length"]),
+        "libraries": libraries,
+    }
+
+
+def _serialize_book(
+    row: Mapping[str, Any], fields: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Any]:
     """
-    params.extend([page_size, offset])
+    Convert a catalog row (with total_items / loaned_items) into the public book shape,
+    or only the given fields of it (the row may then lack the other columns).
+    """
+    total = row.get("total_items") or 0
+    loaned = row.get("loaned_items") or 0
+    available = max(total - loaned, 0)
+
+    book = {
+        "book_id": row["book_id"],
+        "title": row.get("title"),
+        "author": row.get("author"),
+        "isbn": row.get("isbn"),
+        "publication_year": row.get("publication_year"),
+        "category": row.get("category"),
+        "total_items": int(total),
+        "available_items": int(available),
+    }
+    if fields is None:
+        return book
+    return {field: book[field] for field in fields}
+
+
+def _list_etag(
+    query: BookListQuery,
+    rows: List[Mapping[str, Any]],
+    facet_rows: Optional[List[Mapping[str, Any]]] = None,
+) -> str:
+    """
+    ETag of a list_books response: the query plus the (book_id, version) of its rows
+    (and the category counts, if included).
+    """
+    stamps = [(row["book_id"], row.get("version")) for row in rows]
+    facets = sorted((row["category"], row["book_count"]) for row in facet_rows or [])
+    return etag_for("books", query.sql, query.params, query.include, query.fields, stamps, facets)
+
+
+def _book_etag(sql: str, params: tuple, version: Any) -> str:
+    return etag_for("book", sql, params, version)
+
+
+def _cached_response(payload: Any, etag: str, cache_status: str) -> Tuple[Response, int]:
+    """
+    Conditional JSON response (ETag, Cache-Control, 304 if current)
+    with X-Cache: HIT | MISS | BYPASS (catalog cache outcome).
+    """
+    resp, status = conditional_response(payload, etag, catalog_cache_control())
+    resp.headers["X-Cache"] = cache_status
+    return resp, status
+
+
+def _cached_payload(
+    payload: Any, etag: str, cache_status: str, if_none_match: ETags
+) -> Tuple[Any, int, Dict[str, str]]:
+    """_cached_response for the asgi.py variants: (payload, status, headers)."""
+    payload, status, headers = conditional_payload(
+        payload, etag, catalog_cache_control(), if_none_match
+    )
+    headers["X-Cache"] = cache_status
+    return payload, status, headers
+
+
+@book_bp.get("/books")
+def list_books() -> Tuple[Response, int]:
+    """
+    GET /api/books
+
+    Query:
+      - q: search in title/author (accent- and case-insensitive, typo-tolerant,
+           ranked by relevance)
+      - category: exact case-insensitive category
+      - library_id: optional integer; if provided, totals/availability for that library only
+      - sort: title | author | publication_year, "-" prefix for descending
+              (default: relevance with q, otherwise title)
+      - page: optional integer, default 1
+      - page_size: optional integer, default 20, max 100
+      - cursor: keyset paging instead of page; empty for the first page, then the
+                returned next_cursor. Response: {"items": [...], "next_cursor": str|null}
+      - include: facets,total -> response object with "total" (match count) and/or
+                 "facets": {"category": [{"value", "count"}]} for the q filter
+                 (library_id does not narrow the match set, category only the total)
+      - fields: comma separated subset of BOOK_FIELDS; only these keys are selected
+                and returned per book (without total_items / available_items the
+                availability counters are not read at all)
+
+    Served from the in-process catalog cache when possible (X-Cache header);
+    send X-Cache-Bypass: 1 to force a database read.
+
+    Conditional GET: strong ETag from the rows' Book.version stamps; with a matching
+    If-None-Match the answer is 304, after a stamps-only query (no counters).
+    """
+    try:
+        query = _build_list_books_query(request.args)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+
+    cache = get_catalog_cache()
+    key = ("books", query.sql, query.params, query.include, query.fields)
+    bypass = cache_bypassed()
+    if not bypass:
+        entry = cache.get(key)
+        if entry is not None:
+            return _cached_response(*entry, "HIT")
+    epoch = cache.epoch()
+    cache_status = "BYPASS" if bypass else "MISS"
 
     try:
         with get_db_cursor(commit=False) as cur:
-            cur.execute(sql, tuple(params))
+            facet_rows = None
+            if query.include:
+                cur.execute(query.facet_sql, query.facet_params)
+                facet_rows = cur.fetchall()
+            if has_conditional_request():
+                cur.execute(query.stamp_sql, query.stamp_params)
+                etag = _list_etag(query, cur.fetchall(), facet_rows)
+                if is_not_modified(etag):
+                    return _cached_response(None, etag, cache_status)
+            cur.execute(query.sql, query.params)
             rows = cur.fetchall()
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
-    result = []
-    for row in rows:
-        total = row["total_items"] or 0
-        loaned = row["loaned_items"] or 0
-        available = max(total - loaned, 0)
+    payload = _list_books_payload(query, rows, facet_rows)
+    etag = _list_etag(query, rows, facet_rows)
+    cache.put(key, (payload, etag), [row["book_id"] for row in rows], epoch)
+    return _cached_response(payload, etag, cache_status)
 
-        result.append(
-            {
-                "book_id": row["book_id"],
-                "title": row["title"],
-                "author": row["author"],
-                "isbn": row["isbn"],
-                "publication_year": row["publication_year"],
-                "category": row["category"],
-                "total_items": int(total),
-                "available_items": int(available),
-            }
+
+async def list_books_async(
+    args: Mapping[str, str], headers: Mapping[str, str]
+) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    asyncio variant of GET /api/books (served natively by asgi.py).
+    Same JSON contract, catalog cache and conditional GET as list_books; headers are
+    the request headers (lower-case names). Returns (payload, status, response headers).
+    """
+    try:
+        query = _build_list_books_query(args)
+    except ParseError as e:
+        return error_payload(e.error_code, e.message), e.status, {}
+
+    if_none_match = parse_etags(headers.get("if-none-match"))
+    cache = get_catalog_cache()
+    key = ("books", query.sql, query.params, query.include, query.fields)
+    bypass = cache_bypassed(headers)
+    if not bypass:
+        entry = cache.get(key)
+        if entry is not None:
+            return _cached_payload(*entry, "HIT", if_none_match)
+    epoch = cache.epoch()
+    cache_status = "BYPASS" if bypass else "MISS"
+
+    try:
+        facet_rows = None
+        if query.include:
+            facet_rows = await async_db.fetch(query.facet_sql, query.facet_params)
+        if if_none_match:
+            stamps = await async_db.fetch(query.stamp_sql, query.stamp_params)
+            etag = _list_etag(query, stamps, facet_rows)
+            if is_not_modified(etag, if_none_match):
+                return _cached_payload(None, etag, cache_status, if_none_match)
+        rows = await async_db.fetch(query.sql, query.params)
+    except Exception:
+        logging.exception("Database error")
+        return error_payload("db_error", "Database error occurred."), 500, {}
+
+    payload = _list_books_payload(query, rows, facet_rows)
+    etag = _list_etag(query, rows, facet_rows)
+    cache.put(key, (payload, etag), [row["book_id"] for row in rows], epoch)
+    return _cached_payload(payload, etag, cache_status, if_none_match)
+
+
+@book_bp.get("/books/popular")
+def get_popular_books_list() -> Tuple[Response, int]:
+    """
+    GET /api/books/popular?window=7d|30d|all&library_id=&limit=
+    Most borrowed books in the last 7 / 30 UTC days (default 7d) or of all time,
+    optionally in one library. limit: default 10, max 50.
+    Served from the in-process leaderboards (popular_books.py), at most
+    POPULAR_BOOKS_REFRESH_S seconds old.
+    Returns: { "window", "library_id", "since", "generated_at",
+      "books": [ {book_id, title, author, isbn, publication_year, category, loans} ] }
+    """
+    window = (request.args.get("window") or "7d").strip()
+    if window not in POPULAR_WINDOWS:
+        return error_response(
+            "invalid_window",
+            f"window must be one of: {', '.join(POPULAR_WINDOWS)}.",
+            status=400,
+        )
+    try:
+        library_id = _parse_library_id(request.args)
+        limit = parse_int(
+            (request.args.get("limit") or "10").strip(),
+            field="limit",
+            error_code="invalid_limit",
+            message="limit must be an integer.",
+        )
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+    if limit <= 0 or limit > POPULAR_MAX_LIMIT:
+        return error_response(
+            "invalid_limit", f"limit must be between 1 and {POPULAR_MAX_LIMIT}.", status=400
+        )
+
+    try:
+        board = get_popular_books().get(window, library_id)
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    payload = {
+        "window": window,
+        "library_id": library_id,
+        "since": board.since,
+        "generated_at": board.generated_at,
+        "books": board.books[:limit],
+    }
+    etag = etag_for("popular", window, library_id, limit, board.generated_at)
+    return conditional_response(payload, etag, catalog_cache_control())
+
+
+@book_bp.get("/books/suggest")
+def suggest_books() -> Tuple[Response, int]:
+    """
+    GET /api/books/suggest?prefix=&limit=
+    Typeahead: books whose title / author (or a word of it) starts with prefix,
+    accent- and case-insensitive, most loaned first. limit: default 10, max 50.
+    Served from the in-process prefix index (suggest_index.py), not from Postgres.
+    """
+    prefix = request.args.get("prefix") or ""
+    if len(normalize_text(prefix)) < MIN_PREFIX_LENGTH:
+        return error_response(
+            "invalid_prefix",
+            f"prefix must be at least {MIN_PREFIX_LENGTH} characters long.",
+            status=400,
+        )
+    try:
+        limit = parse_int(
+            (request.args.get("limit") or "10").strip(),
+            field="limit",
+            error_code="invalid_limit",
+            message="limit must be an integer.",
         )
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+    if limit <= 0 or limit > 50:
+        return error_response("invalid_limit", "limit must be between 1 and 50.", status=400)
+
+    try:
+        index = ensure_suggest_index()
+    except Exception:
+        # Only the very first load reads the database
+        return error_response("db_error", "Database error occurred.", status=500)
 
-    return jsonify(result), 200
+    return jsonify(index.suggest(prefix, limit)), 200
 
 
 @book_bp.get("/books/<int:book_id>")
@@ -151,54 +954,33 @@ def get_book(book_id: int) -> Tuple[Response, int]:
     GET /api/books/<book_id>
     Return details for a single book including availability.
     Optional library_id query parameter limits counts to a single library.
+    Conditional GET via a Book.version ETag (304 after a version lookup).
     """
-    raw_library_id = (request.args.get("library_id") or "").strip()
+    try:
+        sql, params = _build_get_book_query(book_id, request.args)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
 
-    params = []
-    library_filter_sql = ""
-    if raw_library_id:
-        try:
-            library_id = parse_int(
-                raw_library_id,
-                field="library_id",
-                error_code="invalid_library_id",
-                message="library_id must be an integer.",
-            )
-        except ParseError as e:
-            return error_response(e.error_code, e.message, status=e.status)
-        library_filter_sql = " AND i.library_id = %s"
-        params.append(library_id)
-
-    sql = f"""
-        SELECT
-            b.book_id,
-            b.title,
-            b.author,
-            b.isbn,
-            b.publication_year,
-            b.category,
-            COUNT(DISTINCT i.item_id) AS total_items,
-            COUNT(DISTINCT l.item_id) AS loaned_items
-        FROM Book b
-        LEFT JOIN Item i
-            ON i.book_id = b.book_id{library_filter_sql}
-        LEFT JOIN Loan l
-            ON l.item_id = i.item_id
-           AND l.return_date IS NULL
-        WHERE b.book_id = %s
-        GROUP BY
-            b.book_id,
-            b.title,
-            b.author,
-            b.isbn,
-            b.publication_year,
-            b.category
-    """
-    params.append(book_id)
+    cache = get_catalog_cache()
+    key = ("book", sql, params)
+    bypass = cache_bypassed()
+    if not bypass:
+        entry = cache.get(key)
+        if entry is not None:
+            return _cached_response(*entry, "HIT")
+    epoch = cache.epoch()
+    cache_status = "BYPASS" if bypass else "MISS"
 
     try:
         with get_db_cursor(commit=False) as cur:
-            cur.execute(sql, tuple(params))
+            if has_conditional_request():
+                cur.execute("SELECT version FROM Book WHERE book_id = %s", (book_id,))
+                stamp = cur.fetchone()
+                if stamp is not None:
+                    etag = _book_etag(sql, params, stamp["version"])
+                    if is_not_modified(etag):
+                        return _cached_response(None, etag, cache_status)
+            cur.execute(sql, params)
             row = cur.fetchone()
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
@@ -206,22 +988,259 @@ def get_book(book_id: int) -> Tuple[Response, int]:
     if row is None:
         return error_response("book_not_found", "Book not found.", status=404)
 
-    total = row["total_items"] or 0
-    loaned = row["loaned_items"] or 0
-    available = max(total - loaned, 0)
+    payload = _serialize_book(row)
+    etag = _book_etag(sql, params, row.get("version"))
+    cache.put(key, (payload, etag), [book_id], epoch)
+    return _cached_response(payload, etag, cache_status)
+
+
+@book_bp.post("/books/batch")
+def get_books_batch() -> Tuple[Response, int]:
+    """
+    POST /api/books/batch
+    Details for many books with a single query.
+
+    Body: { "book_ids": [int, ...] (max BATCH_MAX_BOOK_IDS), "library_id": optional int }
+    Returns: { "books": [<get_book shape>, ...], "not_found": [book_id, ...] },
+    both in request order (duplicates removed). Unknown ids are listed in
+    not_found instead of failing the batch.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        sql, params, book_ids = _build_batch_books_query(data)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
 
+    try:
+        with get_db_cursor(commit=False) as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    by_id = {row["book_id"]: row for row in rows}
     return (
         jsonify(
             {
-                "book_id": row["book_id"],
-                "title": row["title"],
-                "author": row["author"],
-                "isbn": row["isbn"],
-                "publication_year": row["publication_year"],
-                "category": row["category"],
-                "total_items": int(total),
-                "available_items": int(available),
+                "books": [_serialize_book(by_id[i]) for i in book_ids if i in by_id],
+                "not_found": [i for i in book_ids if i not in by_id],
             }
         ),
         200,
     )
+
+
+@book_bp.get("/books/export")
+@role_required("admin")
+def export_books() -> Tuple[Response, int]:
+    """
+    GET /api/books/export?format=ndjson|csv (admin; default ndjson)
+    The whole catalog with availability counters, in book_id order, for bulk syncs.
+
+    Optional: library_id (counters of one library), fields (subset of BOOK_FIELDS).
+
+    The body is streamed: rows come from a server-side cursor on a dedicated
+    connection (db.RowStream), EXPORT_FETCH_ROWS at a time, so memory stays flat
+    whatever the catalog size. The statement runs before the response starts;
+    a database error mid-stream truncates the body (see the last line / row).
+    """
+    try:
+        sql, params, fmt, fields = _build_export_query(request.args)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+
+    try:
+        rows = RowStream(sql, params, itersize=EXPORT_FETCH_ROWS)
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    # The body is produced after the request context is gone: bind the encoder now
+    encode = current_app.json.dumps_bytes
+    resp = Response(
+        _export_chunks(rows, fmt, fields, encode),
+        mimetype="application/x-ndjson" if fmt == "ndjson" else "text/csv",
+    )
+    resp.call_on_close(rows.close)
+    resp.headers["Content-Disposition"] = f'attachment; filename="catalog.{fmt}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp, 200
+
+
+@book_bp.get("/books/<int:book_id>/availability")
+def get_book_availability(book_id: int) -> Tuple[Response, int]:
+    """
+    GET /api/books/<book_id>/availability
+    Per-library breakdown in one grouped query: for every library total_items,
+    loaned_items, available_items, plus the book's reservation queue length.
+
+    Conditional GET: ETag from Book.version (bumped on every counter change) and
+    the queue length; a matching If-None-Match is answered after the stamp lookup.
+    """
+    try:
+        with get_db_cursor(commit=False) as cur:
+            if has_conditional_request():
+                cur.execute(BOOK_AVAILABILITY_STAMP_SQL, (book_id,))
+                stamp = cur.fetchone()
+                if stamp is not None:
+                    etag = etag_for(
+                        "availability", book_id, stamp["version"], stamp["queue_length"]
+                    )
+                    if is_not_modified(etag):
+                        return conditional_response(None, etag, catalog_cache_control())
+            cur.execute(BOOK_AVAILABILITY_SQL, (book_id,))
+            rows = cur.fetchall()
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    if not rows:
+        return error_response("book_not_found", "Book not found.", status=404)
+
+    etag = etag_for("availability", book_id, rows[0]["version"], rows[0]["queue_length"])
+    return conditional_response(_serialize_availability(rows), etag, catalog_cache_control())
+
+
+# The book (404 if missing) with its stored neighbours, best first; the refresh
+# time and the neighbour versions make up the ETag
+BOOK_SIMILAR_SQL = """
+    SELECT
+        b.book_id,
+        st.refreshed_at,
+        s.similar_book_id,
+        s.score,
+        s.co_borrowers,
+        s.version,
+        s.title,
+        s.author,
+        s.isbn,
+        s.publication_year,
+        s.category
+    FROM Book b
+    LEFT JOIN book_similarity_state st ON st.id
+    LEFT JOIN LATERAL (
+        SELECT
+            bs.rank,
+            bs.similar_book_id,
+            bs.score,
+            bs.co_borrowers,
+            sb.version,
+            sb.title,
+            sb.author,
+            sb.isbn,
+            sb.publication_year,
+            sb.category
+        FROM book_similarity bs
+        JOIN Book sb ON sb.book_id = bs.similar_book_id
+        WHERE bs.book_id = b.book_id
+        ORDER BY bs.rank
+        LIMIT %s
+    ) s ON TRUE
+    WHERE b.book_id = %s
+    ORDER BY s.rank
+"""
+
+
+@book_bp.get("/books/<int:book_id>/similar")
+def get_similar_books(book_id: int) -> Tuple[Response, int]:
+    """
+    GET /api/books/<book_id>/similar?limit=
+    "Readers also borrowed": the books most often borrowed by the same readers,
+    precomputed by the similar-books refresh job (book_similarity.py).
+    limit: default 10, max TOP_K (20).
+    Returns: { "book_id", "similar": [ {book_id, title, author, isbn,
+      publication_year, category, score, co_borrowers} ] } (empty list before the
+      first refresh or without co-borrowed books)
+    """
+    try:
+        limit = parse_int(
+            (request.args.get("limit") or "10").strip(),
+            field="limit",
+            error_code="invalid_limit",
+            message="limit must be an integer.",
+        )
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+    if limit <= 0 or limit > SIMILAR_TOP_K:
+        return error_response(
+            "invalid_limit", f"limit must be between 1 and {SIMILAR_TOP_K}.", status=400
+        )
+
+    try:
+        with get_db_cursor(commit=False) as cur:
+            cur.execute(BOOK_SIMILAR_SQL, (limit, book_id))
+            rows = cur.fetchall()
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    if not rows:
+        return error_response("book_not_found", "Book not found.", status=404)
+
+    similar = [
+        {
+            "book_id": row["similar_book_id"],
+            "title": row["title"],
+            "author": row["author"],
+            "isbn": row["isbn"],
+            "publication_year": row["publication_year"],
+            "category": row["category"],
+            "score": round(float(row["score"]), 4),
+            "co_borrowers": row["co_borrowers"],
+        }
+        for row in rows
+        if row["similar_book_id"] is not None
+    ]
+    etag = etag_for(
+        "similar",
+        book_id,
+        limit,
+        str(rows[0]["refreshed_at"]),
+        tuple((row["similar_book_id"], row["version"]) for row in rows),
+    )
+    return conditional_response(
+        {"book_id": book_id, "similar": similar}, etag, catalog_cache_control()
+    )
+
+
+async def get_book_async(
+    book_id: int, args: Mapping[str, str], headers: Mapping[str, str]
+) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    asyncio variant of GET /api/books/<book_id> (served natively by asgi.py),
+    with the same catalog cache and Book.version conditional GET as get_book.
+    """
+    try:
+        sql, params = _build_get_book_query(book_id, args)
+    except ParseError as e:
+        return error_payload(e.error_code, e.message), e.status, {}
+
+    if_none_match = parse_etags(headers.get("if-none-match"))
+    cache = get_catalog_cache()
+    key = ("book", sql, params)
+    bypass = cache_bypassed(headers)
+    if not bypass:
+        entry = cache.get(key)
+        if entry is not None:
+            return _cached_payload(*entry, "HIT", if_none_match)
+    epoch = cache.epoch()
+    cache_status = "BYPASS" if bypass else "MISS"
+
+    try:
+        if if_none_match:
+            stamp = await async_db.fetchrow(
+                "SELECT version FROM Book WHERE book_id = %s", (book_id,)
+            )
+            if stamp is not None:
+                etag = _book_etag(sql, params, stamp["version"])
+                if is_not_modified(etag, if_none_match):
+                    return _cached_payload(None, etag, cache_status, if_none_match)
+        row = await async_db.fetchrow(sql, params)
+    except Exception:
+        logging.exception("Database error")
+        return error_payload("db_error", "Database error occurred."), 500, {}
+
+    if row is None:
+        return error_payload("book_not_found", "Book not found."), 404, {}
+
+    payload = _serialize_book(row)
+    etag = _book_etag(sql, params, row.get("version"))
+    cache.put(key, (payload, etag), [book_id], epoch)
+    return _cached_payload(payload, etag, cache_status, if_none_match)
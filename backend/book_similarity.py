@@ -0,0 +1,277 @@
+"""
+book_similarity: "readers also borrowed" neighbours of every book.
+
+Two books are similar when the same readers borrowed both. The job builds the
+sparse reader x book matrix A (1 where the reader ever borrowed the book) from
+Loan / Item, computes the book x book co-occurrence counts C = A^T A with
+SciPy, scores each pair by cosine similarity
+
+    score(i, j) = C[i, j] / sqrt(borrowers(i) * borrowers(j))
+
+and stores the TOP_K best neighbours per book in book_similarity
+(database/table.sql), which GET /api/books/<id>/similar reads.
+
+The Loan watermark (last loan_id included) is kept in book_similarity_state.
+An incremental refresh only looks at loans after it: a new (reader, book) pair
+changes the rows of the books that reader has borrowed, so only those rows are
+recomputed (exactly, from every reader of those books). Rows of other books
+keep their old scores until the next full refresh, even if a neighbour's
+borrower count has grown; a loan whose id is below the watermark but committed
+after the previous run is also only picked up by a full refresh. Exposed as
+
+    flask --app app similar-books refresh [--full]
+
+and as an admin endpoint (see admin_routes.py). Needs numpy and scipy.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import click
+from flask.cli import AppGroup
+
+from db import get_db_cursor
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - optional, only the refresh job needs them
+    np = None
+    sparse = None
+
+# Neighbours stored per book (GET /books/<id>/similar limit is capped to this)
+TOP_K = 20
+
+# Pairs borrowed together by fewer readers are not stored
+MIN_CO_BORROWERS = 1
+
+# Serializes refresh jobs; readers of book_similarity are not blocked
+LOCK_SQL = "LOCK TABLE book_similarity_state IN SHARE ROW EXCLUSIVE MODE"
+
+STATE_SQL = "SELECT last_loan_id FROM book_similarity_state WHERE id"
+
+MAX_LOAN_ID_SQL = "SELECT COALESCE(MAX(loan_id), 0) AS loan_id FROM Loan"
+
+# Distinct (reader, book) pairs as two parallel arrays (one row, not one per pair)
+ALL_PAIRS_SQL = """
+    SELECT
+        COALESCE(array_agg(p.user_id), '{}') AS user_ids,
+        COALESCE(array_agg(p.book_id), '{}') AS book_ids
+    FROM (
+        SELECT DISTINCT l.user_id, i.book_id
+        FROM Loan l
+        JOIN Item i ON i.item_id = l.item_id
+        WHERE l.loan_id <= %(upto)s
+    ) p
+"""
+
+# Books whose row changes: every book of a reader who borrowed a book for the
+# first time in (since, upto]
+AFFECTED_BOOKS_SQL = """
+    WITH new_readers AS (
+        SELECT DISTINCT l.user_id
+        FROM Loan l
+        JOIN Item i ON i.item_id = l.item_id
+        WHERE l.loan_id > %(since)s
+          AND l.loan_id <= %(upto)s
+          AND NOT EXISTS (
+              SELECT 1
+              FROM Loan p
+              JOIN Item pi ON pi.item_id = p.item_id
+              WHERE p.user_id = l.user_id
+                AND pi.book_id = i.book_id
+                AND p.loan_id <= %(since)s
+          )
+    )
+    SELECT COALESCE(array_agg(DISTINCT i.book_id), '{}') AS book_ids
+    FROM new_readers n
+    JOIN Loan l ON l.user_id = n.user_id
+    JOIN Item i ON i.item_id = l.item_id
+    WHERE l.loan_id <= %(upto)s
+"""
+
+# Every (reader, book) pair of the readers of the given books
+READER_PAIRS_SQL = """
+    WITH readers AS (
+        SELECT DISTINCT l.user_id
+        FROM Item i
+        JOIN Loan l ON l.item_id = i.item_id
+        WHERE i.book_id = ANY(%(books)s)
+          AND l.loan_id <= %(upto)s
+    )
+    SELECT
+        COALESCE(array_agg(p.user_id), '{}') AS user_ids,
+        COALESCE(array_agg(p.book_id), '{}') AS book_ids
+    FROM (
+        SELECT DISTINCT l.user_id, i.book_id
+        FROM readers r
+        JOIN Loan l ON l.user_id = r.user_id
+        JOIN Item i ON i.item_id = l.item_id
+        WHERE l.loan_id <= %(upto)s
+    ) p
+"""
+
+# Total distinct readers of the given books (the cosine norms)
+BORROWERS_SQL = """
+    SELECT
+        COALESCE(array_agg(c.book_id), '{}') AS book_ids,
+        COALESCE(array_agg(c.borrowers), '{}') AS borrowers
+    FROM (
+        SELECT i.book_id, COUNT(DISTINCT l.user_id)::int AS borrowers
+        FROM Item i
+        JOIN Loan l ON l.item_id = i.item_id
+        WHERE i.book_id = ANY(%(books)s)
+          AND l.loan_id <= %(upto)s
+        GROUP BY i.book_id
+    ) c
+"""
+
+# Books deleted since the pairs were read are skipped (Book joins)
+INSERT_SQL = """
+    INSERT INTO book_similarity (book_id, similar_book_id, rank, score, co_borrowers)
+    SELECT n.book_id, n.similar_book_id, n.rank, n.score, n.co_borrowers
+    FROM unnest(%s::int[], %s::int[], %s::smallint[], %s::real[], %s::int[])
+        AS n (book_id, similar_book_id, rank, score, co_borrowers)
+    JOIN Book b ON b.book_id = n.book_id
+    JOIN Book s ON s.book_id = n.similar_book_id
+"""
+
+SAVE_STATE_SQL = """
+    INSERT INTO book_similarity_state (id, last_loan_id, refreshed_at)
+    VALUES (TRUE, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (id) DO UPDATE
+    SET last_loan_id = EXCLUDED.last_loan_id,
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+
+class SimilarityUnavailable(RuntimeError):
+    """numpy / scipy are not installed."""
+
+
+def top_neighbors(
+    user_ids: Sequence[int],
+    book_ids: Sequence[int],
+    rows: Optional[Sequence[int]] = None,
+    borrowers: Optional[Tuple[Sequence[int], Sequence[int]]] = None,
+    top_k: int = TOP_K,
+    min_co_borrowers: int = MIN_CO_BORROWERS,
+) -> Tuple[Any, Any, Any, Any, Any]:
+    """
+    Top-k most similar books of every book in rows (default: every book).
+
+    user_ids / book_ids: parallel arrays of distinct (reader, book) pairs; they
+    must contain every reader of the books in rows. borrowers: (book_ids, counts)
+    of total readers per book, needed when the pairs are only a subset of all
+    readers (default: counted from the pairs).
+    Returns parallel arrays (book_id, similar_book_id, rank, score, co_borrowers),
+    ordered by book_id then rank.
+    """
+    if np is None or sparse is None:
+        raise SimilarityUnavailable("numpy and scipy are required (pip install numpy scipy).")
+
+    _, readers = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+    books, cols = np.unique(np.asarray(book_ids, dtype=np.int64), return_inverse=True)
+    a = sparse.csc_matrix(
+        (np.ones(len(cols), dtype=np.int32), (readers, cols)),
+        shape=(int(readers.max(initial=-1)) + 1, len(books)),
+    )
+
+    if borrowers is None:
+        norms = np.asarray(a.sum(axis=0), dtype=np.float64).ravel()
+    else:
+        norms = np.zeros(len(books), dtype=np.float64)
+        known = np.asarray(borrowers[0], dtype=np.int64)
+        norms[np.searchsorted(books, known)] = np.asarray(borrowers[1], dtype=np.float64)
+
+    row_idx = np.arange(len(books)) if rows is None else np.flatnonzero(np.isin(books, rows))
+
+    # Co-occurrence counts of the requested rows against every book
+    co = (a[:, row_idx].T @ a).tocoo()
+    r, c, counts = row_idx[co.row], co.col, co.data
+    keep = (r != c) & (counts >= min_co_borrowers)
+    r, c, counts = r[keep], c[keep], counts[keep]
+    scores = counts / np.sqrt(norms[r] * norms[c])
+
+    # Per row: best score first, ties by more co-borrowers, then lower book_id
+    order = np.lexsort((books[c], -counts, -scores, r))
+    r, c, counts, scores = r[order], c[order], counts[order], scores[order]
+    row_starts = np.flatnonzero(np.r_[True, r[1:] != r[:-1]]) if len(r) else np.array([], int)
+    rank = np.arange(len(r)) - np.repeat(row_starts, np.diff(np.r_[row_starts, len(r)]))
+    keep = rank < top_k
+
+    return books[r[keep]], books[c[keep]], rank[keep] + 1, scores[keep], counts[keep]
+
+
+def refresh_book_similarity(full: bool = False) -> Dict[str, Any]:
+    """
+    Recompute book_similarity in one transaction: every row (full, or no
+    watermark yet) or only the rows changed by loans after the watermark.
+    Returns { "mode", "last_loan_id", "books", "rows" } (books recomputed,
+    neighbour rows written).
+    """
+    if np is None or sparse is None:
+        raise SimilarityUnavailable("numpy and scipy are required (pip install numpy scipy).")
+
+    with get_db_cursor(commit=True) as cur:
+        cur.execute(LOCK_SQL)
+        cur.execute(STATE_SQL)
+        state = cur.fetchone()
+        cur.execute(MAX_LOAN_ID_SQL)
+        upto = int(cur.fetchone()["loan_id"])
+
+        if full or state is None:
+            mode = "full"
+            cur.execute(ALL_PAIRS_SQL, {"upto": upto})
+            pairs = cur.fetchone()
+            rows: Optional[List[int]] = None
+            borrowers = None
+        else:
+            mode = "incremental"
+            since = int(state["last_loan_id"])
+            rows = []
+            if upto > since:
+                cur.execute(AFFECTED_BOOKS_SQL, {"since": since, "upto": upto})
+                rows = cur.fetchone()["book_ids"]
+            if not rows:
+                cur.execute(SAVE_STATE_SQL, (upto,))
+                return {"mode": mode, "last_loan_id": upto, "books": 0, "rows": 0}
+
+            cur.execute(READER_PAIRS_SQL, {"books": rows, "upto": upto})
+            pairs = cur.fetchone()
+            cur.execute(BORROWERS_SQL, {"books": sorted(set(pairs["book_ids"])), "upto": upto})
+            counts = cur.fetchone()
+            borrowers = (counts["book_ids"], counts["borrowers"])
+
+        result = top_neighbors(pairs["user_ids"], pairs["book_ids"], rows=rows, borrowers=borrowers)
+
+        if rows is None:
+            cur.execute("DELETE FROM book_similarity")
+        else:
+            cur.execute("DELETE FROM book_similarity WHERE book_id = ANY(%s)", (rows,))
+        cur.execute(INSERT_SQL, tuple(column.tolist() for column in result))
+        written = cur.rowcount
+        cur.execute(SAVE_STATE_SQL, (upto,))
+
+    return {
+        "mode": mode,
+        "last_loan_id": upto,
+        "books": len(set(pairs["book_ids"])) if rows is None else len(rows),
+        "rows": written,
+    }
+
+
+similarity_cli = AppGroup("similar-books", help="Maintain the book_similarity table.")
+
+
+@similarity_cli.command("refresh")
+@click.option("--full", is_flag=True, help="Recompute every book, not only those with new loans.")
+def refresh_command(full: bool) -> None:
+    """Recompute "readers also borrowed" neighbours from Loan."""
+    try:
+        result = refresh_book_similarity(full=full)
+    except SimilarityUnavailable as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        f"book_similarity {result['mode']} refresh up to loan_id {result['last_loan_id']}: "
+        f"{result['books']} books, {result['rows']} neighbour rows written."
+    )
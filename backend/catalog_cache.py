@@ -0,0 +1,162 @@
+"""
+In-process LRU/TTL cache for catalog responses (GET /api/books, /api/books/<id>).
+
+Entries are keyed by the normalized query (statement shape + parameters) and tagged
+with the book_ids they contain, so a loan or return only drops the entries that
+show that book. Catalog-wide changes (imports, availability rebuilds) clear it.
+
+Invalidation is per process: with several workers, the other processes' entries
+expire after CATALOG_CACHE_TTL_S at the latest.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Mapping, Optional, Set, Tuple
+
+from flask import request
+
+BYPASS_HEADER = "X-Cache-Bypass"
+
+
+class CatalogCache:
+    """
+    Bounded, thread-safe LRU cache with a per-entry TTL and tag (book_id) invalidation.
+
+    Readers take epoch() before querying the database and pass it to put(): if one of
+    the entry's books (or the whole cache) was invalidated in the meantime, the
+    possibly stale result is not stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Tuple[int, ...]]]" = OrderedDict()
+        self._by_book: Dict[int, Set[Hashable]] = {}
+        self._epoch = 0
+        self._book_epoch: Dict[int, int] = {}
+        self._clear_epoch = 0
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_puts": 0,
+        }
+
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, book_ids: Iterable[int], epoch: int) -> None:
+        if self.max_entries <= 0:
+            return
+        tags = tuple(set(book_ids))
+        with self._lock:
+            if self._clear_epoch > epoch or any(
+                self._book_epoch.get(book_id, 0) > epoch for book_id in tags
+            ):
+                self._stats["stale_puts"] += 1
+                return
+
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for book_id in tags:
+                self._by_book.setdefault(book_id, set()).add(key)
+
+    def invalidate_books(self, book_ids: Iterable[int]) -> None:
+        """Drop every entry that contains one of the given books."""
+        with self._lock:
+            self._epoch += 1
+            for book_id in set(book_ids):
+                self._book_epoch[book_id] = self._epoch
+                for key in list(self._by_book.get(book_id, ())):
+                    self._remove(key)
+                    self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Drop everything (catalog-wide changes)."""
+        with self._lock:
+            self._epoch += 1
+            self._clear_epoch = self._epoch
+            self._book_epoch.clear()
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._by_book.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                **self._stats,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller holds self._lock
+        _, _, tags = self._entries.pop(key)
+        for book_id in tags:
+            keys = self._by_book.get(book_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_book[book_id]
+
+
+_cache: Optional[CatalogCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_catalog_cache() -> CatalogCache:
+    """
+    Return the process-wide catalog cache.
+    CATALOG_CACHE_MAX_ENTRIES (default 1024, 0 disables), CATALOG_CACHE_TTL_S (default 30).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CatalogCache(
+                    max_entries=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024")),
+                    ttl=float(os.getenv("CATALOG_CACHE_TTL_S", "30")),
+                )
+    return _cache
+
+
+def cache_bypassed(headers: Optional[Mapping[str, str]] = None) -> bool:
+    """
+    True if the request asks to skip the cache (X-Cache-Bypass: 1), for debugging.
+    headers: asgi.py request headers (lower-case names); default the Flask request's.
+    """
+    if headers is None:
+        value = request.headers.get(BYPASS_HEADER, "")
+    else:
+        value = headers.get(BYPASS_HEADER.lower(), "")
+    return value.strip().lower() in ("1", "true", "yes")
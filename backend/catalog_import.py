@@ -0,0 +1,364 @@
+"""
+Bulk catalog import (publisher feeds): CSV or NDJSON rows of books and items.
+
+Each row is one book, optionally with one item (copy) of it:
+
+    isbn,title,author,publication_year,category,library_id,shelf_mark,item_condition
+
+(CSV: header line with any subset / order of these columns; NDJSON: one object
+per line with the same keys.) Both formats are parsed row by row and streamed
+with COPY into a temporary staging table (constant memory, whatever the size);
+a row that cannot be parsed (invalid JSON, a CSV line with the wrong number of
+fields, invalid UTF-8) is staged as a reject instead of failing the COPY. Rows
+are validated there against the Book / Item constraints, then upserted in
+set-based statements:
+
+  - Book keyed on isbn (title, author, year, category updated if they differ)
+  - Item keyed on (library_id, shelf_mark) (book and condition updated)
+
+Rejected rows are counted per reason; everything else is imported in the same
+transaction. Exposed as
+
+    flask --app app catalog import FILE [--format csv|ndjson]
+
+and as an admin endpoint (see admin_routes.py).
+"""
+
+import csv
+import io
+import json
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+
+import click
+from flask.cli import AppGroup
+
+from catalog_cache import get_catalog_cache
+from db import get_db_cursor, on_commit
+from parse_utils import ParseError
+from suggest_index import preload_suggest_index
+
+IMPORT_COLUMNS = (
+    "isbn",
+    "title",
+    "author",
+    "publication_year",
+    "category",
+    "library_id",
+    "shelf_mark",
+    "item_condition",
+)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Mirrors check_item_condition in database/table.sql
+ITEM_CONDITIONS = ("good", "average", "worn", "new", "pending scrap")
+
+# Everything is text, so COPY itself never rejects a value; parse_error is set
+# for rows that could not be parsed (invalid_json / invalid_csv)
+STAGING_SQL = """
+    CREATE TEMPORARY TABLE catalog_import_staging (
+        row_no BIGINT GENERATED ALWAYS AS IDENTITY,
+        isbn TEXT,
+        title TEXT,
+        author TEXT,
+        publication_year TEXT,
+        category TEXT,
+        library_id TEXT,
+        shelf_mark TEXT,
+        item_condition TEXT,
+        parse_error TEXT,
+        reject_reason TEXT
+    ) ON COMMIT DROP
+"""
+
+# First failing check per row; same limits as the Book / Item columns and CHECKs
+VALIDATE_SQL = """
+    UPDATE catalog_import_staging s
+    SET reject_reason = CASE
+        WHEN s.parse_error IS NOT NULL THEN s.parse_error
+        WHEN s.isbn IS NULL THEN 'missing_isbn'
+        WHEN s.title IS NULL THEN 'missing_title'
+        WHEN s.author IS NULL THEN 'missing_author'
+        WHEN length(s.isbn) > 17 THEN 'isbn_too_long'
+        WHEN length(s.title) > 255 THEN 'title_too_long'
+        WHEN length(s.author) > 100 THEN 'author_too_long'
+        WHEN length(s.category) > 50 THEN 'category_too_long'
+        WHEN s.publication_year IS NOT NULL AND s.publication_year !~ '^[0-9]{1,9}$'
+            THEN 'invalid_publication_year'
+        WHEN s.publication_year::int <= 1000 THEN 'invalid_publication_year'
+        WHEN num_nulls(s.library_id, s.shelf_mark) = 1 THEN 'incomplete_item'
+        WHEN s.library_id IS NULL THEN NULL
+        WHEN s.library_id !~ '^[0-9]{1,9}$' THEN 'invalid_library_id'
+        WHEN NOT EXISTS (SELECT 1 FROM Library l WHERE l.library_id = s.library_id::int)
+            THEN 'unknown_library'
+        WHEN length(s.shelf_mark) > 50 THEN 'shelf_mark_too_long'
+        WHEN COALESCE(s.item_condition, 'good') <> ALL (%s) THEN 'invalid_item_condition'
+    END
+"""
+
+REJECTED_SQL = """
+    SELECT reject_reason, COUNT(*)::int AS row_count
+    FROM catalog_import_staging
+    WHERE reject_reason IS NOT NULL
+    GROUP BY reject_reason
+    ORDER BY reject_reason
+"""
+
+# The last row wins when an isbn / shelf mark occurs more than once
+UPSERT_BOOKS_SQL = """
+    WITH upserted AS (
+        INSERT INTO Book (isbn, title, author, publication_year, category)
+        SELECT DISTINCT ON (isbn)
+            isbn, title, author, publication_year::int, category
+        FROM catalog_import_staging
+        WHERE reject_reason IS NULL
+        ORDER BY isbn, row_no DESC
+        ON CONFLICT (isbn) DO UPDATE
+        SET title = EXCLUDED.title,
+            author = EXCLUDED.author,
+            publication_year = EXCLUDED.publication_year,
+            category = EXCLUDED.category
+        WHERE (Book.title, Book.author, Book.publication_year, Book.category)
+              IS DISTINCT FROM
+              (EXCLUDED.title, EXCLUDED.author, EXCLUDED.publication_year, EXCLUDED.category)
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        COUNT(*) FILTER (WHERE inserted)::int AS inserted,
+        COUNT(*) FILTER (WHERE NOT inserted)::int AS updated
+    FROM upserted
+"""
+
+UPSERT_ITEMS_SQL = """
+    WITH upserted AS (
+        INSERT INTO Item (book_id, library_id, item_condition, shelf_mark)
+        SELECT DISTINCT ON (s.library_id::int, s.shelf_mark)
+            b.book_id, s.library_id::int, COALESCE(s.item_condition, 'good'), s.shelf_mark
+        FROM catalog_import_staging s
+        JOIN Book b ON b.isbn = s.isbn
+        WHERE s.reject_reason IS NULL AND s.shelf_mark IS NOT NULL
+        ORDER BY s.library_id::int, s.shelf_mark, s.row_no DESC
+        ON CONFLICT (library_id, shelf_mark) DO UPDATE
+        SET book_id = EXCLUDED.book_id,
+            item_condition = EXCLUDED.item_condition
+        WHERE (Item.book_id, Item.item_condition)
+              IS DISTINCT FROM (EXCLUDED.book_id, EXCLUDED.item_condition)
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        COUNT(*) FILTER (WHERE inserted)::int AS inserted,
+        COUNT(*) FILTER (WHERE NOT inserted)::int AS updated
+    FROM upserted
+"""
+
+
+COPY_SQL = (
+    f"COPY catalog_import_staging ({', '.join(IMPORT_COLUMNS)}, parse_error) "
+    "FROM STDIN WITH (FORMAT csv, HEADER false)"
+)
+
+
+# Empty / whitespace-only fields become NULL
+NORMALIZE_SQL = """
+    UPDATE catalog_import_staging
+    SET isbn = NULLIF(btrim(isbn), ''),
+        title = NULLIF(btrim(title), ''),
+        author = NULLIF(btrim(author), ''),
+        publication_year = NULLIF(btrim(publication_year), ''),
+        category = NULLIF(btrim(category), ''),
+        library_id = NULLIF(btrim(library_id), ''),
+        shelf_mark = NULLIF(btrim(shelf_mark), ''),
+        item_condition = NULLIF(lower(btrim(item_condition)), '')
+"""
+
+
+def _rejected_row(reason: str) -> List[str]:
+    return [""] * len(IMPORT_COLUMNS) + [reason]
+
+
+def _staged_row(values: List[str], parse_error: str) -> List[str]:
+    """Values + an empty parse_error, or a reject row if Postgres text cannot hold them."""
+    text = "".join(values)
+    try:
+        # Undecodable input bytes arrive as surrogates, which do not encode
+        text.encode("utf-8")
+    except UnicodeEncodeError:
+        return _rejected_row(parse_error)
+    if "\x00" in text:
+        return _rejected_row(parse_error)
+    return values + [""]
+
+
+def _ndjson_rows(stream: IO[bytes]) -> Iterator[List[str]]:
+    for raw in stream:
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            doc = json.loads(line)
+            if not isinstance(doc, dict):
+                raise ValueError("not an object")
+        except ValueError:
+            yield _rejected_row("invalid_json")
+            continue
+        values = ["" if doc.get(c) is None else str(doc.get(c)) for c in IMPORT_COLUMNS]
+        yield _staged_row(values, "invalid_json")
+
+
+def _csv_rows(stream: IO[bytes], columns: List[str]) -> Iterator[List[str]]:
+    # Undecodable bytes survive decoding as surrogates and reject only their row
+    lines: Iterable[str] = (raw.decode("utf-8", "surrogateescape") for raw in stream)
+    reader = csv.reader(lines)
+    while True:
+        try:
+            fields = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield _rejected_row("invalid_csv")
+            continue
+        if not fields or fields == [""]:
+            continue
+        if len(fields) != len(columns):
+            yield _rejected_row("invalid_csv")
+            continue
+        by_column = dict(zip(columns, fields))
+        yield _staged_row([by_column.get(c, "") for c in IMPORT_COLUMNS], "invalid_csv")
+
+
+class _RowsAsCsv(io.RawIOBase):
+    """
+    Read-only stream that writes staged rows (IMPORT_COLUMNS + parse_error) as
+    CSV for COPY, one row at a time.
+    """
+
+    def __init__(self, rows: Iterator[List[str]]) -> None:
+        self._rows = rows
+        self._buffer = b""
+        self._out = io.StringIO()
+        self._writer = csv.writer(self._out, lineterminator="\n")
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_chunk(self) -> bytes:
+        for values in self._rows:
+            self._out.seek(0)
+            self._out.truncate()
+            self._writer.writerow(values)
+            return self._out.getvalue().encode("utf-8")
+        return b""
+
+    def readinto(self, b: Any) -> int:
+        while not self._buffer:
+            self._buffer = self._next_chunk()
+            if not self._buffer:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _csv_columns(header_line: bytes) -> List[str]:
+    """Column list of a CSV header line; ParseError if empty or unknown / duplicate columns."""
+    try:
+        header = next(csv.reader([header_line.decode("utf-8-sig")]), [])
+    except UnicodeDecodeError:
+        header = []
+    columns = [c.strip().lower() for c in header]
+    if (
+        not columns
+        or any(c not in IMPORT_COLUMNS for c in columns)
+        or len(set(columns)) != len(columns)
+    ):
+        raise ParseError(
+            error_code="invalid_import_header",
+            message="CSV header must list columns from: " + ", ".join(IMPORT_COLUMNS) + ".",
+            status=400,
+        )
+    return columns
+
+
+def import_catalog(stream: IO[bytes], fmt: str = "csv") -> Dict[str, Any]:
+    """
+    Import a CSV / NDJSON byte stream in one transaction.
+    Returns {"rows", "books_inserted", "books_updated", "items_inserted",
+    "items_updated", "rejected": {reason: count}}.
+    Raises ParseError for an unknown format or a bad CSV header; unparseable
+    rows are counted in rejected (invalid_json / invalid_csv).
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ParseError(
+            error_code="invalid_format",
+            message="format must be one of: csv, ndjson.",
+            status=400,
+        )
+
+    if fmt == "csv":
+        rows = _csv_rows(stream, _csv_columns(stream.readline()))
+    else:
+        rows = _ndjson_rows(stream)
+    source = io.BufferedReader(_RowsAsCsv(rows), buffer_size=64 * 1024)
+
+    with get_db_cursor(commit=True) as cur:
+        cur.execute(STAGING_SQL)
+        cur.copy_expert(COPY_SQL, source, size=64 * 1024)
+        row_count = cur.rowcount
+        cur.execute(NORMALIZE_SQL)
+        # Temporary tables are never auto-analyzed; the upsert joins need row estimates
+        cur.execute("ANALYZE catalog_import_staging")
+        cur.execute(VALIDATE_SQL, (list(ITEM_CONDITIONS),))
+        cur.execute(REJECTED_SQL)
+        rejected = {row["reject_reason"]: row["row_count"] for row in cur.fetchall()}
+        cur.execute(UPSERT_BOOKS_SQL)
+        books = cur.fetchone()
+        cur.execute(UPSERT_ITEMS_SQL)
+        items = cur.fetchone()
+
+    # New / changed books and copies: drop cached listings, refresh the typeahead index
+    on_commit(get_catalog_cache().clear)
+    on_commit(preload_suggest_index)
+    return {
+        "rows": row_count,
+        "books_inserted": books["inserted"],
+        "books_updated": books["updated"],
+        "items_inserted": items["inserted"],
+        "items_updated": items["updated"],
+        "rejected": rejected,
+    }
+
+
+def _format_for(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+catalog_cli = AppGroup("catalog", help="Catalog maintenance.")
+
+
+@catalog_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(IMPORT_FORMATS),
+    default=None,
+    help="Default: ndjson for .ndjson / .jsonl files, otherwise csv.",
+)
+def import_command(path: str, fmt: Optional[str]) -> None:
+    """Import books and items from a CSV / NDJSON feed."""
+    with open(path, "rb") as f:
+        try:
+            result = import_catalog(f, _format_for(path, fmt))
+        except ParseError as e:
+            raise click.ClickException(e.message)
+
+    click.echo(
+        f"{result['rows']} rows: books {result['books_inserted']} inserted / "
+        f"{result['books_updated']} updated, items {result['items_inserted']} inserted / "
+        f"{result['items_updated']} updated."
+    )
+    for reason, count in result["rejected"].items():
+        click.echo(f"rejected {reason}: {count}")
@@ -0,0 +1,205 @@
+"""
+Response compression (Content-Encoding: br / gzip) negotiated from Accept-Encoding.
+
+Registered by create_app (init_app); asgi.py uses the same helpers for the routes
+it serves natively.
+
+  - only bodies of at least COMPRESSION_MIN_BYTES (default 1024) are compressed:
+    small JSON objects and errors are not worth the CPU and the extra headers
+  - media types that are compressed already (images, archives, ...) pass through
+  - streamed responses are compressed chunk by chunk, each chunk flushed, so the
+    client still receives rows as they are produced
+
+brotli is optional (pip install brotli); without it only gzip is offered.
+
+A compressed body is a different byte sequence, so it gets its own strong ETag,
+"<etag>-gzip" / "<etag>-br" (http_cache.encoded_etag); http_cache.is_not_modified
+strips the suffix when comparing If-None-Match, so revalidation works for every
+encoding.
+"""
+
+import gzip
+import hashlib
+import os
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Flask, Response, request
+from werkzeug.http import parse_accept_header, quote_etag, unquote_etag
+
+from http_cache import encoded_etag, is_not_modified
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip only without it
+    brotli = None
+
+# Per-request compression: fast settings (static files use the maximum, once)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_INCOMPRESSIBLE_PREFIXES = ("image/", "audio/", "video/", "font/woff")
+_INCOMPRESSIBLE_TYPES = {
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-brotli",
+    "application/zip",
+    "application/zstd",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/pdf",
+    "application/octet-stream",
+}
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Content codings offered, in order of preference."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compression_min_bytes() -> int:
+    return int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported coding allowed by an Accept-Encoding header (q > 0), or None."""
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(supported_encodings())
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    if not mimetype:
+        return False
+    if mimetype == "image/svg+xml":
+        return True
+    return mimetype not in _INCOMPRESSIBLE_TYPES and not mimetype.startswith(
+        _INCOMPRESSIBLE_PREFIXES
+    )
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress an iterable of chunks incrementally, flushing after every chunk."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+        def _step(chunk: bytes) -> bytes:
+            return compressor.process(chunk) + compressor.flush()
+
+        def _finish() -> bytes:
+            return compressor.finish()
+
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        def _step(chunk: bytes) -> bytes:
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        def _finish() -> bytes:
+            return compressor.flush()
+
+    try:
+        for chunk in chunks:
+            out = _step(chunk)
+            if out:
+                yield out
+        yield _finish()
+    finally:
+        # Release the producer (e.g. a server-side cursor) if the client goes away
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def encoded_etag_header(etag_header: str, encoding: str) -> str:
+    """ETag header value for the body compressed with encoding (asgi.py)."""
+    etag, weak = unquote_etag(etag_header)
+    return quote_etag(encoded_etag(etag, encoding), weak=weak) if etag else etag_header
+
+
+def _encode_etag(resp: Response, encoding: str) -> None:
+    etag, weak = resp.get_etag()
+    if etag:
+        resp.set_etag(encoded_etag(etag, encoding), weak=weak)
+
+
+def compress_response(resp: Response, accept_encoding: Optional[str], min_bytes: int) -> Response:
+    """Compress resp in place if the client accepts a supported coding and it is worth it."""
+    if (
+        resp.status_code < 200
+        or resp.status_code in (204, 304)
+        or resp.direct_passthrough
+        or "Content-Encoding" in resp.headers
+        or not is_compressible(resp.mimetype)
+    ):
+        return resp
+
+    resp.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return resp
+
+    if resp.is_streamed:
+        # Size unknown up front: always compressed
+        resp.response = _compress_stream(resp.iter_encoded(), encoding)
+        resp.headers.pop("Content-Length", None)
+    else:
+        data = resp.get_data()
+        if len(data) < min_bytes:
+            return resp
+        resp.set_data(compress(data, encoding))
+
+    resp.headers["Content-Encoding"] = encoding
+    _encode_etag(resp, encoding)
+    return resp
+
+
+class PrecompressedFile:
+    """
+    A static file read once, with every supported encoding compressed ahead of
+    time at the highest level, served with an ETag of its content.
+    """
+
+    def __init__(self, path: str, mimetype: str) -> None:
+        with open(path, "rb") as f:
+            data = f.read()
+        self.mimetype = mimetype
+        self.etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+        self.variants: Dict[Optional[str], bytes] = {
+            None: data,
+            "gzip": gzip.compress(data, compresslevel=9, mtime=0),
+        }
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(data, quality=11)
+
+    def response(self) -> Response:
+        """Response for the current request (negotiated encoding, 304 if current)."""
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+        if is_not_modified(self.etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(self.variants[encoding], mimetype=self.mimetype)
+            if encoding is not None:
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(self.etag if encoding is None else encoded_etag(self.etag, encoding))
+        resp.vary.add("Accept-Encoding")
+        resp.headers["Cache-Control"] = "public, no-cache"
+        return resp
+
+
+def init_app(app: Flask) -> None:
+    """
+    Compress responses after every other after_request hook has run: register this
+    before them (Flask runs the hooks in reverse order of registration).
+    """
+    min_bytes = compression_min_bytes()
+
+    @app.after_request
+    def _compress_response(resp):
+        return compress_response(resp, request.headers.get("Accept-Encoding"), min_bytes)
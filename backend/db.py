@@ -1,25 +1,304 @@
+import functools
+import itertools
+import json
 import logging
 import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
 from contextlib import contextmanager
-from typing import Iterator
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 
 import psycopg2
+from flask import Flask, current_app, g, has_request_context, request
 from psycopg2.extensions import connection as PGConnection
 from psycopg2.extras import RealDictCursor
 
+from response_utils import error_response
 
-def get_db_connection() -> PGConnection:
+
+class PooledConnection(PGConnection):
+    """
+    psycopg2 connection subclass so the pool can keep bookkeeping attributes
+    (creation / last release time) directly on the connection object.
+    """
+
+    pool_created_at: float = 0.0
+    pool_released_at: float = 0.0
+    prepared_max: int = 0
+    prepared_statements: "OrderedDict[str, str]"
+    prepared_rejected: set
+
+
+_PARAM_TOKEN_RE = re.compile(r"%(.)", re.S)
+_PREPARABLE_KEYWORDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+_prepared_ids = itertools.count(1)
+_prepared_lock = threading.Lock()
+_prepared_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "failures": 0}
+
+
+def _count_prepared(key: str) -> None:
+    with _prepared_lock:
+        _prepared_stats[key] += 1
+
+
+def prepared_statement_stats() -> Dict[str, int]:
+    """Process-wide prepared statement cache counters."""
+    with _prepared_lock:
+        return dict(_prepared_stats)
+
+
+def to_server_params(sql: str) -> Optional[Tuple[str, int]]:
+    """
+    Convert a psycopg2-style statement (%s placeholders, %% escapes) into
+    server-side form ($1, $2, ...). Returns (sql, parameter count), or None if the
+    statement should not be prepared (named placeholders, utility statements).
+    """
+    words = sql.split(None, 1)
+    if not words or words[0].upper() not in _PREPARABLE_KEYWORDS:
+        return None
+
+    count = 0
+    parts: List[str] = []
+    pos = 0
+    for m in _PARAM_TOKEN_RE.finditer(sql):
+        token = m.group(1)
+        if token == "%":
+            repl = "%"
+        elif token == "s":
+            count += 1
+            repl = f"${count}"
+        else:
+            return None
+        parts.append(sql[pos : m.start()])
+        parts.append(repl)
+        pos = m.end()
+    parts.append(sql[pos:])
+    return "".join(parts), count
+
+
+_NORMALIZE_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\s+")
+_SLOW_QUERY_SQL_MAX = 1000
+
+slow_query_log = logging.getLogger("db.slow_query")
+
+
+def normalize_sql(sql: Any) -> str:
+    """
+    Collapse whitespace and replace string / numeric literals with '?', so the same
+    statement logs identically whatever values were inlined into it.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    elif not isinstance(sql, str):
+        sql = str(sql)
+    return _NORMALIZE_RE.sub(_normalize_token, sql).strip()[:_SLOW_QUERY_SQL_MAX]
+
+
+def _normalize_token(m: "re.Match[str]") -> str:
+    return " " if m.group(0).isspace() else "?"
+
+
+class RequestDBStats:
+    """
+    Database usage of one HTTP request (kept on flask.g, see request_db_stats()):
+    statement count, total statement + commit time, pool acquire wait, slowest statement.
+    """
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.acquire_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_sql: Optional[str] = None
+
+    def add_query(self, sql: Any, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_sql = sql
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in milliseconds)."""
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="queries={self.queries}", '
+            f"db-acquire;dur={self.acquire_seconds * 1000:.2f}, "
+            f"db-slowest;dur={self.slowest_seconds * 1000:.2f}"
+        )
+
+
+def request_db_stats(create: bool = False) -> Optional[RequestDBStats]:
+    """Current request's RequestDBStats (None outside a request or if no DB work was done)."""
+    if not has_request_context():
+        return None
+    stats = g.get("_db_stats")
+    if stats is None and create:
+        stats = g._db_stats = RequestDBStats()
+    return stats
+
+
+def _slow_query_threshold_ms() -> float:
+    """DB_SLOW_QUERY_MS: statements at least this slow are logged (default 500, 0 disables)."""
+    try:
+        return float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+    except ValueError:
+        return 0.0
+
+
+def _record_acquire(seconds: float) -> None:
+    stats = request_db_stats(create=True)
+    if stats is not None:
+        stats.acquire_seconds += seconds
+
+
+def _record_query(sql: Any, seconds: float) -> None:
+    stats = request_db_stats(create=True)
+    if stats is not None:
+        stats.add_query(sql, seconds)
+
+    threshold = _slow_query_threshold_ms()
+    if threshold > 0 and seconds * 1000 >= threshold:
+        in_request = has_request_context()
+        slow_query_log.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "duration_ms": round(seconds * 1000, 2),
+                    "threshold_ms": threshold,
+                    "sql": normalize_sql(sql),
+                    "request_id": g.get("request_id") if in_request else None,
+                    "method": request.method if in_request else None,
+                    "path": request.path if in_request else None,
+                }
+            )
+        )
+
+
+class PreparingCursor(RealDictCursor):
+    """
+    RealDictCursor that transparently runs parameterized statements as server-side
+    prepared statements: the first execution on a connection PREPAREs the SQL,
+    later ones only EXECUTE it with the new parameters, skipping parse + plan.
+
+    - The cache is per connection, keyed by the SQL text, and LRU-bounded by
+      DB_PREPARED_STATEMENTS_MAX (default 64, 0 disables preparing).
+    - Statements the server refuses to PREPARE (e.g. undecidable parameter types)
+      are remembered (up to the same bound) and executed the normal way.
+    - Every execute() is timed into the request's RequestDBStats and, above
+      DB_SLOW_QUERY_MS, written to the "db.slow_query" log.
+    """
+
+    def execute(self, query: Any, vars: Any = None) -> None:
+        # Timed as a whole (PREPARE included) for the request stats / slow-query log
+        start = time.perf_counter()
+        try:
+            return self._execute(query, vars)
+        finally:
+            _record_query(query, time.perf_counter() - start)
+
+    def _execute(self, query: Any, vars: Any) -> None:
+        conn = self.connection
+        max_size = getattr(conn, "prepared_max", 0)
+        if (
+            vars is None
+            or not max_size
+            or conn.autocommit
+            or not isinstance(query, str)
+            or not isinstance(vars, (tuple, list))
+        ):
+            return super().execute(query, vars)
+
+        cache = conn.prepared_statements
+        name = cache.get(query)
+        if name is not None:
+            cache.move_to_end(query)
+            _count_prepared("hits")
+        else:
+            name = self._prepare(query, len(vars))
+            if name is None:
+                return super().execute(query, vars)
+
+        if vars:
+            placeholders = ", ".join(["%s"] * len(vars))
+            return super().execute(f"EXECUTE {name} ({placeholders})", vars)
+        return super().execute(f"EXECUTE {name}")
+
+    def _prepare(self, query: str, nparams: int) -> Optional[str]:
+        conn = self.connection
+        if query in conn.prepared_rejected:
+            return None
+        converted = to_server_params(query)
+        if converted is None or converted[1] != nparams:
+            self._reject(query)
+            return None
+
+        _count_prepared("misses")
+        cache = conn.prepared_statements
+        prefix = ""
+        while len(cache) >= conn.prepared_max:
+            _, old_name = cache.popitem(last=False)
+            prefix += f"DEALLOCATE {old_name}; "
+            _count_prepared("evictions")
+
+        name = f"ps_{next(_prepared_ids)}"
+        try:
+            # Savepoint: a failed PREPARE must not abort the caller's transaction
+            super().execute(
+                f"{prefix}SAVEPOINT ps_prepare; PREPARE {name} AS {converted[0]}; "
+                "RELEASE SAVEPOINT ps_prepare"
+            )
+        except psycopg2.Error as e:
+            if _is_connection_error(e):
+                raise
+            super().execute("ROLLBACK TO SAVEPOINT ps_prepare")
+            self._reject(query)
+            _count_prepared("failures")
+            logging.warning("Could not prepare statement, executing unprepared: %s", query)
+            return None
+
+        cache[query] = name
+        return name
+
+    def _reject(self, query: str) -> None:
+        # Bounded like the cache itself; forgetting only costs another PREPARE attempt
+        rejected = self.connection.prepared_rejected
+        if len(rejected) >= self.connection.prepared_max:
+            rejected.clear()
+        rejected.add(query)
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no pooled connection becomes available within the configured timeout.
     """
-    Create a psycopg2 connection using environment variables from .env.
+
+
+def get_db_connection(dsn: Optional[str] = None, readonly: bool = False) -> PGConnection:
+    """
+    Create a psycopg2 connection using environment variables from .env,
+    or the given libpq DSN (used for read replicas).
     Sets the session time zone to UTC to ensure consistent timestamp handling.
+    With readonly=True every transaction on the connection is READ ONLY.
     """
-    conn = psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "5432"),
-        dbname=os.getenv("DB_NAME", "library"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
-    )
+    if dsn:
+        conn = psycopg2.connect(dsn, connection_factory=PooledConnection)
+    else:
+        conn = psycopg2.connect(
+            host=os.getenv("DB_HOST", "localhost"),
+            port=os.getenv("DB_PORT", "5432"),
+            dbname=os.getenv("DB_NAME", "library"),
+            user=os.getenv("DB_USER", "postgres"),
+            password=os.getenv("DB_PASSWORD", "postgres"),
+            connection_factory=PooledConnection,
+        )
+
+    # Server-side prepared statement cache (see PreparingCursor)
+    conn.prepared_max = int(os.getenv("DB_PREPARED_STATEMENTS_MAX", "64"))
+    conn.prepared_statements = OrderedDict()
+    conn.prepared_rejected = set()
 
     # Ensure session uses UTC for timestamp fields
     try:
@@ -27,6 +306,9 @@ def get_db_connection() -> PGConnection:
         conn.autocommit = True
         with conn.cursor() as cur:
             cur.execute("SET TIME ZONE 'UTC'")
+            if readonly:
+                # Session default: same effect as SET TRANSACTION READ ONLY on every transaction
+                cur.execute("SET default_transaction_read_only TO on")
     except Exception:
         logging.exception("Failed to set session time zone to UTC")
     finally:
@@ -39,24 +321,655 @@ def get_db_connection() -> PGConnection:
     return conn
 
 
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+
+    - At most max_size connections exist at once; callers wait up to `timeout`
+      seconds for one to be released, then get PoolTimeout.
+    - Connections older than max_lifetime or idle longer than max_idle seconds
+      are closed on checkout and replaced by fresh ones.
+    - Closed / broken connections are discarded instead of being reused.
+    - Every connection is rolled back before it goes back to the idle list,
+      so no transaction state leaks between requests.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], PGConnection],
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_lifetime: float = 1800.0,
+        max_idle: float = 300.0,
+    ) -> None:
+        if max_size <= 0 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size, max_size > 0.")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+
+        self._cond = threading.Condition()
+        self._idle: Deque[PGConnection] = deque()
+        self._size = 0  # open connections (idle + checked out + being opened)
+        self._closed = False
+        self._stats: Dict[str, int] = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+        }
+        self.pid = os.getpid()
+
+    def fill(self) -> None:
+        """
+        Open connections until min_size are available. Failures are logged, not raised,
+        so an unreachable database does not prevent the app from starting.
+        """
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                logging.exception("Failed to pre-open pooled database connection")
+                return
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def getconn(self, timeout: Optional[float] = None) -> PGConnection:
+        """
+        Check out a connection, opening a new one if the pool is below max_size.
+        Raises PoolTimeout if none becomes available within `timeout` seconds.
+        """
+        wait = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + wait
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed.")
+
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_reusable(conn):
+                        self._stats["checkouts"] += 1
+                        return conn
+                    self._drop(conn)
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection available within {wait:.1f}s "
+                        f"(max_size={self.max_size})."
+                    )
+                self._cond.wait(remaining)
+
+        # Open outside the lock so slow handshakes don't block other threads
+        try:
+            conn = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats["checkouts"] += 1
+        return conn
+
+    def putconn(self, conn: PGConnection, discard: bool = False) -> None:
+        """
+        Return a connection to the pool. Open transactions are rolled back first;
+        connections that are closed, broken, or flagged with discard=True are closed.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+            except Exception:
+                logging.exception("Failed to reset pooled database connection")
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                self._drop(conn)
+            else:
+                conn.pool_released_at = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._drop(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of pool sizes and lifetime counters."""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._stats,
+            }
+
+    def _open(self) -> PGConnection:
+        conn = self._connect()
+        now = time.monotonic()
+        conn.pool_created_at = now
+        conn.pool_released_at = now
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _is_reusable(self, conn: PGConnection) -> bool:
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if self.max_lifetime and now - conn.pool_created_at > self.max_lifetime:
+            return False
+        if self.max_idle and now - conn.pool_released_at > self.max_idle:
+            return False
+        return True
+
+    def _drop(self, conn: PGConnection) -> None:
+        # Caller holds self._cond
+        self._size -= 1
+        self._stats["connections_discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _pool_from_env(connect: Callable[[], PGConnection]) -> ConnectionPool:
+    return ConnectionPool(
+        connect,
+        min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT_S", "5")),
+        max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME_S", "1800")),
+        max_idle=float(os.getenv("DB_POOL_MAX_IDLE_S", "300")),
+    )
+
+
+class ReplicaRouter:
+    """
+    Round-robin over one pool per read replica.
+
+    A replica that fails to connect (or loses its connection mid-query) is marked
+    unhealthy for `retry_after` seconds; while no replica is healthy, getconn()
+    returns None and callers fall back to the primary.
+    """
+
+    def __init__(self, pools: List[ConnectionPool], retry_after: float = 30.0) -> None:
+        self.pools = pools
+        self.retry_after = retry_after
+        self._down_until = [0.0] * len(pools)
+        self._next = itertools.count()
+        self.pid = os.getpid()
+
+    def getconn(self) -> Optional[Tuple[int, PGConnection]]:
+        """Return (replica index, connection) or None if no replica is usable."""
+        for _ in range(len(self.pools)):
+            idx = next(self._next) % len(self.pools)
+            if self._down_until[idx] > time.monotonic():
+                continue
+            try:
+                return idx, self.pools[idx].getconn()
+            except PoolTimeout:
+                # Saturated, not broken: try the next one / the primary
+                continue
+            except Exception:
+                logging.exception("Read replica %d unavailable", idx)
+                self.mark_down(idx)
+        return None
+
+    def putconn(self, idx: int, conn: PGConnection, discard: bool = False) -> None:
+        self.pools[idx].putconn(conn, discard=discard)
+
+    def mark_down(self, idx: int) -> None:
+        self._down_until[idx] = time.monotonic() + self.retry_after
+
+    def healthy(self) -> List[bool]:
+        now = time.monotonic()
+        return [until <= now for until in self._down_until]
+
+    def closeall(self) -> None:
+        for pool in self.pools:
+            pool.closeall()
+
+
+_pool: Optional[ConnectionPool] = None
+_replicas: Optional[ReplicaRouter] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide connection pool, creating it on first use.
+
+    Sizing is read from the environment (after .env has been loaded):
+      - DB_POOL_MIN_SIZE (default 1), DB_POOL_MAX_SIZE (default 10)
+      - DB_POOL_TIMEOUT_S: max wait for a free connection (default 5)
+      - DB_POOL_MAX_LIFETIME_S / DB_POOL_MAX_IDLE_S: recycling limits (default 1800 / 300)
+
+    A new pool is created after fork() so worker processes never share sockets.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = _pool_from_env(get_db_connection)
+            _pool.fill()
+        return _pool
+
+
+def get_replica_router() -> Optional[ReplicaRouter]:
+    """
+    Return the read-replica router, or None when no replica is configured.
+
+    DB_REPLICA_DSNS: one libpq DSN / URI, or several separated by commas.
+    DB_REPLICA_RETRY_S: how long an unreachable replica is skipped (default 30).
+    Replica pools use the same DB_POOL_* sizing as the primary.
+    """
+    global _replicas
+    router = _replicas
+    if router is not None and router.pid == os.getpid():
+        return router
+
+    dsns = [d.strip() for d in os.getenv("DB_REPLICA_DSNS", "").split(",") if d.strip()]
+    if not dsns:
+        return None
+
+    with _pool_lock:
+        if _replicas is None or _replicas.pid != os.getpid():
+            _replicas = ReplicaRouter(
+                [
+                    _pool_from_env(functools.partial(get_db_connection, dsn, readonly=True))
+                    for dsn in dsns
+                ],
+                retry_after=float(os.getenv("DB_REPLICA_RETRY_S", "30")),
+            )
+        return _replicas
+
+
+def close_pool() -> None:
+    """Close the process-wide pools (used on shutdown and in tests)."""
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        if _replicas is not None:
+            _replicas.closeall()
+            _replicas = None
+
+
+def _is_connection_error(exc: Any) -> bool:
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+_savepoint_ids = itertools.count(1)
+
+
+@contextmanager
+def savepoint(cur: Any) -> Iterator[None]:
+    """
+    Nested transaction scope on the cursor's connection.
+
+    On exception the work done inside the block is rolled back to the savepoint
+    (the outer transaction stays usable) and the exception is re-raised.
+    Example:
+      with savepoint(cur):
+          cur.execute("INSERT ...")   # a UniqueViolation here can be retried
+    """
+    name = f"sp_{next(_savepoint_ids)}"
+    cur.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except Exception:
+        cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        raise
+    cur.execute(f"RELEASE SAVEPOINT {name}")
+
+
+class DBSession:
+    """
+    Request-scoped database session: one pooled connection and one transaction
+    shared by every get_db_cursor() block of the same HTTP request.
+
+    - The connection is checked out lazily on the first get_db_cursor() call.
+    - A successful commit=True block marks the session dirty; the transaction is
+      committed once in finish() (after_request), otherwise rolled back.
+    - Blocks that run after earlier writes are wrapped in a savepoint, so a failing
+      block only undoes its own work (same outcome as the old per-block commit).
+    - With read replicas configured, commit=False blocks run on a (read-only)
+      replica connection until the request writes or calls use_primary();
+      from then on reads go to the primary so the request sees its own writes.
+    """
+
+    def __init__(self, pool: ConnectionPool, replicas: Optional[ReplicaRouter] = None) -> None:
+        self._pool = pool
+        self.conn: Optional[PGConnection] = None
+        self.dirty = False
+        self.broken = False
+        self.replicas = replicas
+        self.replica: Optional[Tuple[int, PGConnection]] = None
+        self.read_primary = False
+
+    def connection(self) -> PGConnection:
+        if self.conn is None:
+            start = time.perf_counter()
+            self.conn = self._pool.getconn()
+            _record_acquire(time.perf_counter() - start)
+        return self.conn
+
+    @contextmanager
+    def cursor(self, commit: bool = False) -> Iterator[RealDictCursor]:
+        if not commit and self.replicas is not None and not (self.dirty or self.read_primary):
+            if self.replica is None:
+                start = time.perf_counter()
+                self.replica = self.replicas.getconn()
+                _record_acquire(time.perf_counter() - start)
+            if self.replica is not None:
+                with self._replica_cursor() as cur:
+                    yield cur
+                return
+
+        conn = self.connection()
+        cur = conn.cursor(cursor_factory=PreparingCursor)
+        if not self.dirty:
+            # Nothing to protect yet: a failure simply rolls back the whole transaction
+            try:
+                yield cur
+            except Exception as e:
+                self._rollback(e)
+                logging.exception("Database error")
+                raise
+        else:
+            try:
+                with savepoint(cur):
+                    yield cur
+            except Exception as e:
+                if _is_connection_error(e):
+                    self._rollback(e)
+                logging.exception("Database error")
+                raise
+        if commit:
+            self.dirty = True
+
+    @contextmanager
+    def _replica_cursor(self) -> Iterator[RealDictCursor]:
+        idx, conn = self.replica
+        try:
+            yield conn.cursor(cursor_factory=PreparingCursor)
+        except Exception as e:
+            if _is_connection_error(e):
+                # Unhealthy replica: skip it for a while, later reads use the primary
+                self.replicas.mark_down(idx)
+                self.replicas.putconn(idx, conn, discard=True)
+                self.replica = None
+                self.read_primary = True
+            else:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            logging.exception("Database error")
+            raise
+
+    def finish(self) -> None:
+        """Commit pending writes (or roll back a read-only transaction)."""
+        if self.conn is None or self.broken:
+            return
+        start = time.perf_counter()
+        try:
+            if self.dirty:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        except Exception as e:
+            self._rollback(e)
+            raise
+        finally:
+            self.dirty = False
+            stats = request_db_stats()
+            if stats is not None:
+                # Commit time counts as DB time, not as a statement
+                stats.db_seconds += time.perf_counter() - start
+
+    def close(self) -> None:
+        """Release the connections back to their pools (rolling back anything unfinished)."""
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            self._pool.putconn(conn, discard=self.broken)
+        if self.replica is not None:
+            (idx, conn), self.replica = self.replica, None
+            self.replicas.putconn(idx, conn)
+
+    def _rollback(self, exc: BaseException) -> None:
+        self.dirty = False
+        if _is_connection_error(exc):
+            self.broken = True
+        try:
+            self.connection().rollback()
+        except Exception:
+            self.broken = True
+
+
+def _current_session() -> Optional[DBSession]:
+    """Return the request's DBSession, or None outside a request / without init_app()."""
+    if not has_request_context() or "db" not in current_app.extensions:
+        return None
+    session = g.get("_db_session")
+    if session is None:
+        session = DBSession(get_pool(), get_replica_router())
+        session.read_primary = bool(g.get("_db_read_primary"))
+        g._db_session = session
+    return session
+
+
+def use_primary() -> None:
+    """
+    Route the rest of the current request's reads to the primary
+    (e.g. credential checks that must not see replica lag).
+    """
+    if has_request_context():
+        g._db_read_primary = True
+        session = g.get("_db_session")
+        if session is not None:
+            session.read_primary = True
+
+
+def on_commit(callback: Callable[[], None]) -> None:
+    """
+    Run `callback` once the current request's transaction has been committed
+    (e.g. cache invalidation that must not race the write). Callbacks are dropped
+    when the commit fails. Outside a request the callback runs immediately, so call
+    it after the get_db_cursor(commit=True) block there.
+    """
+    if has_request_context() and "db" in current_app.extensions:
+        g.setdefault("_db_on_commit", []).append(callback)
+    else:
+        callback()
+
+
+def _run_on_commit() -> None:
+    for callback in g.pop("_db_on_commit", None) or ():
+        try:
+            callback()
+        except Exception:
+            logging.exception("on_commit callback failed")
+
+
+def init_app(app: Flask) -> None:
+    """
+    Enable request-scoped sessions: the transaction is committed after the view
+    returns and the connection goes back to the pool on request teardown.
+    """
+    app.extensions["db"] = True
+
+    @app.after_request
+    def _finish_db_session(resp):
+        session = g.get("_db_session")
+        if session is not None:
+            try:
+                session.finish()
+            except Exception:
+                logging.exception("Database commit failed")
+                g.pop("_db_on_commit", None)
+                return error_response("db_error", "Database error occurred.", status=500)[0]
+            if session.broken:
+                g.pop("_db_on_commit", None)
+        _run_on_commit()
+        return resp
+
+    @app.teardown_request
+    def _release_db_session(exc):
+        session = g.pop("_db_session", None)
+        if session is not None:
+            session.close()
+
+
 @contextmanager
 def get_db_cursor(commit: bool = False) -> Iterator[RealDictCursor]:
     """
-    Context manager that yields a cursor and closes the connection afterwards.
+    Context manager that yields a cursor on a pooled connection.
 
-    If commit=True:
-      - commit on success
+    Inside a request (after init_app) every call shares the request's DBSession:
+      - commit=True: the writes are committed once after the view returns
+      - exception: the block's work is rolled back
+    Read-only blocks (commit=False) may be served by a read replica, see DBSession.
+    Outside a request the primary connection is used for this block only:
+      - commit=True: commit on success
       - rollback on exception
+      - without commit the transaction is rolled back when the connection is released
     """
-    conn = get_db_connection()
+    session = _current_session()
+    if session is not None:
+        with session.cursor(commit=commit) as cur:
+            yield cur
+        return
+
+    pool = get_pool()
+    start = time.perf_counter()
+    conn = pool.getconn()
+    _record_acquire(time.perf_counter() - start)
+    discard = False
     try:
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur = conn.cursor(cursor_factory=PreparingCursor)
         yield cur
         if commit:
             conn.commit()
-    except Exception:
-        conn.rollback()
+    except Exception as e:
+        discard = _is_connection_error(e)
+        try:
+            conn.rollback()
+        except Exception:
+            discard = True
         logging.exception("Database error")
         raise
     finally:
-        conn.close()
+        pool.putconn(conn, discard=discard)
+
+
+_stream_ids = itertools.count(1)
+
+
+class RowStream:
+    """
+    Rows of a read-only query, fetched from a server-side (named) cursor on a
+    dedicated pooled connection, `itersize` rows per round trip.
+
+    For responses that outlive the request's DBSession (streamed bodies): the
+    connection is checked out here, not from the session, and is only released
+    by close() (called when the rows are exhausted, on error, or by the response's
+    call_on_close when the client goes away). A read replica is used if configured.
+    The statement is executed on construction, so database errors surface before
+    the response starts.
+    """
+
+    def __init__(self, sql: str, params: Any = None, itersize: int = 2000) -> None:
+        self._replica_idx: Optional[int] = None
+        self._pool: Any = None
+        self._conn: Optional[PGConnection] = None
+        self._cur: Any = None
+
+        router = get_replica_router()
+        checkout = router.getconn() if router is not None else None
+        start = time.perf_counter()
+        if checkout is not None:
+            self._replica_idx, self._conn = checkout
+            self._pool = router
+        else:
+            self._pool = get_pool()
+            self._conn = self._pool.getconn()
+        _record_acquire(time.perf_counter() - start)
+
+        try:
+            self._cur = self._conn.cursor(
+                name=f"stream_{next(_stream_ids)}", cursor_factory=RealDictCursor
+            )
+            self._cur.itersize = itersize
+            self._cur.execute(sql, params)
+        except Exception as e:
+            logging.exception("Database error")
+            self.close(discard=_is_connection_error(e))
+            raise
+        self._rows = iter(self._cur)
+
+    def __iter__(self) -> "RowStream":
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        if self._conn is None:
+            raise StopIteration
+        try:
+            return next(self._rows)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception as e:
+            logging.exception("Database error")
+            self.close(discard=_is_connection_error(e))
+            raise
+
+    def close(self, discard: bool = False) -> None:
+        """Close the cursor and return the connection (rolled back) to its pool; idempotent."""
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if not discard and self._cur is not None:
+            try:
+                self._cur.close()
+            except Exception:
+                discard = True
+        if self._replica_idx is not None:
+            self._pool.putconn(self._replica_idx, conn, discard=discard)
+        else:
+            self._pool.putconn(conn, discard=discard)
@@ -0,0 +1,100 @@
+"""
+Conditional GET helpers (ETag / If-None-Match, Cache-Control).
+
+ETags are derived from version stamps (Book.version, App_User.version, bumped by
+triggers, see database/table.sql) plus the query that produced the response,
+never by hashing the body, so a matching If-None-Match can be answered with
+304 Not Modified after a cheap stamp lookup instead of the full query.
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Response, jsonify, request
+from werkzeug.datastructures import ETags
+from werkzeug.http import quote_etag
+
+
+def etag_for(*parts: Any) -> str:
+    """Strong ETag value (unquoted) for a response identified by parts (query, stamps)."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def has_conditional_request() -> bool:
+    """True if the request carries If-None-Match (worth a stamp lookup)."""
+    return bool(request.if_none_match)
+
+
+# Content codings that get their own ETag variant (compression.py)
+_ENCODED_ETAG_CODINGS = ("gzip", "br")
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Strong ETag (unquoted) of the same response compressed with encoding: "<etag>-<encoding>"."""
+    return f"{etag}-{encoding}"
+
+
+def _strip_encoding(tag: str) -> str:
+    for encoding in _ENCODED_ETAG_CODINGS:
+        suffix = f"-{encoding}"
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)]
+    return tag
+
+
+def is_not_modified(etag: str, if_none_match: Optional[ETags] = None) -> bool:
+    """
+    True if If-None-Match (default: the Flask request's) matches etag (or is *).
+    A tag sent with a compressed body ("<etag>-gzip" / "<etag>-br") matches its
+    identity etag, so revalidation works whatever encoding the client got.
+    """
+    if if_none_match is None:
+        if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return True
+    return any(_strip_encoding(tag) == etag for tag in if_none_match.as_set(include_weak=True))
+
+
+def catalog_cache_control() -> str:
+    """
+    Cache-Control for the public catalog reads.
+    CATALOG_HTTP_MAX_AGE_S (default 0): 0 means caches must revalidate every time.
+    """
+    max_age = int(os.getenv("CATALOG_HTTP_MAX_AGE_S", "0"))
+    if max_age > 0:
+        return f"public, max-age={max_age}"
+    return "public, no-cache"
+
+
+# Per-user data: browser cache only, always revalidated
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def conditional_response(payload: Any, etag: str, cache_control: str) -> Tuple[Response, int]:
+    """
+    JSON response with ETag and Cache-Control, or an empty 304 if the client's copy
+    is current (payload may then be None).
+    """
+    if is_not_modified(etag):
+        resp = Response(status=304)
+    else:
+        resp = jsonify(payload)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    if cache_control.startswith("private"):
+        resp.vary.add("Authorization")
+    return resp, resp.status_code
+
+
+def conditional_payload(
+    payload: Any, etag: str, cache_control: str, if_none_match: ETags
+) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    asgi.py counterpart of conditional_response: (payload, 200, headers), or
+    (None, 304, headers) if the client's copy is current.
+    """
+    headers = {"ETag": quote_etag(etag), "Cache-Control": cache_control}
+    if is_not_modified(etag, if_none_match):
+        return None, 304, headers
+    return payload, 200, headers
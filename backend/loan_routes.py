@@ -1,16 +1,21 @@
+import logging
+from contextlib import nullcontext
 from datetime import date, datetime, timedelta, timezone
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
 
 from flask import Blueprint, Response, jsonify, request
 
-# Optional: import UniqueViolation if you add a partial UNIQUE index for active loans
+# Raised on the idx_loan_active partial UNIQUE index (one active loan per item)
 from psycopg2.errors import UniqueViolation
 
+import async_db
 from auth_utils import get_current_user, login_required, role_required
+from catalog_cache import get_catalog_cache
 from config import DEFAULT_LOAN_DAYS
-from db import get_db_cursor
-from parse_utils import ParseError, parse_int
-from response_utils import error_response
+from db import get_db_cursor, on_commit, savepoint
+from parse_utils import ParseError, parse_fields, parse_int
+from response_utils import error_payload, error_response
+from suggest_index import get_suggest_index
 
 loan_bp = Blueprint("loans", __name__)
 
@@ -49,6 +54,107 @@ def _pick_available_item(cur, book_id: int, user_library_id: Optional[int]) -> O
     return cur.fetchone()
 
 
+def _count_loan_after_commit(book_id: int, count: int = 1) -> None:
+    """Raise the book's typeahead popularity once the loan(s) are committed."""
+    on_commit(lambda: get_suggest_index().add_loans(book_id, count))
+
+
+def _invalidate_book_after_commit(book_id: Optional[int]) -> None:
+    """Drop cached catalog responses showing this book once the loan change is committed."""
+    if book_id is not None:
+        on_commit(lambda: get_catalog_cache().invalidate_books([book_id]))
+
+
+# Errors of one loan (create_loan, each POST /loans/batch line): code -> (message, status)
+LOAN_LINE_ERRORS: Dict[str, Tuple[str, int]] = {
+    "item_not_found": ("Item not found.", 404),
+    "different_library": ("User and item are from different libraries.", 400),
+    "item_already_loaned": ("This item is already loaned out.", 409),
+    "book_not_found": ("Book not found.", 404),
+    "no_available_item": ("No available item for this book.", 409),
+}
+
+# Item-level loan in one round trip: item lookup, library check, active loan
+# check and insert. Always one row; book_id is NULL for an unknown item and
+# loan_id is NULL if a check failed. A concurrent loan of the same item that
+# the active-loan check cannot see yet makes the insert fail on the
+# idx_loan_active partial unique index (UniqueViolation).
+# Parameters: item_id, user_id, loan_date, due_date, user library_id (twice)
+ITEM_LOAN_SQL = """
+    WITH item AS (
+        SELECT i.item_id, i.book_id, i.library_id
+        FROM Item i
+        WHERE i.item_id = %s
+    ),
+    active AS (
+        SELECT l.loan_id
+        FROM Loan l
+        JOIN item it ON it.item_id = l.item_id
+        WHERE l.return_date IS NULL
+    ),
+    inserted AS (
+        INSERT INTO Loan (item_id, user_id, loan_date, due_date, fine_paid)
+        SELECT it.item_id, %s::int, %s::timestamptz, %s::date, 0.00
+        FROM item it
+        WHERE (%s::int IS NULL OR it.library_id = %s::int)
+          AND NOT EXISTS (SELECT 1 FROM active)
+        RETURNING loan_id, loan_date, due_date, fine_paid
+    )
+    SELECT
+        it.book_id,
+        it.library_id,
+        ins.loan_id,
+        ins.loan_date,
+        ins.due_date,
+        ins.fine_paid
+    FROM (SELECT 1) AS one
+    LEFT JOIN item it ON TRUE
+    LEFT JOIN inserted ins ON TRUE
+"""
+
+
+def _item_loan_error(row: Mapping[str, Any], user_library_id: Optional[int]) -> Optional[str]:
+    """Error code of an ITEM_LOAN_SQL result (checked in create_loan's order), or None."""
+    if row["book_id"] is None:
+        return "item_not_found"
+    if user_library_id is not None and user_library_id != row["library_id"]:
+        return "different_library"
+    if row["loan_id"] is None:
+        return "item_already_loaned"
+    return None
+
+
+def _parse_loan_days(raw_loan_days: Any) -> int:
+    """loan_days of a loan request (DEFAULT_LOAN_DAYS if missing); raises ParseError."""
+    if raw_loan_days is None:
+        return DEFAULT_LOAN_DAYS
+    loan_days = parse_int(
+        raw_loan_days,
+        field="loan_days",
+        error_code="invalid_loan_days",
+        message="loan_days must be an integer.",
+    )
+    if loan_days <= 0:
+        raise ParseError("invalid_loan_days", "loan_days must be a positive integer.", 400)
+    return loan_days
+
+
+def _serialize_new_loan(
+    loan: Mapping[str, Any], item_id: int, book_id: Optional[int], user_id: int
+) -> Dict[str, Any]:
+    """Response shape of a created loan (POST /loans and each POST /loans/batch line)."""
+    return {
+        "loan_id": loan["loan_id"],
+        "item_id": item_id,
+        "book_id": book_id,
+        "user_id": user_id,
+        "loan_date": loan["loan_date"],
+        "due_date": loan["due_date"],
+        "fine_paid": loan["fine_paid"] if loan["fine_paid"] is not None else 0.0,
+        "status": "active",
+    }
+
+
 @loan_bp.post("/loans")
 @login_required
 def create_loan() -> Tuple[Response, int]:
@@ -85,26 +191,11 @@ def create_loan() -> Tuple[Response, int]:
             status=400,
         )
 
-    # Validate loan_days
     try:
-        loan_days = (
-            parse_int(
-                raw_loan_days,
-                field="loan_days",
-                error_code="invalid_loan_days",
-                message="loan_days must be an integer.",
-            )
-            if raw_loan_days is not None
-            else DEFAULT_LOAN_DAYS
-        )
+        loan_days = _parse_loan_days(raw_loan_days)
     except ParseError as e:
         return error_response(e.error_code, e.message, status=e.status)
 
-    if loan_days <= 0:
-        return error_response(
-            "invalid_loan_days", "loan_days must be a positive integer.", status=400
-        )
-
     current = get_current_user()
     user_id = current["user_id"]
     user_library_id = current.get("library_id")
@@ -117,7 +208,7 @@ def create_loan() -> Tuple[Response, int]:
             chosen_item = None
 
             if item_id is not None:
-                # Direct item flow
+                # Direct item flow: lookup, checks and insert in one statement
                 try:
                     item_id = parse_int(
                         item_id,
@@ -128,40 +219,16 @@ def create_loan() -> Tuple[Response, int]:
                 except ParseError as e:
                     return error_response(e.error_code, e.message, status=e.status)
 
-                # Fetch item
-                cur.execute(
-                    """
-                    SELECT item_id, book_id, library_id
-                    FROM Item
-                    WHERE item_id = %s
-                    """,
-                    (item_id,),
-                )
-                chosen_item = cur.fetchone()
-                if chosen_item is None:
-                    return error_response("item_not_found", "Item not found.", status=404)
-
-                if user_library_id is not None and user_library_id != chosen_item["library_id"]:
-                    return error_response(
-                        "different_library",
-                        "User and item are from different libraries.",
-                        status=400,
-                    )
-
-                # Check active loan for this item
                 cur.execute(
-                    """
-                    SELECT loan_id
-                    FROM Loan
-                    WHERE item_id = %s AND return_date IS NULL
-                    """,
-                    (item_id,),
+                    ITEM_LOAN_SQL,
+                    (item_id, user_id, now, due_date, user_library_id, user_library_id),
                 )
-                active = cur.fetchone()
-                if active is not None:
-                    return error_response(
-                        "item_already_loaned", "This item is already loaned out.", status=409
-                    )
+                loan = cur.fetchone()
+                error = _item_loan_error(loan, user_library_id)
+                if error is not None:
+                    message, status = LOAN_LINE_ERRORS[error]
+                    return error_response(error, message, status=status)
+                chosen_item = loan
 
             else:
                 # Book-level flow (select a free item with row lock)
@@ -195,33 +262,317 @@ def create_loan() -> Tuple[Response, int]:
                     )
                 item_id = chosen_item["item_id"]
 
-            # Insert loan
-            cur.execute(
-                """
-                INSERT INTO Loan (item_id, user_id, loan_date, due_date, fine_paid)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING loan_id, loan_date, due_date, fine_paid
-                """,
-                (item_id, user_id, now, due_date, 0.00),
-            )
-            loan = cur.fetchone()
+                # Insert loan
+                cur.execute(
+                    """
+                    INSERT INTO Loan (item_id, user_id, loan_date, due_date, fine_paid)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING loan_id, loan_date, due_date, fine_paid
+                    """,
+                    (item_id, user_id, now, due_date, 0.00),
+                )
+                loan = cur.fetchone()
     except UniqueViolation:
-        # In case a partial UNIQUE index on active loans is added later
+        # Concurrent loan of the same item (idx_loan_active is unique)
         return error_response("item_already_loaned", "This item is already loaned out.", status=409)
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
+    _invalidate_book_after_commit(chosen_item["book_id"])
+    _count_loan_after_commit(chosen_item["book_id"])
+
+    return jsonify(_serialize_new_loan(loan, item_id, chosen_item["book_id"], user_id)), 201
+
+
+# Upper limit of lines (item_ids + book_ids) per POST /loans/batch request
+BATCH_MAX_LOAN_LINES = 50
+
+LOAN_BATCH_MODES = ("all_or_nothing", "best_effort")
+
+# Requested items: every id gets a row (book_id NULL if unknown); claimed is false
+# when a concurrent transaction holds the item (SKIP LOCKED), e.g. checking it out
+BATCH_ITEMS_SQL = """
+    SELECT
+        r.item_id,
+        i.book_id,
+        i.library_id,
+        c.item_id IS NOT NULL AS claimed,
+        EXISTS (
+            SELECT 1 FROM Loan l
+            WHERE l.item_id = r.item_id
+              AND l.return_date IS NULL
+        ) AS on_loan
+    FROM unnest(%s::int[]) AS r (item_id)
+    LEFT JOIN Item i ON i.item_id = r.item_id
+    LEFT JOIN LATERAL (
+        SELECT x.item_id
+        FROM Item x
+        WHERE x.item_id = i.item_id
+        FOR UPDATE SKIP LOCKED
+    ) c ON TRUE
+"""
+
+# Up to n free items per requested book (n = times the book is requested), like
+# _pick_available_item; the items already claimed by item_id lines are excluded
+# (SKIP LOCKED does not skip this transaction's own locks).
+# Parameters: book_ids, library_id (twice), excluded item_ids
+BATCH_BOOK_ITEMS_SQL = """
+    WITH wanted AS (
+        SELECT w.book_id, COUNT(*)::int AS n
+        FROM unnest(%s::int[]) AS w (book_id)
+        GROUP BY w.book_id
+    )
+    SELECT
+        w.book_id,
+        b.book_id IS NOT NULL AS found,
+        p.item_id,
+        p.library_id
+    FROM wanted w
+    LEFT JOIN Book b ON b.book_id = w.book_id
+    LEFT JOIN LATERAL (
+        SELECT i.item_id, i.library_id
+        FROM Item i
+        WHERE i.book_id = w.book_id
+          AND (%s::int IS NULL OR i.library_id = %s::int)
+          AND i.item_id <> ALL (%s::int[])
+          AND NOT EXISTS (
+              SELECT 1 FROM Loan l
+              WHERE l.item_id = i.item_id
+                AND l.return_date IS NULL
+          )
+        ORDER BY i.item_id ASC
+        FOR UPDATE SKIP LOCKED
+        LIMIT w.n
+    ) p ON TRUE
+    ORDER BY w.book_id, p.item_id
+"""
+
+# One multi-row insert for the whole batch, in line order. A claimed item that a
+# concurrent create_loan (which does not lock Item) loaned in the meantime is
+# skipped on idx_loan_active instead of failing the statement: it has no
+# RETURNING row. Typed parameters so the statement can be prepared.
+BATCH_INSERT_LOANS_SQL = """
+    INSERT INTO Loan (item_id, user_id, loan_date, due_date, fine_paid)
+    SELECT n.item_id, %s::int, %s::timestamptz, %s::date, 0.00
+    FROM unnest(%s::int[]) WITH ORDINALITY AS n (item_id, ord)
+    ORDER BY n.ord
+    ON CONFLICT (item_id) WHERE return_date IS NULL DO NOTHING
+    RETURNING loan_id, item_id, loan_date, due_date, fine_paid
+"""
+
+
+class _BatchNotApplied(Exception):
+    """Rolls back a partial all_or_nothing insert (see _insert_batch_loans)."""
+
+
+def _parse_loan_batch(data: Mapping[str, Any]) -> Tuple[List[Tuple[str, int]], int, str]:
+    """
+    Validate a POST /loans/batch body and return (lines, loan_days, mode).
+    lines: ("item_id" | "book_id", id) pairs, item_ids first, in request order.
+    Raises ParseError on invalid input.
+    """
+    lines: List[Tuple[str, int]] = []
+    for key, kind in (("item_ids", "item_id"), ("book_ids", "book_id")):
+        raw_ids = data.get(key)
+        if raw_ids is None:
+            continue
+        if not isinstance(raw_ids, list):
+            raise ParseError("invalid_ids", f"{key} must be an array of integers.", 400)
+        for raw in raw_ids:
+            lines.append(
+                (
+                    kind,
+                    parse_int(
+                        raw,
+                        field=key,
+                        error_code="invalid_ids",
+                        message=f"{key} must be an array of integers.",
+                    ),
+                )
+            )
+
+    if not lines:
+        raise ParseError("missing_fields", "Either item_ids or book_ids must be provided.", 400)
+    if len(lines) > BATCH_MAX_LOAN_LINES:
+        raise ParseError(
+            "too_many_lines",
+            f"At most {BATCH_MAX_LOAN_LINES} item_ids and book_ids per request.",
+            400,
+        )
+
+    mode = data.get("mode") or "all_or_nothing"
+    if mode not in LOAN_BATCH_MODES:
+        raise ParseError(
+            "invalid_mode", f"mode must be one of: {', '.join(LOAN_BATCH_MODES)}.", 400
+        )
+
+    return lines, _parse_loan_days(data.get("loan_days")), mode
+
+
+def _claim_batch_items(
+    cur, lines: List[Tuple[str, int]], user_library_id: Optional[int]
+) -> List[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Lock a free item for every line (two statements for the whole batch).
+    Returns per line (item row with item_id / book_id, None) or (None, error code).
+    The checks and error codes follow create_loan.
+    """
+    item_ids = list(dict.fromkeys(value for kind, value in lines if kind == "item_id"))
+    book_ids = [value for kind, value in lines if kind == "book_id"]
+
+    items: Dict[int, Dict[str, Any]] = {}
+    if item_ids:
+        cur.execute(BATCH_ITEMS_SQL, (item_ids,))
+        items = {row["item_id"]: row for row in cur.fetchall()}
+
+    picks: Dict[int, List[Dict[str, Any]]] = {}
+    if book_ids:
+        exclude = [i for i, row in items.items() if row["claimed"]]
+        cur.execute(BATCH_BOOK_ITEMS_SQL, (book_ids, user_library_id, user_library_id, exclude))
+        for row in cur.fetchall():
+            if row["found"]:
+                free = picks.setdefault(row["book_id"], [])
+                if row["item_id"] is not None:
+                    free.append(row)
+
+    results: List[Tuple[Optional[Dict[str, Any]], Optional[str]]] = []
+    taken = set()
+    for kind, value in lines:
+        if kind == "item_id":
+            item = items.get(value)
+            if item is None or item["book_id"] is None:
+                results.append((None, "item_not_found"))
+            elif user_library_id is not None and user_library_id != item["library_id"]:
+                results.append((None, "different_library"))
+            elif not item["claimed"] or item["on_loan"] or value in taken:
+                results.append((None, "item_already_loaned"))
+            else:
+                taken.add(value)
+                results.append((item, None))
+        elif value not in picks:
+            results.append((None, "book_not_found"))
+        elif not picks[value]:
+            results.append((None, "no_available_item"))
+        else:
+            results.append((picks[value].pop(0), None))
+    return results
+
+
+def _insert_batch_loans(
+    cur, item_ids: List[int], user_id: int, now: datetime, due_date: date, all_or_nothing: bool
+) -> Tuple[Dict[int, Mapping[str, Any]], Set[int]]:
+    """
+    Insert the loans of the claimed items. Returns (loans by item_id, lost item_ids):
+    lost items were loaned concurrently and get item_already_loaned. With
+    all_or_nothing the insert runs in a savepoint and a lost item undoes it, so
+    no loans are returned.
+    """
+    loans: Dict[int, Mapping[str, Any]] = {}
+    try:
+        with savepoint(cur) if all_or_nothing else nullcontext():
+            cur.execute(BATCH_INSERT_LOANS_SQL, (user_id, now, due_date, item_ids))
+            loans = {row["item_id"]: row for row in cur.fetchall()}
+            if all_or_nothing and len(loans) < len(item_ids):
+                raise _BatchNotApplied()
+    except _BatchNotApplied:
+        return {}, set(item_ids) - set(loans)
+    return loans, set(item_ids) - set(loans)
+
+
+@loan_bp.post("/loans/batch")
+@login_required
+def create_loans_batch() -> Tuple[Response, int]:
+    """
+    POST /api/loans/batch
+    Cart checkout: many loans for the current user in one transaction.
+
+    Request JSON:
+      { "item_ids": [10, 11], "book_ids": [5, 5, 8], "loan_days": 14,
+        "mode": "all_or_nothing" | "best_effort" }
+    (max BATCH_MAX_LOAN_LINES lines; a book listed twice means two copies)
+
+    Free items are claimed with FOR UPDATE SKIP LOCKED (one statement for the
+    item_ids, one for the book_ids) and all loans are inserted with one
+    multi-row INSERT; an item loaned concurrently by POST /loans only fails its
+    own line (item_already_loaned). Every line gets a result in request order
+    (item_ids first), with create_loan's status and error codes:
+      { "item_id" | "book_id", "status": 201, "loan": <create_loan response> }
+      { "item_id" | "book_id", "status": 404 | 409 | 400, "error", "message" }
+
+    mode=all_or_nothing (default): if any line fails nothing is loaned.
+    mode=best_effort: the successful lines are loaned, the others reported.
+
+    Returns 201 { "mode", "created", "failed", "results" } if any loan was
+    created, otherwise 409 loan_batch_failed with details.results.
+    Other errors: missing_fields, invalid_ids, too_many_lines, invalid_mode,
+    invalid_loan_days (400), db_error (500).
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        lines, loan_days, mode = _parse_loan_batch(data)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+
+    current = get_current_user()
+    user_id = current["user_id"]
+    user_library_id = current.get("library_id")
+
+    now = datetime.now(timezone.utc)
+    due_date = (now + timedelta(days=loan_days)).date()
+
+    loans: Dict[int, Mapping[str, Any]] = {}
+    try:
+        with get_db_cursor(commit=True) as cur:
+            claims = _claim_batch_items(cur, lines, user_library_id)
+            failed = sum(1 for _, error in claims if error is not None)
+            to_loan = [item["item_id"] for item, _ in claims if item is not None]
+            if to_loan and (mode == "best_effort" or not failed):
+                loans, lost = _insert_batch_loans(
+                    cur, to_loan, user_id, now, due_date, mode == "all_or_nothing"
+                )
+                for n, (item, _) in enumerate(claims):
+                    if item is not None and item["item_id"] in lost:
+                        claims[n] = (None, "item_already_loaned")
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    results: List[Dict[str, Any]] = []
+    loaned_books: Dict[int, int] = {}
+    for (kind, value), (item, error) in zip(lines, claims):
+        line: Dict[str, Any] = {kind: value}
+        if item is not None and item["item_id"] in loans:
+            book_id = item["book_id"]
+            loaned_books[book_id] = loaned_books.get(book_id, 0) + 1
+            line["status"] = 201
+            loan = loans[item["item_id"]]
+            line["loan"] = _serialize_new_loan(loan, item["item_id"], book_id, user_id)
+        elif error is not None:
+            message, status = LOAN_LINE_ERRORS[error]
+            line.update(status=status, error=error, message=message)
+        else:
+            # Valid line, not loaned because another line failed (all_or_nothing)
+            line.update(status=409, error="batch_not_applied", message="Another line failed.")
+        results.append(line)
+
+    if not loans:
+        return error_response(
+            "loan_batch_failed",
+            "No loans were created.",
+            status=409,
+            details={"results": results},
+        )
+
+    for book_id, count in loaned_books.items():
+        _invalidate_book_after_commit(book_id)
+        _count_loan_after_commit(book_id, count)
+
     return (
         jsonify(
             {
-                "loan_id": loan["loan_id"],
-                "item_id": item_id,
-                "book_id": chosen_item["book_id"] if chosen_item else None,
-                "user_id": user_id,
-                "loan_date": loan["loan_date"].isoformat(),
-                "due_date": loan["due_date"].isoformat(),
-                "fine_paid": float(loan["fine_paid"]) if loan["fine_paid"] is not None else 0.0,
-                "status": "active",
+                "mode": mode,
+                "created": len(loans),
+                "failed": len(results) - len(loans),
+                "results": results,
             }
         ),
         201,
@@ -265,10 +616,13 @@ def return_loan(loan_id: int) -> Tuple[Response, int]:
 
             cur.execute(
                 """
-                UPDATE Loan
+                UPDATE Loan l
                 SET return_date = %s
-                WHERE loan_id = %s
-                RETURNING loan_id, item_id, user_id, loan_date, due_date, return_date, fine_paid
+                FROM Item i
+                WHERE l.loan_id = %s
+                  AND i.item_id = l.item_id
+                RETURNING l.loan_id, l.item_id, l.user_id, l.loan_date, l.due_date,
+                          l.return_date, l.fine_paid, i.book_id
                 """,
                 (now, loan_id),
             )
@@ -276,24 +630,177 @@ def return_loan(loan_id: int) -> Tuple[Response, int]:
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
-    return (
-        jsonify(
-            {
-                "loan_id": updated["loan_id"],
-                "item_id": updated["item_id"],
-                "user_id": updated["user_id"],
-                "loan_date": updated["loan_date"].isoformat() if updated["loan_date"] else None,
-                "due_date": updated["due_date"].isoformat() if updated["due_date"] else None,
-                "return_date": (
-                    updated["return_date"].isoformat() if updated["return_date"] else None
-                ),
-                "fine_paid": (
-                    float(updated["fine_paid"]) if updated["fine_paid"] is not None else 0.0
-                ),
-            }
-        ),
-        200,
+    _invalidate_book_after_commit(updated.get("book_id"))
+
+    return jsonify(_serialize_loan(updated)), 200
+
+
+# Upper limit of scanned values (item_ids + shelf_marks) per POST /loans/returns
+BATCH_MAX_RETURNS = 500
+
+# Scanned items (by id, or by shelf mark within the library) and their active
+# loans, closed in the same statement; active loans are found through
+# idx_loan_active (Loan (item_id) WHERE return_date IS NULL). An item returned
+# concurrently is re-checked after the row lock and comes back without a loan.
+# Parameters: item_ids, shelf_marks, library_id, return time
+BATCH_RETURN_SQL = """
+    WITH scanned AS (
+        SELECT i.item_id, i.book_id, i.library_id, i.shelf_mark
+        FROM unnest(%s::int[]) AS u (item_id)
+        JOIN Item i ON i.item_id = u.item_id
+        UNION
+        SELECT i.item_id, i.book_id, i.library_id, i.shelf_mark
+        FROM unnest(%s::text[]) AS u (shelf_mark)
+        JOIN Item i
+            ON i.library_id = %s::int
+           AND i.shelf_mark = u.shelf_mark
+    ),
+    returned AS (
+        UPDATE Loan l
+        SET return_date = %s
+        FROM scanned s
+        WHERE l.item_id = s.item_id
+          AND l.return_date IS NULL
+        RETURNING l.loan_id, l.item_id, l.user_id, l.loan_date, l.due_date,
+                  l.return_date, l.fine_paid
     )
+    SELECT
+        s.item_id,
+        s.library_id,
+        s.shelf_mark,
+        s.book_id,
+        r.loan_id,
+        r.user_id,
+        r.loan_date,
+        r.due_date,
+        r.return_date,
+        r.fine_paid
+    FROM scanned s
+    LEFT JOIN returned r ON r.item_id = s.item_id
+"""
+
+
+def _parse_returns(
+    data: Mapping[str, Any], user_library_id: Optional[int]
+) -> Tuple[List[int], List[str], Optional[int]]:
+    """
+    Validate a POST /loans/returns body and return (item_ids, shelf_marks,
+    library_id), deduplicated in request order. Raises ParseError.
+    """
+    raw_ids = data.get("item_ids") or []
+    raw_marks = data.get("shelf_marks") or []
+    if not isinstance(raw_ids, list):
+        raise ParseError("invalid_ids", "item_ids must be an array of integers.", 400)
+    if not isinstance(raw_marks, list) or not all(
+        isinstance(mark, str) and mark.strip() for mark in raw_marks
+    ):
+        raise ParseError(
+            "invalid_shelf_marks", "shelf_marks must be an array of non-empty strings.", 400
+        )
+
+    item_ids = list(
+        dict.fromkeys(
+            parse_int(
+                raw,
+                field="item_ids",
+                error_code="invalid_ids",
+                message="item_ids must be an array of integers.",
+            )
+            for raw in raw_ids
+        )
+    )
+    shelf_marks = list(dict.fromkeys(mark.strip() for mark in raw_marks))
+
+    if not item_ids and not shelf_marks:
+        raise ParseError("missing_fields", "Either item_ids or shelf_marks must be provided.", 400)
+    if len(item_ids) + len(shelf_marks) > BATCH_MAX_RETURNS:
+        raise ParseError(
+            "too_many_items",
+            f"At most {BATCH_MAX_RETURNS} item_ids and shelf_marks per request.",
+            400,
+        )
+
+    library_id = user_library_id
+    if data.get("library_id") is not None:
+        library_id = parse_int(
+            data.get("library_id"),
+            field="library_id",
+            error_code="invalid_library_id",
+            message="library_id must be an integer.",
+        )
+    if shelf_marks and library_id is None:
+        # Shelf marks are only unique within a library
+        raise ParseError("missing_fields", "library_id is required with shelf_marks.", 400)
+
+    return item_ids, shelf_marks, library_id
+
+
+@loan_bp.post("/loans/returns")
+@role_required("admin")
+def return_loans_batch() -> Tuple[Response, int]:
+    """
+    POST /api/loans/returns
+    Admin-only bulk return (drop-box / circulation desk scanning).
+
+    Request JSON:
+      { "item_ids": [10, 11], "shelf_marks": ["A-12", "B-3"], "library_id": 1 }
+    (max BATCH_MAX_RETURNS values; shelf marks are looked up in library_id,
+    default the admin's own library)
+
+    Every active loan of the scanned items is closed with one set-based
+    UPDATE ... FROM unnest(...) RETURNING statement.
+    Returns: { "returned", "not_on_loan", "unknown", "results": [
+      { "item_id" | "shelf_mark", "result": "returned", "loan": <loan> }
+      { "item_id" | "shelf_mark", "result": "not_on_loan" | "unknown" } ] }
+    with one result per distinct scanned item, in request order (item_ids first);
+    a shelf mark of an item already scanned by id adds no second line.
+    """
+    data = request.get_json(silent=True) or {}
+    current = get_current_user()
+    try:
+        item_ids, shelf_marks, library_id = _parse_returns(data, current.get("library_id"))
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+
+    now = datetime.now(timezone.utc)
+    try:
+        with get_db_cursor(commit=True) as cur:
+            cur.execute(BATCH_RETURN_SQL, (item_ids, shelf_marks, library_id, now))
+            rows = cur.fetchall()
+    except Exception:
+        return error_response("db_error", "Database error occurred.", status=500)
+
+    by_item_id = {row["item_id"]: row for row in rows}
+    by_shelf_mark = {row["shelf_mark"]: row for row in rows if row["library_id"] == library_id}
+    scanned = [("item_id", i, by_item_id.get(i)) for i in item_ids] + [
+        ("shelf_mark", m, by_shelf_mark.get(m)) for m in shelf_marks
+    ]
+
+    counts = {"returned": 0, "not_on_loan": 0, "unknown": 0}
+    results = []
+    seen = set()
+    for key, value, row in scanned:
+        if row is not None:
+            # Scanned both by id and by shelf mark: one line per item
+            if row["item_id"] in seen:
+                continue
+            seen.add(row["item_id"])
+        line: Dict[str, Any] = {key: value}
+        if row is None:
+            line["result"] = "unknown"
+        elif row["loan_id"] is None:
+            line["result"] = "not_on_loan"
+        else:
+            line["result"] = "returned"
+            line["loan"] = _serialize_loan(row)
+        counts[line["result"]] += 1
+        results.append(line)
+
+    book_ids = sorted({row["book_id"] for row in rows if row["loan_id"] is not None})
+    if book_ids:
+        on_commit(lambda: get_catalog_cache().invalidate_books(book_ids))
+
+    return jsonify({**counts, "results": results}), 200
 
 
 @loan_bp.post("/loans/<int:loan_id>/extend")
@@ -369,45 +876,48 @@ def extend_loan(loan_id: int) -> Tuple[Response, int]:
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
-    return (
-        jsonify(
-            {
-                "loan_id": updated["loan_id"],
-                "item_id": updated["item_id"],
-                "user_id": updated["user_id"],
-                "loan_date": updated["loan_date"].isoformat() if updated["loan_date"] else None,
-                "due_date": updated["due_date"].isoformat() if updated["due_date"] else None,
-                "return_date": (
-                    updated["return_date"].isoformat() if updated["return_date"] else None
-                ),
-                "fine_paid": (
-                    float(updated["fine_paid"]) if updated["fine_paid"] is not None else 0.0
-                ),
-            }
-        ),
-        200,
-    )
+    return jsonify(_serialize_loan(updated)), 200
 
 
-@loan_bp.get("/users/<int:user_id>/loans")
-@login_required
-def list_loans_for_user(user_id: int) -> Tuple[Response, int]:
+# Public fields of a loan (fields= allowlist); each is a Loan column of the same name
+LOAN_FIELDS = (
+    "loan_id",
+    "item_id",
+    "user_id",
+    "loan_date",
+    "due_date",
+    "return_date",
+    "fine_paid",
+)
+
+
+def _serialize_loan(
+    row: Mapping[str, Any], fields: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
     """
-    GET /api/users/<user_id>/loans
-    Query params:
-      - active=true|false|all (default true)
-      - overdue=true|false (default false)
-    Non-admin users can only list their own loans.
+    Public shape of a Loan row (only `fields` if given; the row then holds just
+    those columns). Dates and the Decimal fine are encoded by the JSON provider.
     """
-    current = get_current_user()
-    current_user_id = current["user_id"]
-    current_role = (current.get("role") or "").lower()
+    loan = {field: row[field] for field in fields or LOAN_FIELDS}
+    if "fine_paid" in loan and loan["fine_paid"] is None:
+        loan["fine_paid"] = 0.0
+    return loan
 
-    if current_role != "admin" and user_id != current_user_id:
-        return error_response("forbidden", "You can only list your own loans.", status=403)
 
-    active_param = (request.args.get("active") or "true").lower()
-    overdue_param = (request.args.get("overdue") or "false").lower()
+def _loan_select_list(fields: Optional[Sequence[str]]) -> str:
+    return ", ".join(fields or LOAN_FIELDS)
+
+
+def _build_loans_for_user_query(
+    user_id: int, args: Mapping[str, str]
+) -> Tuple[str, tuple, Optional[Tuple[str, ...]]]:
+    """
+    Return (sql, params, fields) for list_loans_for_user from the active/overdue
+    query flags and the optional fields= subset; raises ParseError for invalid fields.
+    """
+    fields = parse_fields(args.get("fields"), allowed=LOAN_FIELDS)
+    active_param = (args.get("active") or "true").lower()
+    overdue_param = (args.get("overdue") or "false").lower()
 
     where = "user_id = %s"
     params = [user_id]
@@ -422,38 +932,83 @@ def list_loans_for_user(user_id: int) -> Tuple[Response, int]:
         where += " AND return_date IS NULL AND due_date < CURRENT_DATE"
 
     sql = f"""
-        SELECT
-            loan_id,
-            item_id,
-            user_id,
-            loan_date,
-            due_date,
-            return_date,
-            fine_paid
+        SELECT {_loan_select_list(fields)}
         FROM Loan
         WHERE {where}
         ORDER BY loan_date DESC
     """
+    return sql, tuple(params), fields
+
+
+def _build_overdue_loans_query(args: Mapping[str, str]) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    """Return (sql, fields) for list_overdue_loans; raises ParseError for invalid fields."""
+    fields = parse_fields(args.get("fields"), allowed=LOAN_FIELDS)
+    sql = f"""
+        SELECT {_loan_select_list(fields)}
+        FROM Loan
+        WHERE return_date IS NULL
+          AND due_date < CURRENT_DATE
+        ORDER BY due_date ASC
+    """
+    return sql, fields
+
+
+@loan_bp.get("/users/<int:user_id>/loans")
+@login_required
+def list_loans_for_user(user_id: int) -> Tuple[Response, int]:
+    """
+    GET /api/users/<user_id>/loans
+    Query params:
+      - active=true|false|all (default true)
+      - overdue=true|false (default false)
+      - fields: comma separated subset of LOAN_FIELDS to select and return
+    Non-admin users can only list their own loans.
+    """
+    current = get_current_user()
+    current_user_id = current["user_id"]
+    current_role = (current.get("role") or "").lower()
+
+    if current_role != "admin" and user_id != current_user_id:
+        return error_response("forbidden", "You can only list your own loans.", status=403)
+
+    try:
+        sql, params, fields = _build_loans_for_user_query(user_id, request.args)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
 
     try:
         with get_db_cursor(commit=False) as cur:
-            cur.execute(sql, tuple(params))
+            cur.execute(sql, params)
             rows = cur.fetchall()
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
-    def serialize(row):
-        return {
-            "loan_id": row["loan_id"],
-            "item_id": row["item_id"],
-            "user_id": row["user_id"],
-            "loan_date": row["loan_date"].isoformat() if row["loan_date"] else None,
-            "due_date": row["due_date"].isoformat() if row["due_date"] else None,
-            "return_date": row["return_date"].isoformat() if row["return_date"] else None,
-            "fine_paid": float(row["fine_paid"]) if row["fine_paid"] is not None else 0.0,
-        }
+    return jsonify([_serialize_loan(r, fields) for r in rows]), 200
 
-    return jsonify([serialize(r) for r in rows]), 200
+
+async def list_loans_for_user_async(
+    user_id: int, args: Mapping[str, str], current: Dict[str, Any]
+) -> Tuple[Any, int]:
+    """
+    asyncio variant of GET /api/users/<user_id>/loans (served natively by asgi.py).
+    `current` holds the verified JWT claims (user_id, role, library_id).
+    """
+    current_role = (current.get("role") or "").lower()
+    if current_role != "admin" and user_id != current["user_id"]:
+        return error_payload("forbidden", "You can only list your own loans."), 403
+
+    try:
+        sql, params, fields = _build_loans_for_user_query(user_id, args)
+    except ParseError as e:
+        return error_payload(e.error_code, e.message), e.status
+
+    try:
+        rows = await async_db.fetch(sql, params)
+    except Exception:
+        logging.exception("Database error")
+        return error_payload("db_error", "Database error occurred."), 500
+
+    return [_serialize_loan(r, fields) for r in rows], 200
 
 
 @loan_bp.get("/loans/overdue")
@@ -462,21 +1017,12 @@ def list_overdue_loans() -> Tuple[Response, int]:
     """
     GET /api/loans/overdue
     Admin-only listing of all overdue (due_date < today, not returned) loans.
+    Optional fields: comma separated subset of LOAN_FIELDS.
     """
-    sql = """
-        SELECT
-            loan_id,
-            item_id,
-            user_id,
-            loan_date,
-            due_date,
-            return_date,
-            fine_paid
-        FROM Loan
-        WHERE return_date IS NULL
-          AND due_date < CURRENT_DATE
-        ORDER BY due_date ASC
-    """
+    try:
+        sql, fields = _build_overdue_loans_query(request.args)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
 
     try:
         with get_db_cursor(commit=False) as cur:
@@ -485,15 +1031,22 @@ def list_overdue_loans() -> Tuple[Response, int]:
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
-    def serialize(row):
-        return {
-            "loan_id": row["loan_id"],
-            "item_id": row["item_id"],
-            "user_id": row["user_id"],
-            "loan_date": row["loan_date"].isoformat() if row["loan_date"] else None,
-            "due_date": row["due_date"].isoformat() if row["due_date"] else None,
-            "return_date": row["return_date"].isoformat() if row["return_date"] else None,
-            "fine_paid": float(row["fine_paid"]) if row["fine_paid"] is not None else 0.0,
-        }
-
-    return jsonify([serialize(r) for r in rows]), 200
+    return jsonify([_serialize_loan(r, fields) for r in rows]), 200
+
+
+async def list_overdue_loans_async(args: Mapping[str, str]) -> Tuple[Any, int]:
+    """
+    asyncio variant of GET /api/loans/overdue (admin role checked by asgi.py).
+    """
+    try:
+        sql, fields = _build_overdue_loans_query(args)
+    except ParseError as e:
+        return error_payload(e.error_code, e.message), e.status
+
+    try:
+        rows = await async_db.fetch(sql)
+    except Exception:
+        logging.exception("Database error")
+        return error_payload("db_error", "Database error occurred."), 500
+
+    return [_serialize_loan(r, fields) for r in rows], 200
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Optional
+from typing import Optional, Sequence, Tuple
 
 
 @dataclass
@@ -75,6 +75,26 @@ def parse_date(
         )
 
 
+def parse_fields(value: Optional[str], *, allowed: Sequence[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a sparse fieldset (fields=a,b,c) against the resource's allowlist.
+
+    Returns the requested fields in allowlist order, or None if not given (all fields).
+    Raises ParseError "invalid_fields" for an empty list or unknown field names.
+    """
+    raw = (value or "").strip()
+    if not raw:
+        return None
+    requested = {part.strip() for part in raw.split(",") if part.strip()}
+    if not requested or not requested <= set(allowed):
+        raise ParseError(
+            error_code="invalid_fields",
+            message=f"fields must be a comma separated list of: {', '.join(allowed)}.",
+            status=400,
+        )
+    return tuple(f for f in allowed if f in requested)
+
+
 def require_fields(data: dict, fields: list[str]) -> None:
     """
     Ellenőrzi, hogy a megadott mezők nem üresek a data dict-ben.
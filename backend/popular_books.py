@@ -0,0 +1,167 @@
+"""
+In-process leaderboards for GET /api/books/popular (catalog home page).
+
+The counts come from book_loan_daily (loans per book, library and UTC day),
+which a trigger on Loan keeps current in the loan's own transaction
+(database/table.sql), so a leaderboard is a range sum over a few counter rows
+instead of a GROUP BY over Loan.
+
+Each (window, library_id) leaderboard holds the top MAX_LIMIT books and is
+loaded on its first request, then served from memory; once older than
+POPULAR_BOOKS_REFRESH_S it keeps serving while one background reload runs, so
+the numbers are at most that many seconds (plus one reload) behind.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from db import get_db_cursor
+
+# window= value -> number of days (None: all time)
+WINDOWS: Dict[str, Optional[int]] = {"7d": 7, "30d": 30, "all": None}
+
+# Books kept per leaderboard (upper bound of limit=)
+MAX_LIMIT = 50
+
+# Leaderboards kept (windows x libraries); the oldest is dropped beyond this
+MAX_LEADERBOARDS = 256
+
+# Counters are summed first, the Book columns are joined to the top rows only
+LEADERBOARD_SQL = """
+    WITH top AS (
+        SELECT c.book_id, SUM(c.loans)::int AS loans
+        FROM book_loan_daily c
+        WHERE (%(since)s::date IS NULL OR c.day >= %(since)s::date)
+          AND (%(library_id)s::int IS NULL OR c.library_id = %(library_id)s::int)
+        GROUP BY c.book_id
+        ORDER BY loans DESC, c.book_id
+        LIMIT %(limit)s
+    )
+    SELECT
+        b.book_id,
+        b.title,
+        b.author,
+        b.isbn,
+        b.publication_year,
+        b.category,
+        t.loans
+    FROM top t
+    JOIN Book b ON b.book_id = t.book_id
+    ORDER BY t.loans DESC, t.book_id
+"""
+
+LeaderboardKey = Tuple[str, Optional[int]]
+
+
+class Leaderboard:
+    """One loaded top list; books is never modified after load."""
+
+    def __init__(self, books: List[Dict[str, Any]], since: Optional[str]) -> None:
+        self.books = books
+        self.since = since
+        self.loaded_at = time.monotonic()
+        self.generated_at = datetime.now(timezone.utc).isoformat()
+
+
+def window_start(window: str, today: Optional[datetime] = None) -> Optional[str]:
+    """First UTC day (ISO date) counted in window, None for all time."""
+    days = WINDOWS[window]
+    if days is None:
+        return None
+    today = today or datetime.now(timezone.utc)
+    return (today.date() - timedelta(days=days - 1)).isoformat()
+
+
+class PopularBooks:
+    """Leaderboards per (window, library_id), thread-safe."""
+
+    def __init__(self, refresh_s: float = 60.0) -> None:
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+        self._boards: Dict[LeaderboardKey, Leaderboard] = {}
+        self._reloading: Set[LeaderboardKey] = set()
+        self.loads = 0
+
+    def get(self, window: str, library_id: Optional[int]) -> Leaderboard:
+        """
+        The leaderboard for a request: loaded synchronously only the first time;
+        a stale one keeps serving while a background reload runs.
+        """
+        key = (window, library_id)
+        board = self._boards.get(key)
+        if board is None:
+            return self.load(key)
+        if self.refresh_s > 0 and time.monotonic() - board.loaded_at > self.refresh_s:
+            self._reload_in_background(key)
+        return board
+
+    def load(self, key: LeaderboardKey) -> Leaderboard:
+        window, library_id = key
+        since = window_start(window)
+        with get_db_cursor(commit=False) as cur:
+            cur.execute(
+                LEADERBOARD_SQL, {"since": since, "library_id": library_id, "limit": MAX_LIMIT}
+            )
+            rows = cur.fetchall() or []
+        board = Leaderboard([dict(row) for row in rows], since)
+        with self._lock:
+            if key not in self._boards and len(self._boards) >= MAX_LEADERBOARDS:
+                oldest = min(self._boards, key=lambda k: self._boards[k].loaded_at)
+                del self._boards[oldest]
+            self._boards[key] = board
+            self.loads += 1
+        return board
+
+    def clear(self) -> None:
+        with self._lock:
+            self._boards.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            oldest = max((now - b.loaded_at for b in self._boards.values()), default=None)
+            return {
+                "leaderboards": len(self._boards),
+                "loads": self.loads,
+                "oldest_age_s": None if oldest is None else round(oldest, 1),
+                "refresh_s": self.refresh_s,
+            }
+
+    def _reload_in_background(self, key: LeaderboardKey) -> None:
+        with self._lock:
+            if key in self._reloading:
+                return
+            self._reloading.add(key)
+
+        def _run() -> None:
+            try:
+                self.load(key)
+            except Exception:
+                logging.exception("Popular books reload failed")
+            finally:
+                with self._lock:
+                    self._reloading.discard(key)
+
+        threading.Thread(target=_run, name="popular-books-reload", daemon=True).start()
+
+
+_popular: Optional[PopularBooks] = None
+_popular_lock = threading.Lock()
+
+
+def get_popular_books() -> PopularBooks:
+    """
+    Return the process-wide leaderboards.
+    POPULAR_BOOKS_REFRESH_S (default 60, 0 = never reloaded).
+    """
+    global _popular
+    if _popular is None:
+        with _popular_lock:
+            if _popular is None:
+                refresh_s = float(os.getenv("POPULAR_BOOKS_REFRESH_S", "60"))
+                _popular = PopularBooks(refresh_s=refresh_s)
+    return _popular
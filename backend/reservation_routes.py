@@ -1,35 +1,45 @@
+import logging
 from datetime import date, datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
 from flask import Blueprint, Response, jsonify, request
 from psycopg2.errors import UniqueViolation
 
+import async_db
 from auth_utils import get_current_user, login_required, role_required
 from config import RESERVATION_EXPIRY_DAYS
-from db import get_db_cursor
-from parse_utils import ParseError, parse_int
-from response_utils import error_response
+from db import get_db_cursor, savepoint
+from parse_utils import ParseError, parse_fields, parse_int
+from response_utils import error_payload, error_response
 
 reservation_bp = Blueprint("reservations", __name__)
 
 VALID_STATUSES = {"pending", "ready", "expired", "fulfilled"}
 
-
-def _serialize_reservation(row: Dict[str, Any]) -> Dict[str, Any]:
+# Public fields of a reservation (fields= allowlist); each is a Reservation column
+RESERVATION_FIELDS = (
+    "reservation_id",
+    "book_id",
+    "user_id",
+    "queue_number",
+    "reservation_date",
+    "expiry_date",
+    "status",
+)
+
+
+def _serialize_reservation(
+    row: Dict[str, Any], fields: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
     """
-    Convert a DB row into a JSON-friendly dict for Reservation entities.
+    Public shape of a Reservation row (only `fields` if given; the row then holds
+    just those columns). Dates are encoded by the JSON provider.
     """
-    return {
-        "reservation_id": row["reservation_id"],
-        "book_id": row["book_id"],
-        "user_id": row["user_id"],
-        "queue_number": row["queue_number"],
-        "reservation_date": (
-            row["reservation_date"].isoformat() if row["reservation_date"] else None
-        ),
-        "expiry_date": row["expiry_date"].isoformat() if row["expiry_date"] else None,
-        "status": row["status"],
-    }
+    return {field: row[field] for field in fields or RESERVATION_FIELDS}
+
+
+def _reservation_select_list(fields: Optional[Sequence[str]]) -> str:
+    return ", ".join(fields or RESERVATION_FIELDS)
 
 
 def _change_status(reservation_id: int, new_status: str) -> Tuple[Response, int]:
@@ -181,22 +191,24 @@ def create_reservation() -> Tuple[Response, int]:
                 expiry_date = (now + timedelta(days=RESERVATION_EXPIRY_DAYS)).date()
 
                 try:
-                    cur.execute(
-                        """
-                        INSERT INTO Reservation (
-                            book_id,
-                            user_id,
-                            queue_number,
-                            reservation_date,
-                            expiry_date,
-                            status
+                    # Savepoint keeps the transaction usable if the INSERT fails and we retry
+                    with savepoint(cur):
+                        cur.execute(
+                            """
+                            INSERT INTO Reservation (
+                                book_id,
+                                user_id,
+                                queue_number,
+                                reservation_date,
+                                expiry_date,
+                                status
+                            )
+                            VALUES (%s, %s, %s, %s, %s, 'pending')
+                            RETURNING reservation_id, reservation_date, expiry_date, status
+                            """,
+                            (book_id, user_id, next_pos, now, expiry_date),
                         )
-                        VALUES (%s, %s, %s, %s, %s, 'pending')
-                        RETURNING reservation_id, reservation_date, expiry_date, status
-                        """,
-                        (book_id, user_id, next_pos, now, expiry_date),
-                    )
-                    res = cur.fetchone()
+                        res = cur.fetchone()
                     break
                 except UniqueViolation:
                     if attempts >= max_attempts:
@@ -215,10 +227,8 @@ def create_reservation() -> Tuple[Response, int]:
                         "book_id": book_id,
                         "user_id": user_id,
                         "queue_number": next_pos,
-                        "reservation_date": res["reservation_date"].isoformat(),
-                        "expiry_date": (
-                            res["expiry_date"].isoformat() if res["expiry_date"] else None
-                        ),
+                        "reservation_date": res["reservation_date"],
+                        "expiry_date": res["expiry_date"],
                         "status": res["status"],
                     }
                 ),
@@ -229,58 +239,111 @@ def create_reservation() -> Tuple[Response, int]:
         return error_response("db_error", "Database error occurred.", status=500)
 
 
-@reservation_bp.get("/users/<int:user_id>/reservations")
-@login_required
-def list_reservations_for_user(user_id: int) -> Tuple[Response, int]:
+def _build_reservations_for_user_query(
+    user_id: int, args: Mapping[str, str]
+) -> Tuple[str, tuple, Optional[Tuple[str, ...]]]:
     """
-    GET /api/users/<user_id>/reservations
-    Optional query:
-      - status=pending|ready|expired|fulfilled|all (default: all)
+    Return (sql, params, fields) for list_reservations_for_user;
+    raises ParseError on invalid status / fields.
     """
-    current = get_current_user()
-    current_user_id = current["user_id"]
-    current_role = (current.get("role") or "").lower()
-
-    if current_role != "admin" and user_id != current_user_id:
-        return error_response("forbidden", "You can only list your own reservations.", status=403)
-
-    status = (request.args.get("status") or "all").lower()
+    fields = parse_fields(args.get("fields"), allowed=RESERVATION_FIELDS)
+    status = (args.get("status") or "all").lower()
 
     where = "user_id = %s"
     params: List[Any] = [user_id]
 
     if status != "all":
         if status not in VALID_STATUSES:
-            return error_response(
-                "invalid_status",
-                "Invalid status provided. Valid statuses are: pending, ready, expired, fulfilled.",
+            raise ParseError(
+                error_code="invalid_status",
+                message=(
+                    "Invalid status provided. "
+                    "Valid statuses are: pending, ready, expired, fulfilled."
+                ),
                 status=400,
             )
         where += " AND status = %s"
         params.append(status)
 
     sql = f"""
-        SELECT
-            reservation_id,
-            book_id,
-            user_id,
-            queue_number,
-            reservation_date,
-            expiry_date,
-            status
+        SELECT {_reservation_select_list(fields)}
         FROM Reservation
         WHERE {where}
         ORDER BY reservation_date DESC
     """
+    return sql, tuple(params), fields
+
+
+def _build_reservations_for_book_query(
+    args: Mapping[str, str],
+) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    """
+    Return (sql, fields) for list_reservations_for_book (parameter: book_id);
+    raises ParseError on invalid fields.
+    """
+    fields = parse_fields(args.get("fields"), allowed=RESERVATION_FIELDS)
+    sql = f"""
+        SELECT {_reservation_select_list(fields)}
+        FROM Reservation
+        WHERE book_id = %s
+        ORDER BY queue_number ASC
+    """
+    return sql, fields
+
+
+@reservation_bp.get("/users/<int:user_id>/reservations")
+@login_required
+def list_reservations_for_user(user_id: int) -> Tuple[Response, int]:
+    """
+    GET /api/users/<user_id>/reservations
+    Optional query:
+      - status=pending|ready|expired|fulfilled|all (default: all)
+      - fields: comma separated subset of RESERVATION_FIELDS to select and return
+    """
+    current = get_current_user()
+    current_user_id = current["user_id"]
+    current_role = (current.get("role") or "").lower()
+
+    if current_role != "admin" and user_id != current_user_id:
+        return error_response("forbidden", "You can only list your own reservations.", status=403)
+
+    try:
+        sql, params, fields = _build_reservations_for_user_query(user_id, request.args)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
 
     try:
         with get_db_cursor(commit=False) as cur:
-            cur.execute(sql, tuple(params))
+            cur.execute(sql, params)
             rows = cur.fetchall()
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
-    return jsonify([_serialize_reservation(r) for r in rows]), 200
+    return jsonify([_serialize_reservation(r, fields) for r in rows]), 200
+
+
+async def list_reservations_for_user_async(
+    user_id: int, args: Mapping[str, str], current: Dict[str, Any]
+) -> Tuple[Any, int]:
+    """
+    asyncio variant of GET /api/users/<user_id>/reservations (served natively by asgi.py).
+    """
+    current_role = (current.get("role") or "").lower()
+    if current_role != "admin" and user_id != current["user_id"]:
+        return error_payload("forbidden", "You can only list your own reservations."), 403
+
+    try:
+        sql, params, fields = _build_reservations_for_user_query(user_id, args)
+    except ParseError as e:
+        return error_payload(e.error_code, e.message), e.status
+
+    try:
+        rows = await async_db.fetch(sql, params)
+    except Exception:
+        logging.exception("Database error")
+        return error_payload("db_error", "Database error occurred."), 500
+
+    return [_serialize_reservation(r, fields) for r in rows], 200
 
 
 @reservation_bp.get("/books/<int:book_id>/reservations")
@@ -289,20 +352,13 @@ def list_reservations_for_book(book_id: int) -> Tuple[Response, int]:
     """
     GET /api/books/<book_id>/reservations
     Admin-only: waiting list ordered by queue_number.
-    """
-    sql = """
-        SELECT
-            reservation_id,
-            book_id,
-            user_id,
-            queue_number,
-            reservation_date,
-            expiry_date,
-            status
-        FROM Reservation
-        WHERE book_id = %s
-        ORDER BY queue_number ASC
+    Optional fields: comma separated subset of RESERVATION_FIELDS.
     """
+    try:
+        sql, fields = _build_reservations_for_book_query(request.args)
+    except ParseError as e:
+        return error_response(e.error_code, e.message, status=e.status)
+
     try:
         with get_db_cursor(commit=False) as cur:
             cur.execute(sql, (book_id,))
@@ -310,7 +366,27 @@ def list_reservations_for_book(book_id: int) -> Tuple[Response, int]:
     except Exception:
         return error_response("db_error", "Database error occurred.", status=500)
 
-    return jsonify([_serialize_reservation(r) for r in rows]), 200
+    return jsonify([_serialize_reservation(r, fields) for r in rows]), 200
+
+
+async def list_reservations_for_book_async(
+    book_id: int, args: Mapping[str, str]
+) -> Tuple[Any, int]:
+    """
+    asyncio variant of GET /api/books/<book_id>/reservations (admin role checked by asgi.py).
+    """
+    try:
+        sql, fields = _build_reservations_for_book_query(args)
+    except ParseError as e:
+        return error_payload(e.error_code, e.message), e.status
+
+    try:
+        rows = await async_db.fetch(sql, (book_id,))
+    except Exception:
+        logging.exception("Database error")
+        return error_payload("db_error", "Database error occurred."), 500
+
+    return [_serialize_reservation(r, fields) for r in rows], 200
 
 
 @reservation_bp.post("/reservations/<int:reservation_id>/status")
@@ -3,6 +3,34 @@ from typing import Any, Dict, Optional, Tuple
 from flask import Response, g, jsonify, make_response
 
 
+def error_payload(
+    error_code: str,
+    message: Optional[str] = None,
+    details: Optional[Any] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Build the standardized error dict (without request_id) as a plain value.
+    Used directly by the asyncio handlers, which inject request_id themselves.
+    """
+    payload: Dict[str, Any] = {"error": error_code}
+    if message:
+        payload["message"] = message
+    if details is not None:
+        payload["details"] = details
+    if isinstance(meta, dict) and meta:
+        payload["meta"] = dict(meta)
+    return payload
+
+
+def with_request_id(payload: Dict[str, Any], req_id: Optional[str]) -> Dict[str, Any]:
+    """Add meta.request_id to an error payload unless the caller already set one."""
+    if req_id:
+        meta = payload.setdefault("meta", {})
+        meta.setdefault("request_id", req_id)
+    return payload
+
+
 def error_response(
     error_code: str,
     message: Optional[str] = None,
@@ -21,21 +49,10 @@ def error_response(
       "meta": { ... } (optional key/value pairs; auto-includes request_id if available)
     }
     """
-    payload: Dict[str, Any] = {"error": error_code}
-    if message:
-        payload["message"] = message
-    if details is not None:
-        payload["details"] = details
+    payload = error_payload(error_code, message, details=details, meta=meta)
 
     # Auto-inject request_id into meta if present in flask.g
-    merged_meta: Dict[str, Any] = {}
-    if isinstance(meta, dict):
-        merged_meta.update(meta)
-    req_id = getattr(g, "request_id", None)
-    if req_id and "request_id" not in merged_meta:
-        merged_meta["request_id"] = req_id
-    if merged_meta:
-        payload["meta"] = merged_meta
+    with_request_id(payload, getattr(g, "request_id", None))
 
     resp = make_response(jsonify(payload), status)
     return resp, status
@@ -0,0 +1,195 @@
+"""
+In-process prefix index for GET /api/books/suggest (typeahead).
+
+Titles and authors are normalized like search_normalize in the database
+(accents stripped, lower case) and kept in a sorted array of
+(key, book_id); a prefix is a bisect range, so a keystroke never reaches
+Postgres. Every word start is indexed too ("rings" finds "The Lord of the
+Rings"). Matches are ranked by popularity (number of loans of the book).
+
+The index is loaded from Book / book_loan_daily on startup (or on the first request)
+and loan counts are updated in place after committed loans in this process.
+Book rows are never patched in place: the API has no book edit routes, a
+catalog import reloads the whole index after its commit, and anything else
+(other processes, direct SQL) shows up with the background reload every
+SUGGEST_INDEX_REFRESH_S seconds.
+"""
+
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from db import get_db_cursor
+
+BOOKS_SQL = "SELECT book_id, title, author FROM Book"
+
+# From the daily loan counters (database/table.sql), not a GROUP BY over Loan
+LOAN_COUNTS_SQL = """
+    SELECT book_id, SUM(loans)::int AS loan_count
+    FROM book_loan_daily
+    GROUP BY book_id
+"""
+
+# Prefixes shorter than this would match most of the catalog
+MIN_PREFIX_LENGTH = 2
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Python counterpart of search_normalize(): strip accents, lower case, single spaces."""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+def _index_keys(title: str, author: str) -> List[str]:
+    """Normalized title / author and every word-start suffix of them."""
+    keys = set()
+    for text in (normalize_text(title), normalize_text(author)):
+        words = text.split(" ")
+        for i in range(len(words)):
+            key = " ".join(words[i:])
+            if key:
+                keys.add(key)
+    return sorted(keys)
+
+
+class SuggestIndex:
+    """Sorted (key, book_id) array + per-book title/author/popularity, thread-safe."""
+
+    def __init__(self, refresh_s: float = 300.0) -> None:
+        self.refresh_s = refresh_s
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._keys: List[Tuple[str, int]] = []
+        self._books: Dict[int, Tuple[str, str]] = {}
+        self._popularity: Dict[int, int] = {}
+
+    def load(
+        self, books: Iterable[Mapping[str, Any]], loan_counts: Iterable[Mapping[str, Any]]
+    ) -> int:
+        """Replace the whole index (rows of BOOKS_SQL / LOAN_COUNTS_SQL). Returns the book count."""
+        book_map = {row["book_id"]: (row["title"], row["author"]) for row in books}
+        keys = sorted(
+            (key, book_id)
+            for book_id, (title, author) in book_map.items()
+            for key in _index_keys(title, author)
+        )
+        popularity = {row["book_id"]: int(row["loan_count"]) for row in loan_counts}
+        with self._lock:
+            self._keys = keys
+            self._books = book_map
+            self._popularity = popularity
+            self.loaded_at = time.monotonic()
+        return len(book_map)
+
+    def add_loans(self, book_id: int, count: int = 1) -> None:
+        with self._lock:
+            self._popularity[book_id] = self._popularity.get(book_id, 0) + count
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top `limit` books with a title / author word starting with prefix, most loaned first."""
+        needle = normalize_text(prefix)
+        if not needle:
+            return []
+        with self._lock:
+            keys = self._keys
+            start = bisect.bisect_left(keys, (needle,))
+            end = bisect.bisect_left(keys, (needle + "\uffff",), start)
+            matches = {book_id for _, book_id in keys[start:end]}
+            top = heapq.nsmallest(
+                limit,
+                matches,
+                key=lambda book_id: (-self._popularity.get(book_id, 0), self._books[book_id][0]),
+            )
+            return [
+                {
+                    "book_id": book_id,
+                    "title": self._books[book_id][0],
+                    "author": self._books[book_id][1],
+                }
+                for book_id in top
+            ]
+
+    def is_stale(self) -> bool:
+        if self.loaded_at is None:
+            return True
+        return self.refresh_s > 0 and time.monotonic() - self.loaded_at > self.refresh_s
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            age = None if self.loaded_at is None else time.monotonic() - self.loaded_at
+            return {
+                "books": len(self._books),
+                "keys": len(self._keys),
+                "age_s": None if age is None else round(age, 1),
+                "refresh_s": self.refresh_s,
+            }
+
+
+_index: Optional[SuggestIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """
+    Return the process-wide suggest index (possibly not loaded yet).
+    SUGGEST_INDEX_REFRESH_S (default 300, 0 = no periodic reload).
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SuggestIndex(refresh_s=float(os.getenv("SUGGEST_INDEX_REFRESH_S", "300")))
+    return _index
+
+
+def load_suggest_index(index: Optional[SuggestIndex] = None) -> int:
+    """(Re)load the index from the database. Returns the number of books indexed."""
+    index = index or get_suggest_index()
+    with get_db_cursor(commit=False) as cur:
+        cur.execute(BOOKS_SQL)
+        books = cur.fetchall()
+        cur.execute(LOAN_COUNTS_SQL)
+        loan_counts = cur.fetchall()
+    return index.load(books, loan_counts)
+
+
+def _reload_in_background(index: SuggestIndex) -> None:
+    with index._lock:
+        if index._reloading:
+            return
+        index._reloading = True
+
+    def _run() -> None:
+        try:
+            load_suggest_index(index)
+        except Exception:
+            logging.exception("Suggest index reload failed")
+        finally:
+            index._reloading = False
+
+    threading.Thread(target=_run, name="suggest-index-reload", daemon=True).start()
+
+
+def preload_suggest_index() -> None:
+    """Start loading the index without blocking (application startup)."""
+    _reload_in_background(get_suggest_index())
+
+
+def ensure_suggest_index() -> SuggestIndex:
+    """
+    Index for a request: loaded synchronously only if it was never loaded;
+    a stale index keeps serving while a background reload runs.
+    """
+    index = get_suggest_index()
+    if index.loaded_at is None:
+        load_suggest_index(index)
+    elif index.is_stale():
+        _reload_in_background(index)
+    return index
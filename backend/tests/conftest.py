@@ -2,6 +2,7 @@ import pytest
 from flask_jwt_extended import create_access_token, create_refresh_token
 
 from app import create_app
+from catalog_cache import get_catalog_cache
 
 # A route modulok saját importtal hozzák a get_db_cursor-t, ezért modulonként monkeypatch-elünk,
 # de a segédfüggvény (make_get_db_cursor) és FakeCursor globálisan itt elérhető.
@@ -63,6 +64,8 @@ def make_get_db_cursor(fetchone=None, fetchall=None, raise_on_enter=False):
 def app():
     app = create_app()
     app.config.update(TESTING=True)
+    # A katalógus cache processz-szintű: tesztek között ürítjük, hogy ne szivárogjon át adat
+    get_catalog_cache().clear()
     return app
 
 
@@ -1,4 +1,5 @@
 import admin_routes
+import book_availability
 from tests.conftest import make_get_db_cursor
 
 
@@ -34,3 +35,68 @@ def test_admin_stats_db_error(client, make_token, monkeypatch):
     r = client.get("/api/admin/stats", headers={"Authorization": f"Bearer {admin_token}"})
     assert r.status_code == 500
     assert r.get_json()["error"] == "db_error"
+
+
+def test_admin_db_stats_ok(client, make_token, monkeypatch):
+    class FakePool:
+        def stats(self):
+            return {"size": 2, "idle": 1, "in_use": 1}
+
+    monkeypatch.setattr(admin_routes, "get_pool", lambda: FakePool())
+    monkeypatch.setattr(admin_routes, "get_replica_router", lambda: None)
+    admin_token = make_token(user_id=1, role="Admin")
+    r = client.get("/api/admin/db/stats", headers={"Authorization": f"Bearer {admin_token}"})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["pool"]["in_use"] == 1
+    assert body["replicas"] == []
+    assert set(body["prepared_statements"]) == {"hits", "misses", "evictions", "failures"}
+
+
+MISMATCH = {
+    "book_id": 4,
+    "library_id": 1,
+    "expected_total_items": 2,
+    "expected_loaned_items": 1,
+    "stored_total_items": 2,
+    "stored_loaned_items": 0,
+}
+
+
+def test_admin_book_availability_verify_reports_mismatch(client, make_token, monkeypatch):
+    monkeypatch.setattr(book_availability, "get_db_cursor", make_get_db_cursor(fetchall=[MISMATCH]))
+    admin_token = make_token(user_id=1, role="Admin")
+    r = client.get(
+        "/api/admin/book-availability/verify",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["consistent"] is False
+    assert body["mismatches"] == [MISMATCH]
+
+
+def test_admin_book_availability_rebuild(client, make_token, monkeypatch):
+    rows = [{"book_id": 1}, {"book_id": 2}]
+    monkeypatch.setattr(book_availability, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    admin_token = make_token(user_id=1, role="Admin")
+    r = client.post(
+        "/api/admin/book-availability/rebuild",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert r.status_code == 200
+    assert r.get_json()["rows"] == 2
+
+
+def test_book_availability_verify_command_exit_code(app, monkeypatch):
+    runner = app.test_cli_runner()
+
+    monkeypatch.setattr(book_availability, "get_db_cursor", make_get_db_cursor(fetchall=[]))
+    result = runner.invoke(args=["book-availability", "verify"])
+    assert result.exit_code == 0
+    assert "consistent" in result.output
+
+    monkeypatch.setattr(book_availability, "get_db_cursor", make_get_db_cursor(fetchall=[MISMATCH]))
+    result = runner.invoke(args=["book-availability", "verify"])
+    assert result.exit_code == 1
+    assert "book_id=4 library_id=1" in result.output
@@ -0,0 +1,253 @@
+import asyncio
+import gzip
+import json
+from datetime import timedelta
+
+from flask_jwt_extended import create_access_token, decode_token
+
+import asgi
+import async_db
+import book_routes
+from tests.conftest import make_get_db_cursor
+
+
+def call(app, path, query="", headers=None):
+    """
+    Egy HTTP kérés lefuttatása az ASGI appon; (status, fejlécek, JSON body) a visszatérés
+    (üres body, pl. 304 esetén None; gzip body kicsomagolva).
+    """
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    hdrs = {k.decode().lower(): v.decode() for k, v in start["headers"]}
+    if hdrs.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    return start["status"], hdrs, json.loads(body) if body else None
+
+
+def fake_fetch(rows):
+    async def _fetch(sql, params=()):
+        return rows
+
+    return _fetch
+
+
+def test_asgi_list_books_served_async(app, monkeypatch):
+    rows = [
+        {
+            "book_id": 1,
+            "title": "Dune",
+            "author": "Frank Herbert",
+            "isbn": "9780441013593",
+            "publication_year": 1965,
+            "category": "Sci-Fi",
+            "total_items": 3,
+            "loaned_items": 2,
+        }
+    ]
+    monkeypatch.setattr(async_db, "fetch", fake_fetch(rows))
+    status, headers, body = call(asgi.create_asgi_app(app), "/api/books", "page=1&page_size=5")
+    assert status == 200
+    assert body[0]["title"] == "Dune"
+    assert body[0]["available_items"] == 1
+    assert headers["x-request-id"]
+
+
+def test_asgi_book_etag_revalidated_like_flask(app, client, monkeypatch):
+    row = {
+        "book_id": 5,
+        "title": "Foundation",
+        "author": "Isaac Asimov",
+        "isbn": None,
+        "publication_year": 1951,
+        "category": "Sci-Fi",
+        "total_items": 2,
+        "loaned_items": 0,
+        "version": 3,
+    }
+    stamp = {"version": 3}
+
+    async def _fetchrow(sql, params=()):
+        return stamp if sql.startswith("SELECT version") else row
+
+    monkeypatch.setattr(async_db, "fetchrow", _fetchrow)
+    asgi_app = asgi.create_asgi_app(app)
+    status, headers, body = call(asgi_app, "/api/books/5")
+    assert status == 200
+    assert body["title"] == "Foundation"
+    etag = headers["etag"]
+    assert not etag.startswith("W/")
+    assert headers["cache-control"] == "public, no-cache"
+
+    # Ugyanaz az ETag, mint a Flask nézeté (közös SQL + verzió)
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchone=row))
+    assert client.get("/api/books/5").headers["ETag"] == etag
+
+    # Egyező If-None-Match: üres 304 a katalógus cache-ből
+    status, headers, body = call(asgi_app, "/api/books/5", headers={"If-None-Match": etag})
+    assert status == 304
+    assert body is None
+    assert headers["etag"] == etag
+    assert headers["x-cache"] == "HIT"
+    assert "content-length" not in headers
+
+    # Cache nélkül csak a verziót kérdezi le
+    bypass = {"If-None-Match": etag, "X-Cache-Bypass": "1"}
+    status, headers, body = call(asgi_app, "/api/books/5", headers=bypass)
+    assert status == 304
+    assert headers["x-cache"] == "BYPASS"
+
+    # Újabb verzió: teljes válasz, más ETaggel
+    stamp, row = {"version": 4}, {**row, "version": 4}
+    status, headers, body = call(asgi_app, "/api/books/5", headers=bypass)
+    assert status == 200
+    assert headers["etag"] != etag
+
+
+def test_asgi_list_books_served_from_catalog_cache(app, client, monkeypatch):
+    calls = []
+
+    async def _fetch(sql, params=()):
+        calls.append(sql)
+        return [{"book_id": 1, "title": "Dune", "total_items": 1, "loaned_items": 0}]
+
+    monkeypatch.setattr(async_db, "fetch", _fetch)
+    asgi_app = asgi.create_asgi_app(app)
+    path, query = "/api/books", "fields=book_id,title"
+
+    status, headers, first = call(asgi_app, path, query)
+    assert status == 200
+    assert headers["x-cache"] == "MISS"
+    status, headers, second = call(asgi_app, path, query)
+    assert status == 200
+    assert headers["x-cache"] == "HIT"
+    assert second == first
+    assert len(calls) == 1
+
+    # Közös cache a Flask nézettel (ugyanaz a kulcs)
+    assert client.get(f"{path}?{query}").headers["X-Cache"] == "HIT"
+
+    status, headers, _ = call(asgi_app, path, query, headers={"X-Cache-Bypass": "1"})
+    assert headers["x-cache"] == "BYPASS"
+    assert len(calls) == 2
+
+
+def test_asgi_compressed_list_has_encoded_etag(app, monkeypatch):
+    rows = [
+        {"book_id": i, "title": f"Title {i}", "total_items": 1, "loaned_items": 0}
+        for i in range(1, 51)
+    ]
+    monkeypatch.setattr(async_db, "fetch", fake_fetch(rows))
+    asgi_app = asgi.create_asgi_app(app)
+    status, headers, body = call(
+        asgi_app, "/api/books", "page_size=50", headers={"Accept-Encoding": "gzip"}
+    )
+    assert status == 200
+    assert headers["content-encoding"] == "gzip"
+    assert len(body) == 50
+    etag = headers["etag"]
+    assert not etag.startswith("W/")
+    assert etag.endswith('-gzip"')
+
+    # A gzip ETag is the same representation as the identity one
+    for accept in ("gzip", "identity"):
+        status, _, _ = call(
+            asgi_app,
+            "/api/books",
+            "page_size=50",
+            headers={"Accept-Encoding": accept, "If-None-Match": etag},
+        )
+        assert status == 304
+
+
+def test_asgi_book_not_found_has_request_id(app, monkeypatch):
+    async def _fetchrow(sql, params=()):
+        return None
+
+    monkeypatch.setattr(async_db, "fetchrow", _fetchrow)
+    status, _, body = call(
+        asgi.create_asgi_app(app), "/api/books/999", headers={"X-Request-ID": "req-1"}
+    )
+    assert status == 404
+    assert body["error"] == "book_not_found"
+    assert body["meta"]["request_id"] == "req-1"
+
+
+def test_asgi_invalid_pagination(app):
+    status, _, body = call(asgi.create_asgi_app(app), "/api/books", "page=0")
+    assert status == 400
+    assert body["error"] == "invalid_pagination"
+
+
+def test_asgi_user_loans_require_token(app):
+    status, _, body = call(asgi.create_asgi_app(app), "/api/users/1/loans")
+    assert status == 401
+    assert body["error"] == "unauthorized"
+
+
+def test_asgi_user_loans_forbidden_for_other_member(app, make_token):
+    token = make_token(user_id=2, role="Member")
+    status, _, body = call(
+        asgi.create_asgi_app(app),
+        "/api/users/1/loans",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert status == 403
+    assert body["error"] == "forbidden"
+
+
+def test_asgi_overdue_requires_admin(app, make_token):
+    token = make_token(user_id=1, role="Member")
+    status, _, body = call(
+        asgi.create_asgi_app(app),
+        "/api/loans/overdue",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert status == 403
+    assert body["error"] == "forbidden"
+
+
+def test_asgi_other_routes_fall_back_to_flask(app):
+    status, _, body = call(asgi.create_asgi_app(app), "/api/health")
+    assert status == 200
+    assert body["status"] == "ok"
+
+
+def test_asgi_rejects_expired_and_revoked_tokens_like_flask(app, client):
+    with app.app_context():
+        expired = create_access_token(identity="1", expires_delta=timedelta(seconds=-1))
+        revoked = create_access_token(identity="1")
+        app.config["JWT_BLOCKLIST"] = {decode_token(revoked)["jti"]}
+
+    for token in (expired, revoked):
+        headers = {"Authorization": f"Bearer {token}"}
+        status, _, body = call(asgi.create_asgi_app(app), "/api/users/1/loans", headers=headers)
+        flask_r = client.get("/api/users/1/loans", headers=headers)
+        flask_body = flask_r.get_json()
+        assert (status, body["error"], body["message"]) == (
+            flask_r.status_code,
+            flask_body["error"],
+            flask_body["message"],
+        )
+        assert body["error"] == "unauthorized"
@@ -232,6 +232,14 @@ def test_logout_revokes_token(client, make_token):
     assert r.get_json()["error"] in {"token_revoked", "unauthorized"}
 
 
+def test_me_not_modified(client, make_token):
+    headers = {"Authorization": f"Bearer {make_token(user_id=1, role='Member', library_id=1)}"}
+    r = client.get("/api/me", headers=headers)
+    assert r.status_code == 200
+    r = client.get("/api/me", headers={**headers, "If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+
+
 def test_refresh_token_ok(client, make_refresh_token):
     refresh_token = make_refresh_token(user_id=1, role="Member", library_id=1)
     r = client.post("/api/token/refresh", headers={"Authorization": f"Bearer {refresh_token}"})
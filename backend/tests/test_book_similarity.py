@@ -0,0 +1,119 @@
+import pytest
+
+import book_similarity
+from tests.conftest import FakeCursor
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+# Readers 1-3 borrowed books 10 and 20, reader 3 also 30, reader 4 only 30
+USER_IDS = [1, 1, 2, 2, 3, 3, 3, 4]
+BOOK_IDS = [10, 20, 10, 20, 10, 20, 30, 30]
+
+
+class _RecordingCursor(FakeCursor):
+    """FakeCursor that records the statements and what the insert receives."""
+
+    def __init__(self, fetchone):
+        super().__init__(fetchone=fetchone)
+        self.statements = []
+        self.inserted = None
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if sql is book_similarity.INSERT_SQL:
+            self.inserted = params
+            self.rowcount = len(params[0])
+
+
+def _patch_db(monkeypatch, fetchone):
+    cur = _RecordingCursor(fetchone)
+
+    class _CM:
+        def __enter__(self):
+            return cur
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(book_similarity, "get_db_cursor", lambda commit=False: _CM())
+    return cur
+
+
+def test_top_neighbors_cosine_ranking():
+    books, similar, rank, scores, counts = book_similarity.top_neighbors(USER_IDS, BOOK_IDS)
+
+    assert list(zip(books.tolist(), similar.tolist(), rank.tolist())) == [
+        (10, 20, 1),
+        (10, 30, 2),
+        (20, 10, 1),
+        (20, 30, 2),
+        (30, 10, 1),
+        (30, 20, 2),
+    ]
+    # 10 / 20: 3 common readers of 3 each; 10 / 30: 1 of 3 and 2
+    assert scores[0] == pytest.approx(1.0)
+    assert scores[1] == pytest.approx(1 / 6**0.5)
+    assert counts.tolist() == [3, 1, 3, 1, 1, 1]
+
+
+def test_top_neighbors_rows_and_limits():
+    books, similar, rank, _, _ = book_similarity.top_neighbors(
+        USER_IDS, BOOK_IDS, rows=[30], top_k=1
+    )
+    # Tie on score and count: lower book_id first
+    assert (books.tolist(), similar.tolist(), rank.tolist()) == ([30], [10], [1])
+
+    books, _, _, _, _ = book_similarity.top_neighbors(USER_IDS, BOOK_IDS, min_co_borrowers=2)
+    assert books.tolist() == [10, 20]
+
+
+def test_top_neighbors_uses_given_borrower_counts():
+    # Only the readers of book 30 were loaded; book 10 has 3 readers in total
+    _, similar, _, scores, _ = book_similarity.top_neighbors(
+        [3, 3, 3, 4], [10, 20, 30, 30], rows=[30], borrowers=([10, 20, 30], [3, 3, 2])
+    )
+    assert similar.tolist() == [10, 20]
+    assert scores.tolist() == pytest.approx([1 / 6**0.5, 1 / 6**0.5])
+
+
+def test_incremental_refresh_recomputes_affected_books(monkeypatch):
+    cur = _patch_db(
+        monkeypatch,
+        fetchone=[
+            {"last_loan_id": 5},
+            {"loan_id": 8},
+            {"book_ids": [30]},
+            {"user_ids": [3, 3, 3, 4], "book_ids": [10, 20, 30, 30]},
+            {"book_ids": [10, 20, 30], "borrowers": [3, 3, 2]},
+        ],
+    )
+    result = book_similarity.refresh_book_similarity()
+
+    assert result == {"mode": "incremental", "last_loan_id": 8, "books": 1, "rows": 2}
+    assert cur.inserted[:3] == ([30, 30], [10, 20], [1, 2])
+    assert book_similarity.ALL_PAIRS_SQL not in cur.statements
+
+
+def test_incremental_refresh_without_new_loans(monkeypatch):
+    cur = _patch_db(monkeypatch, fetchone=[{"last_loan_id": 8}, {"loan_id": 8}])
+    result = book_similarity.refresh_book_similarity()
+
+    assert result == {"mode": "incremental", "last_loan_id": 8, "books": 0, "rows": 0}
+    assert cur.inserted is None
+    assert cur.statements[-1] is book_similarity.SAVE_STATE_SQL
+
+
+def test_refresh_command_full(app, monkeypatch):
+    _patch_db(
+        monkeypatch,
+        fetchone=[
+            {"last_loan_id": 5},
+            {"loan_id": 8},
+            {"user_ids": USER_IDS, "book_ids": BOOK_IDS},
+        ],
+    )
+    result = app.test_cli_runner().invoke(args=["similar-books", "refresh", "--full"])
+    assert result.exit_code == 0
+    assert "full refresh up to loan_id 8: 3 books, 6 neighbour rows" in result.output
@@ -1,5 +1,7 @@
+import json
+
 import book_routes
-from tests.conftest import make_get_db_cursor
+from tests.conftest import FakeCursor, make_get_db_cursor
 
 
 def test_books_list_transform(client, monkeypatch):
@@ -61,3 +63,372 @@ def test_books_get_db_error(client, monkeypatch):
     r = client.get("/api/books/1")
     assert r.status_code == 500
     assert r.get_json()["error"] == "db_error"
+
+
+def test_books_search_passes_raw_and_escaped_term(client, monkeypatch):
+    executed = []
+
+    class _Cur:
+        def execute(self, sql, params=None):
+            executed.append((sql, params))
+
+        def fetchall(self):
+            return []
+
+    class _CM:
+        def __enter__(self):
+            return _Cur()
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(book_routes, "get_db_cursor", lambda commit=False: _CM())
+    r = client.get("/api/books", query_string={"q": "García 50%", "library_id": "1"})
+    assert r.status_code == 200
+    sql, params = executed[0]
+    assert "search_vector @@" in sql
+    # Relevance ties are broken by title, then book_id, so OFFSET pages are stable
+    assert " ".join(sql.split()).endswith("b.title ASC, b.book_id ASC LIMIT %s OFFSET %s")
+    assert params == (1, "García 50%", "García 50\\%", 20, 0)
+
+
+def _book_row(book_id, title):
+    return {
+        "book_id": book_id,
+        "title": title,
+        "author": "A",
+        "isbn": str(book_id),
+        "publication_year": 2000,
+        "category": "Sci-fi",
+        "total_items": 1,
+        "loaned_items": 0,
+    }
+
+
+def test_books_cursor_mode_returns_next_cursor(client, monkeypatch):
+    # page_size=2 -> 3 rows fetched, the extra one signals a next page
+    rows = [_book_row(1, "A"), _book_row(2, "B"), _book_row(3, "C")]
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    r = client.get("/api/books?cursor=&page_size=2")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert [b["book_id"] for b in body["items"]] == [1, 2]
+    assert book_routes.decode_cursor(body["next_cursor"], "title", False) == ("B", 2)
+
+
+def test_books_cursor_last_page_has_no_next_cursor(client, monkeypatch):
+    monkeypatch.setattr(
+        book_routes, "get_db_cursor", make_get_db_cursor(fetchall=[_book_row(1, "A")])
+    )
+    cursor = book_routes.encode_cursor("title", False, _book_row(0, "0"))
+    r = client.get("/api/books", query_string={"cursor": cursor, "page_size": 2})
+    assert r.status_code == 200
+    assert r.get_json()["next_cursor"] is None
+
+
+def test_books_cursor_for_other_sort_rejected(client):
+    cursor = book_routes.encode_cursor("author", False, _book_row(1, "A"))
+    r = client.get("/api/books", query_string={"cursor": cursor, "sort": "title"})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_cursor"
+
+
+def test_books_invalid_sort(client):
+    r = client.get("/api/books?sort=isbn")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_sort"
+
+
+def test_books_get_served_from_cache_until_loan_returned(client, make_token, monkeypatch):
+    import loan_routes
+
+    row = _book_row(5, "Foundation")
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchone=row))
+    assert client.get("/api/books/5").headers["X-Cache"] == "MISS"
+    assert client.get("/api/books/5").headers["X-Cache"] == "HIT"
+    assert (
+        client.get("/api/books/5", headers={"X-Cache-Bypass": "1"}).headers["X-Cache"] == "BYPASS"
+    )
+
+    loan = {
+        "loan_id": 9,
+        "item_id": 1,
+        "user_id": 1,
+        "loan_date": None,
+        "due_date": None,
+        "return_date": None,
+        "fine_paid": 0,
+    }
+    monkeypatch.setattr(
+        loan_routes,
+        "get_db_cursor",
+        make_get_db_cursor(fetchone=[loan, {**loan, "book_id": 5}]),
+    )
+    token = make_token(user_id=1, role="Member")
+    r = client.post("/api/loans/9/return", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200
+    assert client.get("/api/books/5").headers["X-Cache"] == "MISS"
+
+
+def test_books_get_etag_revalidated_from_version_stamp(client, monkeypatch):
+    row = {**_book_row(5, "Foundation"), "version": 3}
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchone=row))
+    r = client.get("/api/books/5")
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert r.headers["Cache-Control"] == "public, no-cache"
+
+    # Cache hit: 304 straight from the cached ETag
+    r = client.get("/api/books/5", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["X-Cache"] == "HIT"
+    assert r.data == b""
+
+    # Cache miss: only the version lookup runs (its row has no counters)
+    book_routes.get_catalog_cache().clear()
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchone={"version": 3}))
+    r = client.get("/api/books/5", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag
+
+    # Newer version: full response with a different ETag
+    monkeypatch.setattr(
+        book_routes,
+        "get_db_cursor",
+        make_get_db_cursor(fetchone=[{"version": 4}, {**row, "version": 4}]),
+    )
+    r = client.get("/api/books/5", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert r.get_json()["book_id"] == 5
+
+
+def test_books_batch_reports_missing_ids(client, monkeypatch):
+    rows = [_book_row(2, "B"), _book_row(1, "A")]
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    r = client.post("/api/books/batch", json={"book_ids": [1, 7, 2, 1]})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert [b["book_id"] for b in body["books"]] == [1, 2]
+    assert body["not_found"] == [7]
+
+
+def test_books_batch_invalid_ids(client):
+    r = client.post("/api/books/batch", json={"book_ids": []})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_book_ids"
+
+    too_many = list(range(book_routes.BATCH_MAX_BOOK_IDS + 1))
+    r = client.post("/api/books/batch", json={"book_ids": too_many})
+    assert r.get_json()["error"] == "too_many_book_ids"
+
+
+def test_books_include_facets_and_total(client, monkeypatch):
+    facet_rows = [
+        {"category": "Sci-fi", "book_count": 3},
+        {"category": "Horror", "book_count": 5},
+        {"category": "", "book_count": 1},
+    ]
+    results = [facet_rows, [_book_row(1, "A")]]
+
+    class _Cur(FakeCursor):
+        def fetchall(self):
+            return results.pop(0)
+
+    class _CM:
+        def __enter__(self):
+            return _Cur()
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(book_routes, "get_db_cursor", lambda commit=False: _CM())
+    r = client.get("/api/books?include=total,facets&category=SCI-FI")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert [b["book_id"] for b in body["items"]] == [1]
+    assert body["total"] == 3
+    assert body["facets"]["category"] == [
+        {"value": "Horror", "count": 5},
+        {"value": "Sci-fi", "count": 3},
+    ]
+
+
+def test_books_invalid_include(client):
+    r = client.get("/api/books?include=facets,authors")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_include"
+
+
+def test_books_sparse_fields_narrow_select_and_items(client, monkeypatch):
+    executed = []
+
+    class _Cur(FakeCursor):
+        def execute(self, sql, params=None):
+            executed.append((sql, params))
+
+    class _CM:
+        def __enter__(self):
+            return _Cur(fetchall=[{"book_id": 1, "version": 1, "title": "A"}])
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(book_routes, "get_db_cursor", lambda commit=False: _CM())
+    r = client.get("/api/books?fields=title,book_id&library_id=2")
+    assert r.status_code == 200
+    assert r.get_json() == [{"book_id": 1, "title": "A"}]
+    sql, params = executed[0]
+    # No counters requested: no availability lateral, no library_id parameter
+    assert "book_availability" not in sql and "b.author" not in sql
+    assert params == (20, 0)
+
+
+def test_books_invalid_fields(client):
+    r = client.get("/api/books?fields=title,password_hash")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_fields"
+
+
+def test_books_availability_breakdown(client, monkeypatch):
+    base = {"book_id": 5, "version": 2, "queue_length": 3}
+    rows = [
+        {**base, "library_id": 1, "library_name": "Central", "total_items": 2, "loaned_items": 2},
+        {**base, "library_id": 2, "library_name": "North", "total_items": 1, "loaned_items": 0},
+    ]
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    r = client.get("/api/books/5/availability")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["reservation_queue_length"] == 3
+    assert body["available_items"] == 1
+    assert [lib["available_items"] for lib in body["libraries"]] == [0, 1]
+
+    monkeypatch.setattr(
+        book_routes,
+        "get_db_cursor",
+        make_get_db_cursor(fetchone={"version": 2, "queue_length": 3}),
+    )
+    r = client.get("/api/books/5/availability", headers={"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+
+
+def test_books_availability_without_libraries(client, monkeypatch):
+    row = {
+        "book_id": 5,
+        "version": 1,
+        "queue_length": 0,
+        "library_id": None,
+        "library_name": None,
+        "total_items": 0,
+        "loaned_items": 0,
+    }
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=[row]))
+    r = client.get("/api/books/5/availability")
+    assert r.status_code == 200
+    assert r.get_json()["libraries"] == [] and r.get_json()["total_items"] == 0
+
+
+def test_books_availability_not_found(client, monkeypatch):
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=[]))
+    r = client.get("/api/books/999/availability")
+    assert r.status_code == 404
+    assert r.get_json()["error"] == "book_not_found"
+
+
+def test_books_similar(client, monkeypatch):
+    base = {"book_id": 5, "refreshed_at": "2025-01-01 00:00:00+00"}
+    rows = [
+        {
+            **_book_row(7, "A"),
+            **base,
+            "similar_book_id": 7,
+            "version": 1,
+            "score": 0.81234567,
+            "co_borrowers": 12,
+        },
+        {
+            **_book_row(9, "B"),
+            **base,
+            "similar_book_id": 9,
+            "version": 3,
+            "score": 0.5,
+            "co_borrowers": 4,
+        },
+    ]
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    r = client.get("/api/books/5/similar?limit=2")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["book_id"] == 5
+    assert [(b["book_id"], b["title"], b["score"]) for b in body["similar"]] == [
+        (7, "A", 0.8123),
+        (9, "B", 0.5),
+    ]
+
+    r = client.get("/api/books/5/similar?limit=2", headers={"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+
+
+def test_books_similar_empty_not_found_and_limit(client, monkeypatch):
+    no_neighbours = {"book_id": 5, "refreshed_at": None, "similar_book_id": None, "version": None}
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=[no_neighbours]))
+    assert client.get("/api/books/5/similar").get_json() == {"book_id": 5, "similar": []}
+
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=[]))
+    r = client.get("/api/books/999/similar")
+    assert r.status_code == 404
+    assert r.get_json()["error"] == "book_not_found"
+
+    r = client.get("/api/books/5/similar?limit=21")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_limit"
+
+
+class _FakeRowStream:
+    closed = False
+
+    def __init__(self, sql, params=None, itersize=2000):
+        self.sql, self.params = sql, params
+        self._rows = iter([_book_row(1, "A"), _book_row(2, 'B, "quoted"')])
+        _FakeRowStream.last = self
+
+    def __iter__(self):
+        return self._rows
+
+    def close(self):
+        _FakeRowStream.closed = True
+
+
+def test_books_export_streams_ndjson_and_csv(client, make_token, monkeypatch):
+    monkeypatch.setattr(book_routes, "RowStream", _FakeRowStream)
+    headers = {"Authorization": f"Bearer {make_token(user_id=1, role='Admin')}"}
+
+    r = client.get("/api/books/export", headers=headers)
+    assert r.status_code == 200
+    assert r.mimetype == "application/x-ndjson"
+    lines = r.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["book_id"] for line in lines] == [1, 2]
+    assert json.loads(lines[0])["available_items"] == 1
+    assert "ORDER BY b.book_id" in _FakeRowStream.last.sql
+    r.close()
+    assert _FakeRowStream.closed
+
+    r = client.get("/api/books/export?format=csv&fields=book_id,title", headers=headers)
+    assert r.mimetype == "text/csv"
+    assert r.get_data(as_text=True).splitlines() == [
+        "book_id,title",
+        "1,A",
+        '2,"B, ""quoted"""',
+    ]
+
+
+def test_books_export_admin_only_and_invalid_format(client, make_token):
+    member = {"Authorization": f"Bearer {make_token(user_id=2, role='Member')}"}
+    assert client.get("/api/books/export", headers=member).status_code == 403
+
+    admin = {"Authorization": f"Bearer {make_token(user_id=1, role='Admin')}"}
+    r = client.get("/api/books/export?format=xml", headers=admin)
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_format"
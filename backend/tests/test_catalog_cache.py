@@ -0,0 +1,54 @@
+import time
+
+from catalog_cache import CatalogCache
+
+
+def test_cache_hit_and_lru_eviction():
+    cache = CatalogCache(max_entries=2, ttl=60)
+    e = cache.epoch()
+    cache.put("a", 1, [1], e)
+    cache.put("b", 2, [2], e)
+    assert cache.get("a") == 1  # "a" most recently used -> "b" is evicted next
+    cache.put("c", 3, [3], e)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_cache_entries_expire_after_ttl():
+    cache = CatalogCache(max_entries=10, ttl=0.01)
+    cache.put("a", 1, [1], cache.epoch())
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_books_drops_only_tagged_entries():
+    cache = CatalogCache(max_entries=10, ttl=60)
+    e = cache.epoch()
+    cache.put("list-1-2", [1, 2], [1, 2], e)
+    cache.put("book-3", 3, [3], e)
+    cache.invalidate_books([2])
+    assert cache.get("list-1-2") is None
+    assert cache.get("book-3") == 3
+
+
+def test_put_after_invalidation_of_read_is_rejected():
+    cache = CatalogCache(max_entries=10, ttl=60)
+    e = cache.epoch()  # read started...
+    cache.invalidate_books([1])  # ...a loan committed meanwhile
+    cache.put("book-1", "stale", [1], e)
+    assert cache.get("book-1") is None
+    assert cache.stats()["stale_puts"] == 1
+
+    cache.put("book-2", "fresh", [2], e)  # other books are unaffected
+    assert cache.get("book-2") == "fresh"
+
+
+def test_disabled_cache_stores_nothing():
+    cache = CatalogCache(max_entries=0, ttl=60)
+    cache.put("a", 1, [1], cache.epoch())
+    assert cache.get("a") is None
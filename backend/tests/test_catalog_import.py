@@ -0,0 +1,110 @@
+import io
+
+import psycopg2
+
+import catalog_import
+from tests.conftest import FakeCursor
+
+
+class _CopyCursor(FakeCursor):
+    """FakeCursor that records what COPY would receive."""
+
+    copied = b""
+    rowcount = 0
+
+    def copy_expert(self, sql, file, size=8192):
+        data = file.read()
+        _CopyCursor.copied = data
+        self.rowcount = data.count(b"\n")
+
+
+def _patch_db(monkeypatch, rejected=()):
+    class _CM:
+        def __enter__(self):
+            return _CopyCursor(
+                fetchone=[{"inserted": 1, "updated": 0}, {"inserted": 2, "updated": 1}],
+                fetchall=list(rejected),
+            )
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(catalog_import, "get_db_cursor", lambda commit=False: _CM())
+
+
+def test_ndjson_lines_become_csv_rows(monkeypatch):
+    _patch_db(monkeypatch)
+    feed = b'{"isbn": "1", "title": "T, with comma", "author": "A", "library_id": 1}\n\nnot json\n'
+    result = catalog_import.import_catalog(io.BytesIO(feed), "ndjson")
+
+    assert _CopyCursor.copied.decode().splitlines() == [
+        '1,"T, with comma",A,,,1,,,',
+        ",,,,,,,,invalid_json",
+    ]
+    assert result["rows"] == 2
+    assert result["items_updated"] == 1
+
+
+def test_unparseable_csv_lines_are_rejected_per_row(monkeypatch):
+    _patch_db(monkeypatch)
+    feed = (
+        b"title,isbn,author\n"
+        b'"Multi\nline",1,A\n'
+        b"too,many,fields,here\n"
+        b"\n"
+        b"Bad \xff byte,2,A\n"
+        b"Nul \x00,3,A\n"
+        b"Last,4,B\n"
+    )
+    result = catalog_import.import_catalog(io.BytesIO(feed), "csv")
+
+    assert _CopyCursor.copied.decode().split("\n")[:-1] == [
+        '1,"Multi',
+        'line",A,,,,,,',
+        ",,,,,,,,invalid_csv",
+        ",,,,,,,,invalid_csv",
+        ",,,,,,,,invalid_csv",
+        "4,Last,B,,,,,,",
+    ]
+    assert result["books_inserted"] == 1
+
+
+def test_csv_header_is_validated(monkeypatch):
+    _patch_db(monkeypatch)
+    try:
+        catalog_import.import_catalog(io.BytesIO(b"isbn,price\n1,2\n"), "csv")
+    except catalog_import.ParseError as e:
+        assert e.error_code == "invalid_import_header"
+    else:
+        raise AssertionError("ParseError expected")
+
+
+def test_admin_import_endpoint_reports_rejected_rows(client, make_token, monkeypatch):
+    _patch_db(monkeypatch, rejected=[{"reject_reason": "missing_title", "row_count": 3}])
+    r = client.post(
+        "/api/admin/catalog/import",
+        data=b"isbn,title,author\n1,,A\n",
+        headers={"Authorization": f"Bearer {make_token(user_id=1, role='Admin')}"},
+        content_type="text/csv",
+    )
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["rejected"] == {"missing_title": 3}
+    assert body["books_inserted"] == 1
+    assert _CopyCursor.copied == b"1,,A,,,,,,\n"
+
+
+def test_admin_import_endpoint_hides_copy_error_details(client, make_token, monkeypatch):
+    def _copy_fails(self, sql, file, size=8192):
+        raise psycopg2.DataError("invalid input syntax near line 7: secret detail")
+
+    _patch_db(monkeypatch)
+    monkeypatch.setattr(_CopyCursor, "copy_expert", _copy_fails)
+    r = client.post(
+        "/api/admin/catalog/import",
+        data=b"isbn,title,author\n1,T,A\n",
+        headers={"Authorization": f"Bearer {make_token(user_id=1, role='Admin')}"},
+        content_type="text/csv",
+    )
+    assert r.status_code == 400
+    assert r.get_json()["message"] == "Malformed import file."
@@ -0,0 +1,113 @@
+import gzip
+import json
+import os
+
+import pytest
+from flask import Response
+
+import book_routes
+from tests.conftest import make_get_db_cursor
+
+
+def _book_rows(n):
+    return [
+        {
+            "book_id": i,
+            "title": f"Title {i}",
+            "author": "Author",
+            "isbn": str(i),
+            "publication_year": 2000,
+            "category": "Sci-fi",
+            "total_items": 1,
+            "loaned_items": 0,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def test_large_list_gzipped_with_encoded_etag(client, monkeypatch):
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=_book_rows(50)))
+    r = client.get("/api/books?page_size=50", headers={"Accept-Encoding": "gzip, deflate"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["Vary"]
+    assert len(json.loads(gzip.decompress(r.data))) == 50
+    etag = r.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert etag.endswith('-gzip"')
+    identity = client.get("/api/books?page_size=50").headers["ETag"]
+    assert etag == identity[:-1] + '-gzip"'
+
+    # The per-encoding ETag still revalidates (served from the catalog cache)
+    r2 = client.get(
+        "/api/books?page_size=50",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    assert r2.status_code == 304
+
+
+def test_brotli_preferred_when_available(client, monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=_book_rows(50)))
+    r = client.get("/api/books?page_size=50", headers={"Accept-Encoding": "gzip, br"})
+    assert r.headers["Content-Encoding"] == "br"
+    assert r.headers["ETag"].endswith('-br"')
+    assert len(json.loads(brotli.decompress(r.data))) == 50
+
+
+def test_small_or_unnegotiated_responses_not_compressed(client, monkeypatch):
+    r = client.get("/api/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+    assert r.get_json() == {"status": "ok"}
+
+    monkeypatch.setattr(book_routes, "get_db_cursor", make_get_db_cursor(fetchall=_book_rows(50)))
+    r = client.get("/api/books?page_size=50", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in r.headers
+    assert len(r.get_json()) == 50
+
+
+def test_streamed_response_compressed_incrementally(app):
+    @app.get("/api/test-stream")
+    def _stream():
+        return Response((f'{{"n": {i}}}\n' for i in range(3)), mimetype="application/x-ndjson")
+
+    @app.get("/api/test-png")
+    def _png():
+        return Response(b"\x89PNG" + b"\x00" * 4096, mimetype="image/png")
+
+    client = app.test_client()
+    r = client.get("/api/test-stream", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in r.headers
+    assert gzip.decompress(r.data).decode().splitlines() == ['{"n": 0}', '{"n": 1}', '{"n": 2}']
+
+    r = client.get("/api/test-png", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+
+
+def test_openapi_served_precompressed(app, client):
+    with open(os.path.join(app.root_path, "openapi.yaml"), "rb") as f:
+        spec = f.read()
+
+    r = client.get("/api/openapi.yaml", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(r.data) == spec
+    assert r.headers["ETag"].endswith('-gzip"')
+
+    r2 = client.get(
+        "/api/openapi.yaml",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": r.headers["ETag"]},
+    )
+    assert r2.status_code == 304
+
+    r3 = client.get("/api/openapi.yaml")
+    assert "Content-Encoding" not in r3.headers
+    assert r3.data == spec
+
+    # Identity ETag sent to a gzip client (and vice versa) is the same representation
+    r4 = client.get(
+        "/api/openapi.yaml",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": r3.headers["ETag"]},
+    )
+    assert r4.status_code == 304
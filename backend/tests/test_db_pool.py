@@ -0,0 +1,316 @@
+import json
+import threading
+
+import psycopg2
+import pytest
+
+import db
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.status = psycopg2.extensions.STATUS_READY
+        self.rollbacks = 0
+        self.commits = 0
+        self.statements = []
+
+    def cursor(self, cursor_factory=None):
+        self.status = psycopg2.extensions.STATUS_BEGIN
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.status = psycopg2.extensions.STATUS_READY
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.STATUS_READY
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def _connect():
+        conn = FakeConn()
+        opened.append(conn)
+        return conn
+
+    return db.ConnectionPool(_connect, **kwargs), opened
+
+
+def test_pool_reuses_released_connection():
+    pool, opened = make_pool(min_size=0, max_size=2)
+    c1 = pool.getconn()
+    pool.putconn(c1)
+    c2 = pool.getconn()
+    assert c1 is c2
+    assert len(opened) == 1
+
+
+def test_pool_times_out_when_exhausted():
+    pool, _ = make_pool(min_size=0, max_size=1, timeout=0.05)
+    pool.getconn()
+    with pytest.raises(db.PoolTimeout):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_pool_waiter_gets_released_connection():
+    pool, opened = make_pool(min_size=0, max_size=1, timeout=2)
+    c1 = pool.getconn()
+    got = []
+
+    t = threading.Thread(target=lambda: got.append(pool.getconn()))
+    t.start()
+    pool.putconn(c1)
+    t.join(timeout=2)
+    assert got == [c1]
+    assert len(opened) == 1
+
+
+def test_pool_rolls_back_open_transaction_on_release():
+    pool, _ = make_pool(min_size=0, max_size=1)
+    conn = pool.getconn()
+    conn.cursor()
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_pool_discards_broken_and_stale_connections():
+    pool, opened = make_pool(min_size=0, max_size=2, max_lifetime=0.01)
+    broken = pool.getconn()
+    broken.closed = 2
+    pool.putconn(broken)
+    assert pool.stats()["size"] == 0
+
+    stale = pool.getconn()
+    pool.putconn(stale)
+    stale.pool_created_at -= 1  # older than max_lifetime
+    fresh = pool.getconn()
+    assert fresh is not stale
+    assert stale.closed
+    assert len(opened) == 3
+
+
+def test_pool_fill_opens_min_size():
+    pool, opened = make_pool(min_size=2, max_size=4)
+    pool.fill()
+    assert len(opened) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_get_db_cursor_commits_and_releases(monkeypatch):
+    pool, opened = make_pool(min_size=0, max_size=1)
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    with db.get_db_cursor(commit=True):
+        pass
+    assert opened[0].commits == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_get_db_cursor_discards_connection_on_operational_error(monkeypatch):
+    pool, opened = make_pool(min_size=0, max_size=1)
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    with pytest.raises(psycopg2.OperationalError):
+        with db.get_db_cursor(commit=True):
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+    assert opened[0].closed
+    assert pool.stats()["size"] == 0
+
+
+def test_request_session_shares_one_connection_and_commits_once(app, monkeypatch):
+    pool, opened = make_pool(min_size=0, max_size=1, timeout=0.05)
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    @app.get("/_test/two-blocks")
+    def _two_blocks():
+        with db.get_db_cursor(commit=False) as cur:
+            cur.execute("SELECT 1")
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute("UPDATE x SET y = 1")
+        return "ok"
+
+    r = app.test_client().get("/_test/two-blocks")
+    assert r.status_code == 200
+    assert len(opened) == 1
+    assert opened[0].commits == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_request_session_failed_block_rolls_back_to_savepoint(app, monkeypatch):
+    pool, opened = make_pool(min_size=0, max_size=1)
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    @app.get("/_test/partial-failure")
+    def _partial_failure():
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute("INSERT INTO a VALUES (1)")
+        try:
+            with db.get_db_cursor(commit=True) as cur:
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        return "ok"
+
+    r = app.test_client().get("/_test/partial-failure")
+    assert r.status_code == 200
+    stmts = opened[0].statements
+    assert stmts[1].startswith("SAVEPOINT ")
+    assert stmts[2].startswith("ROLLBACK TO SAVEPOINT ")
+    # The first block's write is still committed
+    assert opened[0].commits == 1
+
+
+def test_request_session_commit_failure_returns_db_error(app, monkeypatch):
+    pool, opened = make_pool(min_size=0, max_size=1)
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    @app.get("/_test/commit-fails")
+    def _commit_fails():
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute("UPDATE x SET y = 1")
+            cur.conn.commit = _raise_operational
+        return "ok"
+
+    r = app.test_client().get("/_test/commit-fails")
+    assert r.status_code == 500
+    assert r.get_json()["error"] == "db_error"
+    assert pool.stats()["size"] == 0
+
+
+def _raise_operational():
+    raise psycopg2.OperationalError("connection lost")
+
+
+def make_router(n=1):
+    pools = [make_pool(min_size=0, max_size=1) for _ in range(n)]
+    return db.ReplicaRouter([p for p, _ in pools], retry_after=60), [o for _, o in pools]
+
+
+def test_reads_go_to_replica_until_request_writes(app, monkeypatch):
+    pool, primary = make_pool(min_size=0, max_size=1)
+    router, (replica,) = make_router()
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+    monkeypatch.setattr(db, "get_replica_router", lambda: router)
+
+    @app.get("/_test/read-write-read")
+    def _read_write_read():
+        with db.get_db_cursor() as cur:
+            cur.execute("SELECT 'replica'")
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute("UPDATE x SET y = 1")
+        with db.get_db_cursor() as cur:
+            cur.execute("SELECT 'primary'")
+        return "ok"
+
+    assert app.test_client().get("/_test/read-write-read").status_code == 200
+    assert replica[0].statements == ["SELECT 'replica'"]
+    assert primary[0].statements[0] == "UPDATE x SET y = 1"
+    assert "SELECT 'primary'" in primary[0].statements
+    assert router.pools[0].stats()["idle"] == 1
+
+
+def test_use_primary_skips_replica(app, monkeypatch):
+    pool, primary = make_pool(min_size=0, max_size=1)
+    router, (replica,) = make_router()
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+    monkeypatch.setattr(db, "get_replica_router", lambda: router)
+
+    @app.get("/_test/primary-read")
+    def _primary_read():
+        db.use_primary()
+        with db.get_db_cursor() as cur:
+            cur.execute("SELECT 1")
+        return "ok"
+
+    assert app.test_client().get("/_test/primary-read").status_code == 200
+    assert replica == []
+    assert primary[0].statements == ["SELECT 1"]
+
+
+def test_unreachable_replica_falls_back_to_primary(app, monkeypatch):
+    def _refuse():
+        raise psycopg2.OperationalError("could not connect to server")
+
+    router = db.ReplicaRouter([db.ConnectionPool(_refuse, min_size=0)], retry_after=60)
+    pool, primary = make_pool(min_size=0, max_size=1)
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+    monkeypatch.setattr(db, "get_replica_router", lambda: router)
+
+    @app.get("/_test/fallback")
+    def _fallback():
+        with db.get_db_cursor() as cur:
+            cur.execute("SELECT 1")
+        return "ok"
+
+    assert app.test_client().get("/_test/fallback").status_code == 200
+    assert primary[0].statements == ["SELECT 1"]
+    assert router.healthy() == [False]
+
+
+def test_to_server_params_numbers_placeholders_and_unescapes():
+    sql, n = db.to_server_params("SELECT * FROM Book WHERE title LIKE '%%x' AND id = %s OR a = %s")
+    assert sql == "SELECT * FROM Book WHERE title LIKE '%x' AND id = $1 OR a = $2"
+    assert n == 2
+
+
+def test_to_server_params_skips_named_and_utility_statements():
+    assert db.to_server_params("SELECT %(name)s") is None
+    assert db.to_server_params("SAVEPOINT sp_1") is None
+
+
+def test_normalize_sql_collapses_whitespace_and_literals():
+    sql = "SELECT *\n  FROM Book\n WHERE title = 'O''Brien' AND book_id = 42 AND x = %s"
+    assert db.normalize_sql(sql) == "SELECT * FROM Book WHERE title = ? AND book_id = ? AND x = %s"
+
+
+def test_server_timing_header_reports_db_usage(app, monkeypatch):
+    pool, _ = make_pool(min_size=0, max_size=1)
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    @app.get("/_test/timed")
+    def _timed():
+        with db.get_db_cursor() as cur:
+            cur.execute("SELECT 1")
+        return "ok"
+
+    r = app.test_client().get("/_test/timed")
+    assert r.headers["Server-Timing"].startswith("db;dur=")
+    assert "db-acquire;dur=" in r.headers["Server-Timing"]
+
+    # No DB work, no header
+    assert "Server-Timing" not in app.test_client().get("/api/health").headers
+
+
+def test_slow_query_logged_with_request_id(app, monkeypatch, caplog):
+    monkeypatch.setenv("DB_SLOW_QUERY_MS", "10")
+
+    with app.test_request_context("/api/books", headers={"X-Request-ID": "rid-7"}):
+        app.preprocess_request()
+        with caplog.at_level("WARNING", logger="db.slow_query"):
+            db._record_query("SELECT * FROM Book WHERE book_id = 7", 0.005)
+            db._record_query("SELECT * FROM Book  WHERE book_id = 8", 0.05)
+        stats = db.request_db_stats()
+
+    assert stats.queries == 2
+    assert stats.slowest_sql.endswith("book_id = 8")
+    assert len(caplog.records) == 1
+    entry = json.loads(caplog.records[0].getMessage())
+    assert entry["sql"] == "SELECT * FROM Book WHERE book_id = ?"
+    assert entry["request_id"] == "rid-7"
+    assert entry["duration_ms"] == 50.0
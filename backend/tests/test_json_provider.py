@@ -0,0 +1,40 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import json_provider
+from response_utils import error_response
+
+
+def test_provider_encodes_dates_and_decimals(app):
+    payload = {
+        "loan_date": datetime(2024, 12, 1, 12, 0, tzinfo=timezone.utc),
+        "due_date": date(2024, 12, 20),
+        "fine_paid": Decimal("150.50"),
+        "z_first": 1,
+        "a_second": 2,
+    }
+    assert isinstance(app.json, json_provider.FastJSONProvider)
+    with app.app_context():
+        body = app.json.response(payload).get_data(as_text=True)
+    assert body == (
+        '{"loan_date":"2024-12-01T12:00:00+00:00","due_date":"2024-12-20",'
+        '"fine_paid":150.5,"z_first":1,"a_second":2}'
+    )
+
+
+def test_stdlib_fallback_matches(app):
+    provider = json_provider.FastJSONProvider(app)
+    provider._encode = json_provider._dumps_stdlib
+    value = {"d": date(2024, 1, 2), "n": Decimal("1.25"), "s": "árvíztűrő"}
+    assert provider.loads(provider.dumps_bytes(value)) == {
+        "d": "2024-01-02",
+        "n": 1.25,
+        "s": "árvíztűrő",
+    }
+
+
+def test_error_response_uses_provider(app):
+    with app.test_request_context():
+        resp, status = error_response("bad", "Bad.", details={"when": date(2025, 1, 1)})
+    assert status == 400
+    assert resp.get_json()["details"] == {"when": "2025-01-01"}
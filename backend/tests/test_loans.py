@@ -34,8 +34,14 @@ def test_create_loan_invalid_loan_days_value(client, make_token):
         assert r.get_json()["error"] == "invalid_loan_days"
 
 
+# Item-level loans: one ITEM_LOAN_SQL row (book_id NULL = unknown item,
+# loan_id NULL = not inserted)
+NO_LOAN = {"loan_id": None, "loan_date": None, "due_date": None, "fine_paid": None}
+
+
 def test_create_loan_item_not_found(client, make_token, monkeypatch):
-    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchone=None))
+    row = {"book_id": None, "library_id": None, **NO_LOAN}
+    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchone=row))
     token = make_token(user_id=1, role="Member")
     r = client.post(
         "/api/loans", json={"item_id": 999}, headers={"Authorization": f"Bearer {token}"}
@@ -45,8 +51,8 @@ def test_create_loan_item_not_found(client, make_token, monkeypatch):
 
 
 def test_create_loan_different_library(client, make_token, monkeypatch):
-    item = {"item_id": 1, "book_id": 5, "library_id": 2}
-    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchone=item))
+    row = {"book_id": 5, "library_id": 2, **NO_LOAN}
+    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchone=row))
     token = make_token(user_id=1, role="Member", library_id=1)
     r = client.post("/api/loans", json={"item_id": 1}, headers={"Authorization": f"Bearer {token}"})
     assert r.status_code == 400
@@ -54,10 +60,23 @@ def test_create_loan_different_library(client, make_token, monkeypatch):
 
 
 def test_create_loan_item_already_loaned(client, make_token, monkeypatch):
-    item = {"item_id": 1, "book_id": 5, "library_id": 1}
-    active = {"loan_id": 7}
-    seq = [item, active]
-    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchone=seq))
+    row = {"book_id": 5, "library_id": 1, **NO_LOAN}
+    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchone=row))
+    token = make_token(user_id=1, role="Member", library_id=1)
+    r = client.post("/api/loans", json={"item_id": 1}, headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 409
+    assert r.get_json()["error"] == "item_already_loaned"
+
+
+def test_create_loan_item_race_unique_violation(client, make_token, monkeypatch):
+    class CM:
+        def __enter__(self):
+            raise loan_routes.UniqueViolation()
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(loan_routes, "get_db_cursor", lambda commit=False: CM())
     token = make_token(user_id=1, role="Member", library_id=1)
     r = client.post("/api/loans", json={"item_id": 1}, headers={"Authorization": f"Bearer {token}"})
     assert r.status_code == 409
@@ -66,27 +85,39 @@ def test_create_loan_item_already_loaned(client, make_token, monkeypatch):
 
 def test_create_loan_success(client, make_token, monkeypatch):
     now = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
-    due = date(2025, 1, 15)
-    item = {"item_id": 1, "book_id": 5, "library_id": 1}
-    inserted = {
+    row = {
+        "book_id": 5,
+        "library_id": 1,
         "loan_id": 123,
-        "item_id": 1,
-        "user_id": 1,
         "loan_date": now,
-        "due_date": due,
-        "return_date": None,
+        "due_date": date(2025, 1, 15),
         "fine_paid": 0.0,
     }
-    seq = [item, None, inserted]
-    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchone=seq))
+    executed = []
+
+    class Cursor(FakeCursor):
+        def execute(self, sql, params=None):
+            executed.append(sql)
+
+    class CM:
+        def __enter__(self):
+            return Cursor(fetchone=row)
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(loan_routes, "get_db_cursor", lambda commit=False: CM())
     token = make_token(user_id=1, role="Member", library_id=1)
     r = client.post("/api/loans", json={"item_id": 1}, headers={"Authorization": f"Bearer {token}"})
     assert r.status_code == 201
     body = r.get_json()
     assert body["loan_id"] == 123
     assert body["item_id"] == 1
+    assert body["book_id"] == 5
     assert body["user_id"] == 1
     assert body["status"] == "active"
+    # Single round trip
+    assert executed == [loan_routes.ITEM_LOAN_SQL]
 
 
 def test_create_loan_book_level_success(client, make_token, monkeypatch):
@@ -156,6 +187,237 @@ def test_create_loan_db_error(client, make_token, monkeypatch):
     assert r.get_json()["error"] == "db_error"
 
 
+def _patch_batch_db(monkeypatch, items=(), book_items=(), lost=()):
+    """
+    Batch loan DB: BATCH_ITEMS_SQL / BATCH_BOOK_ITEMS_SQL rows, then the insert
+    (which skips the item_ids in lost, as if loaned concurrently).
+    """
+    executed = []
+
+    class Cursor(FakeCursor):
+        def execute(self, sql, params=None):
+            executed.append((sql, params))
+            if sql is loan_routes.BATCH_ITEMS_SQL:
+                self._fetchall = list(items)
+            elif sql is loan_routes.BATCH_BOOK_ITEMS_SQL:
+                self._fetchall = list(book_items)
+            elif sql is loan_routes.BATCH_INSERT_LOANS_SQL:
+                self._fetchall = [
+                    {
+                        "loan_id": 900 + n,
+                        "item_id": item_id,
+                        "loan_date": datetime(2025, 1, 1, tzinfo=timezone.utc),
+                        "due_date": date(2025, 1, 15),
+                        "fine_paid": 0,
+                    }
+                    for n, item_id in enumerate(params[3])
+                    if item_id not in lost
+                ]
+
+    monkeypatch.setattr(loan_routes, "get_db_cursor", lambda commit=False: _CursorCM(Cursor()))
+    return executed
+
+
+class _CursorCM:
+    def __init__(self, cur):
+        self.cur = cur
+
+    def __enter__(self):
+        return self.cur
+
+    def __exit__(self, *exc):
+        return False
+
+
+BATCH_ITEMS = [
+    {"item_id": 10, "book_id": 1, "library_id": 1, "claimed": True, "on_loan": False},
+    {"item_id": 11, "book_id": 2, "library_id": 1, "claimed": True, "on_loan": True},
+    {"item_id": 12, "book_id": None, "library_id": None, "claimed": False, "on_loan": False},
+]
+BATCH_BOOK_ITEMS = [
+    {"book_id": 5, "found": True, "item_id": 50, "library_id": 1},
+    {"book_id": 6, "found": True, "item_id": None, "library_id": None},
+    {"book_id": 7, "found": False, "item_id": None, "library_id": None},
+]
+
+
+def test_create_loans_batch_best_effort(client, make_token, monkeypatch):
+    executed = _patch_batch_db(monkeypatch, BATCH_ITEMS, BATCH_BOOK_ITEMS)
+    token = make_token(user_id=1, role="Member", library_id=1)
+    r = client.post(
+        "/api/loans/batch",
+        json={
+            "item_ids": [10, 11, 12, 10],
+            "book_ids": [5, 5, 6, 7],
+            "mode": "best_effort",
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 201
+    body = r.get_json()
+    assert (body["created"], body["failed"]) == (2, 6)
+    assert [line.get("error") for line in body["results"]] == [
+        None,
+        "item_already_loaned",
+        "item_not_found",
+        "item_already_loaned",
+        None,
+        "no_available_item",
+        "no_available_item",
+        "book_not_found",
+    ]
+    assert body["results"][4]["loan"]["item_id"] == 50
+    assert body["results"][4]["loan"]["book_id"] == 5
+    assert body["results"][2]["status"] == 404
+
+    # Two claim statements and one multi-row insert for the whole batch
+    assert [sql for sql, _ in executed] == [
+        loan_routes.BATCH_ITEMS_SQL,
+        loan_routes.BATCH_BOOK_ITEMS_SQL,
+        loan_routes.BATCH_INSERT_LOANS_SQL,
+    ]
+    assert executed[0][1] == ([10, 11, 12],)
+    assert executed[1][1][3] == [10, 11]
+    assert executed[2][1][3] == [10, 50]
+
+
+def test_create_loans_batch_all_or_nothing(client, make_token, monkeypatch):
+    executed = _patch_batch_db(monkeypatch, BATCH_ITEMS[:2])
+    token = make_token(user_id=1, role="Member", library_id=1)
+    r = client.post(
+        "/api/loans/batch",
+        json={"item_ids": [10, 11]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 409
+    body = r.get_json()
+    assert body["error"] == "loan_batch_failed"
+    assert [line["error"] for line in body["details"]["results"]] == [
+        "batch_not_applied",
+        "item_already_loaned",
+    ]
+    assert loan_routes.BATCH_INSERT_LOANS_SQL not in [sql for sql, _ in executed]
+
+    _patch_batch_db(monkeypatch, BATCH_ITEMS[:1])
+    r = client.post(
+        "/api/loans/batch",
+        json={"item_ids": [10], "loan_days": 7},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 201
+    assert r.get_json()["results"][0]["loan"]["loan_id"] == 900
+
+
+def test_create_loans_batch_concurrent_loan_fails_only_its_line(client, make_token, monkeypatch):
+    token = make_token(user_id=1, role="Member", library_id=1)
+    book_items = BATCH_BOOK_ITEMS[:1]
+    _patch_batch_db(monkeypatch, BATCH_ITEMS[:1], book_items, lost=[50])
+    r = client.post(
+        "/api/loans/batch",
+        json={"item_ids": [10], "book_ids": [5], "mode": "best_effort"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 201
+    assert [line.get("error") for line in r.get_json()["results"]] == [
+        None,
+        "item_already_loaned",
+    ]
+
+    executed = _patch_batch_db(monkeypatch, BATCH_ITEMS[:1], book_items, lost=[50])
+    r = client.post(
+        "/api/loans/batch",
+        json={"item_ids": [10], "book_ids": [5]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 409
+    assert [line["error"] for line in r.get_json()["details"]["results"]] == [
+        "batch_not_applied",
+        "item_already_loaned",
+    ]
+    # The partial insert is rolled back to its savepoint
+    assert executed[-1][0].startswith("ROLLBACK TO SAVEPOINT")
+
+
+def test_create_loans_batch_validation(client, make_token):
+    token = make_token(user_id=1, role="Member")
+    headers = {"Authorization": f"Bearer {token}"}
+    cases = [
+        ({}, "missing_fields"),
+        ({"item_ids": "1,2"}, "invalid_ids"),
+        ({"book_ids": [1, "x"]}, "invalid_ids"),
+        ({"book_ids": list(range(51))}, "too_many_lines"),
+        ({"book_ids": [1], "mode": "some"}, "invalid_mode"),
+        ({"book_ids": [1], "loan_days": 0}, "invalid_loan_days"),
+    ]
+    for body, error in cases:
+        r = client.post("/api/loans/batch", json=body, headers=headers)
+        assert r.status_code == 400
+        assert r.get_json()["error"] == error
+
+
+def test_return_loans_batch(client, make_token, monkeypatch):
+    returned_at = datetime(2025, 1, 2, 9, 0, tzinfo=timezone.utc)
+    loan = {
+        "loan_id": 70,
+        "user_id": 4,
+        "loan_date": returned_at - timedelta(days=3),
+        "due_date": date(2025, 1, 13),
+        "return_date": returned_at,
+        "fine_paid": None,
+    }
+    rows = [
+        {"item_id": 1, "library_id": 1, "shelf_mark": "A-1", "book_id": 5, **loan},
+        {"item_id": 2, "library_id": 1, "shelf_mark": "A-2", "book_id": 5, "loan_id": None},
+        {"item_id": 3, "library_id": 1, "shelf_mark": "B-7", "book_id": 6, **loan, "loan_id": 71},
+    ]
+    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    token = make_token(user_id=1, role="Admin", library_id=1)
+    r = client.post(
+        "/api/loans/returns",
+        json={"item_ids": [1, 2, 9, 1], "shelf_marks": ["B-7", "A-1", "Z-9"]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 200
+    body = r.get_json()
+    # A-1 is item 1, already scanned by id: neither a second line nor counted twice
+    assert (body["returned"], body["not_on_loan"], body["unknown"]) == (2, 1, 2)
+    scanned = [
+        (line.get("item_id") or line["shelf_mark"], line["result"]) for line in body["results"]
+    ]
+    assert scanned == [
+        (1, "returned"),
+        (2, "not_on_loan"),
+        (9, "unknown"),
+        ("B-7", "returned"),
+        ("Z-9", "unknown"),
+    ]
+    assert body["results"][3]["loan"]["loan_id"] == 71
+    assert body["results"][0]["loan"]["fine_paid"] == 0.0
+
+
+def test_return_loans_batch_validation(client, make_token):
+    member = make_token(user_id=1, role="Member")
+    r = client.post(
+        "/api/loans/returns", json={"item_ids": [1]}, headers={"Authorization": f"Bearer {member}"}
+    )
+    assert r.status_code == 403
+
+    admin = make_token(user_id=1, role="Admin", library_id=None)
+    cases = [
+        ({}, "missing_fields"),
+        ({"item_ids": [1, "x"]}, "invalid_ids"),
+        ({"shelf_marks": ["A-1", ""]}, "invalid_shelf_marks"),
+        ({"shelf_marks": ["A-1"]}, "missing_fields"),
+        ({"item_ids": list(range(501))}, "too_many_items"),
+    ]
+    for body, error in cases:
+        r = client.post(
+            "/api/loans/returns", json=body, headers={"Authorization": f"Bearer {admin}"}
+        )
+        assert r.status_code == 400
+        assert r.get_json()["error"] == error
+
+
 def test_return_loan_success(client, make_token, monkeypatch):
     now = datetime(2025, 1, 2, 12, 0, tzinfo=timezone.utc)
     updated = {
@@ -402,6 +664,28 @@ def test_list_overdue_loans_admin_ok(client, make_token, monkeypatch):
     assert r.get_json()[0]["loan_id"] == 11
 
 
+def test_list_overdue_loans_sparse_fields(client, make_token, monkeypatch):
+    rows = [{"loan_id": 11, "due_date": date(2024, 12, 20)}]
+    monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    token = make_token(user_id=1, role="Admin")
+    r = client.get(
+        "/api/loans/overdue?fields=due_date,loan_id",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 200
+    assert r.get_json() == [{"loan_id": 11, "due_date": "2024-12-20"}]
+
+
+def test_list_loans_for_user_invalid_fields(client, make_token):
+    token = make_token(user_id=1, role="Member")
+    r = client.get(
+        "/api/users/1/loans?fields=loan_id,password_hash",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_fields"
+
+
 def test_return_loan_db_error(client, make_token, monkeypatch):
     monkeypatch.setattr(loan_routes, "get_db_cursor", make_get_db_cursor(raise_on_enter=True))
     token = make_token(user_id=1, role="Member")
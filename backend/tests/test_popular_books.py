@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+import book_routes
+import popular_books
+from popular_books import PopularBooks, window_start
+from tests.conftest import make_get_db_cursor
+
+ROWS = [
+    {
+        "book_id": 7,
+        "title": "Dune",
+        "author": "Frank Herbert",
+        "isbn": "7",
+        "publication_year": 1965,
+        "category": "Sci-fi",
+        "loans": 12,
+    },
+    {
+        "book_id": 3,
+        "title": "Emma",
+        "author": "Jane Austen",
+        "isbn": "3",
+        "publication_year": 1815,
+        "category": "Classic",
+        "loans": 4,
+    },
+]
+
+
+def test_window_start_counts_today():
+    today = datetime(2025, 3, 10, 23, 59, tzinfo=timezone.utc)
+    assert window_start("7d", today) == "2025-03-04"
+    assert window_start("30d", today) == "2025-02-09"
+    assert window_start("all", today) is None
+
+
+def test_leaderboard_loaded_once_then_served_from_memory(monkeypatch):
+    monkeypatch.setattr(popular_books, "get_db_cursor", make_get_db_cursor(fetchall=ROWS))
+    popular = PopularBooks(refresh_s=0)
+
+    board = popular.get("7d", None)
+    assert [b["book_id"] for b in board.books] == [7, 3]
+    assert popular.get("7d", None) is board
+    assert popular.get("7d", 2) is not board
+    assert popular.stats()["loads"] == 2
+
+
+def test_stale_leaderboard_served_while_reloading(monkeypatch):
+    popular = PopularBooks(refresh_s=60)
+    monkeypatch.setattr(popular_books, "get_db_cursor", make_get_db_cursor(fetchall=ROWS))
+    board = popular.get("all", None)
+
+    started = []
+    monkeypatch.setattr(popular, "_reload_in_background", started.append)
+    board.loaded_at -= 61
+    assert popular.get("all", None) is board
+    assert started == [("all", None)]
+
+
+def test_popular_endpoint(client, monkeypatch):
+    popular = PopularBooks(refresh_s=0)
+    monkeypatch.setattr(book_routes, "get_popular_books", lambda: popular)
+    monkeypatch.setattr(popular_books, "get_db_cursor", make_get_db_cursor(fetchall=ROWS))
+
+    r = client.get("/api/books/popular?window=30d&library_id=1&limit=1")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["window"] == "30d" and body["library_id"] == 1
+    assert body["books"] == ROWS[:1]
+
+    r = client.get(
+        "/api/books/popular?window=30d&library_id=1&limit=1",
+        headers={"If-None-Match": r.headers["ETag"]},
+    )
+    assert r.status_code == 304
+    assert popular.stats()["loads"] == 1
+
+
+def test_popular_endpoint_validation(client):
+    r = client.get("/api/books/popular?window=1y")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_window"
+
+    r = client.get("/api/books/popular?limit=51")
+    assert r.get_json()["error"] == "invalid_limit"
+
+    r = client.get("/api/books/popular?library_id=x")
+    assert r.get_json()["error"] == "invalid_library_id"
@@ -208,6 +208,18 @@ def test_list_reservations_for_book_admin_ok(client, make_token, monkeypatch):
     assert r.get_json()[0]["reservation_id"] == 1
 
 
+def test_list_reservations_for_book_sparse_fields(client, make_token, monkeypatch):
+    rows = [{"user_id": 2, "queue_number": 1}]
+    monkeypatch.setattr(reservation_routes, "get_db_cursor", make_get_db_cursor(fetchall=rows))
+    token = make_token(user_id=1, role="Admin")
+    r = client.get(
+        "/api/books/5/reservations?fields=user_id,queue_number",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 200
+    assert r.get_json() == [{"user_id": 2, "queue_number": 1}]
+
+
 def test_update_reservation_status_invalid_status(client, make_token):
     admin_token = make_token(user_id=1, role="Admin")
     r = client.post(
@@ -0,0 +1,47 @@
+import book_routes
+from suggest_index import SuggestIndex, normalize_text
+
+BOOKS = [
+    {"book_id": 1, "title": "Cien años de soledad", "author": "Gabriel García Márquez"},
+    {"book_id": 2, "title": "The Lord of the Rings", "author": "J.R.R. Tolkien"},
+    {"book_id": 3, "title": "Garden of Eden", "author": "Ernest Hemingway"},
+]
+
+
+def _index(loan_counts=()):
+    index = SuggestIndex()
+    index.load(BOOKS, [{"book_id": b, "loan_count": n} for b, n in loan_counts])
+    return index
+
+
+def test_normalize_text_strips_accents_and_case():
+    assert normalize_text("  García  MÁRQUEZ ") == "garcia marquez"
+
+
+def test_suggest_matches_word_prefixes_ranked_by_loans():
+    index = _index(loan_counts=[(3, 5)])
+    assert [b["book_id"] for b in index.suggest("GAR")] == [3, 1]
+    assert [b["book_id"] for b in index.suggest("rings")] == [2]
+    assert index.suggest("garcia marq")[0]["title"] == "Cien años de soledad"
+
+    index.add_loans(1, 10)
+    assert [b["book_id"] for b in index.suggest("gar", limit=1)] == [1]
+
+
+def test_reload_replaces_books():
+    index = _index()
+    index.load([{"book_id": 2, "title": "The Hobbit", "author": "J.R.R. Tolkien"}], [])
+    assert index.suggest("rings") == []
+    assert [b["book_id"] for b in index.suggest("hob")] == [2]
+    assert index.stats()["books"] == 1
+
+
+def test_suggest_endpoint(client, monkeypatch):
+    monkeypatch.setattr(book_routes, "ensure_suggest_index", lambda: _index())
+    r = client.get("/api/books/suggest?prefix=hem")
+    assert r.status_code == 200
+    assert r.get_json() == [{"book_id": 3, "title": "Garden of Eden", "author": "Ernest Hemingway"}]
+
+    r = client.get("/api/books/suggest?prefix=h")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "invalid_prefix"
@@ -40,6 +40,29 @@ def test_get_user_success(client, make_token, monkeypatch):
     assert body["role"] == "Member"
 
 
+def test_get_user_not_modified(client, make_token, monkeypatch):
+    row = {
+        "user_id": 1,
+        "email": "u@e.m",
+        "name": "User",
+        "address": "Addr",
+        "date_of_birth": None,
+        "library_id": 1,
+        "version": 2,
+        "role_name": "Member",
+    }
+    monkeypatch.setattr(user_routes, "get_db_cursor", make_get_db_cursor(fetchone=row))
+    headers = {"Authorization": f"Bearer {make_token(user_id=1, role='Member')}"}
+    r = client.get("/api/users/1", headers=headers)
+    assert r.status_code == 200
+    assert r.headers["Cache-Control"] == "private, no-cache"
+    etag = r.headers["ETag"]
+
+    monkeypatch.setattr(user_routes, "get_db_cursor", make_get_db_cursor(fetchone={"version": 2}))
+    r = client.get("/api/users/1", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 304
+
+
 def test_update_user_forbidden_for_other_member(client, make_token):
     token = make_token(user_id=1, role="Member")
     r = client.put("/api/users/2", json={"name": "X"}, headers={"Authorization": f"Bearer {token}"})
@@ -4,6 +4,13 @@ from flask import Blueprint, Response, jsonify, request
 
 from auth_utils import get_current_user, login_required
 from db import get_db_cursor
+from http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    conditional_response,
+    etag_for,
+    has_conditional_request,
+    is_not_modified,
+)
 from parse_utils import ParseError, parse_date
 from response_utils import error_response
 
@@ -20,6 +27,9 @@ def get_user(user_id: int) -> Tuple[Response, int]:
     Authorization:
       - Non-admin users may only view their own profile (user_id must match the token).
       - Admins may view any user's profile.
+
+    Conditional GET: ETag from App_User.version; a matching If-None-Match gets 304
+    after a version lookup.
     """
     current = get_current_user()
     current_user_id = current["user_id"]
@@ -28,6 +38,22 @@ def get_user(user_id: int) -> Tuple[Response, int]:
     if current_role != "admin" and user_id != current_user_id:
         return error_response("forbidden", "You can only view your own profile.", status=403)
 
+    if has_conditional_request():
+        try:
+            with get_db_cursor(commit=False) as cur:
+                cur.execute(
+                    "SELECT version FROM App_User WHERE user_id = %s AND is_active = TRUE",
+                    (user_id,),
+                )
+                stamp = cur.fetchone()
+        except Exception:
+            return error_response("db_error", "Database error occurred.", status=500)
+
+        if stamp is not None:
+            etag = etag_for("user", user_id, stamp["version"])
+            if is_not_modified(etag):
+                return conditional_response(None, etag, PRIVATE_CACHE_CONTROL)
+
     sql = """
         SELECT
             u.user_id,
@@ -36,6 +62,7 @@ def get_user(user_id: int) -> Tuple[Response, int]:
             u.address,
             u.date_of_birth,
             u.library_id,
+            u.version,
             r.role_name
         FROM App_User u
         JOIN User_Role r ON u.role_id = r.role_id
@@ -51,20 +78,17 @@ def get_user(user_id: int) -> Tuple[Response, int]:
     if row is None:
         return error_response("user_not_found", "User not found or not active.", status=404)
 
-    return (
-        jsonify(
-            {
-                "user_id": row["user_id"],
-                "email": row["email"],
-                "name": row["name"],
-                "address": row["address"],
-                "date_of_birth": row["date_of_birth"].isoformat() if row["date_of_birth"] else None,
-                "library_id": row["library_id"],
-                "role": row["role_name"],
-            }
-        ),
-        200,
-    )
+    payload = {
+        "user_id": row["user_id"],
+        "email": row["email"],
+        "name": row["name"],
+        "address": row["address"],
+        "date_of_birth": row["date_of_birth"],
+        "library_id": row["library_id"],
+        "role": row["role_name"],
+    }
+    etag = etag_for("user", user_id, row.get("version"))
+    return conditional_response(payload, etag, PRIVATE_CACHE_CONTROL)
 
 
 @user_bp.put("/users/<int:user_id>")
@@ -154,7 +178,7 @@ def update_user(user_id: int) -> Tuple[Response, int]:
                 "email": row["email"],
                 "name": row["name"],
                 "address": row["address"],
-                "date_of_birth": row["date_of_birth"].isoformat() if row["date_of_birth"] else None,
+                "date_of_birth": row["date_of_birth"],
                 "library_id": row["library_id"],
                 "role": row["role_name"],
             }
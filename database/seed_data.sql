@@ -122,4 +122,11 @@ INSERT INTO item (item_id, book_id, library_id, item_condition, shelf_mark) VALU
 (65, 52, 1, 'good', 'L-052-A'),
 (66, 53, 1, 'new', 'SH-053-A')
 
-ON CONFLICT (item_id) DO NOTHING;
\ No newline at end of file
+ON CONFLICT (item_id) DO NOTHING;
+--A fix id-s beszurasok utan a sorozatokat is tovabb kell leptetni,
+--kulonben az uj sorok (regisztracio, katalogus import) utkoznek
+SELECT setval(pg_get_serial_sequence('user_role', 'role_id'), (SELECT MAX(role_id) FROM user_role));
+SELECT setval(pg_get_serial_sequence('library', 'library_id'), (SELECT MAX(library_id) FROM library));
+SELECT setval(pg_get_serial_sequence('app_user', 'user_id'), (SELECT MAX(user_id) FROM app_user));
+SELECT setval(pg_get_serial_sequence('book', 'book_id'), (SELECT MAX(book_id) FROM book));
+SELECT setval(pg_get_serial_sequence('item', 'item_id'), (SELECT MAX(item_id) FROM item));
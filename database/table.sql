@@ -112,7 +112,11 @@ CREATE INDEX idx_book_title ON Book (title); --cimre keress
 CREATE INDEX idx_user_name ON App_User (name); --username keress
 CREATE INDEX idx_item_shelf_mark ON Item (shelf_mark); --raktari keszlet keress
 
-CREATE INDEX idx_loan_active --berlesi statuszhoz kapcsolodo
+--peldanyonkent legfeljebb egy aktiv kolcsonzes: a POST /api/loans egy lekerdezeses
+--peldany agaban a parhuzamos kolcsonzesek versenyet ez zarja le (UniqueViolation);
+--meglevo adatbazisnal az index ujraepitese elott ellenorizni, nincs-e dupla aktiv kolcsonzes:
+--SELECT item_id FROM Loan WHERE return_date IS NULL GROUP BY item_id HAVING COUNT(*) > 1;
+CREATE UNIQUE INDEX idx_loan_active --berlesi statuszhoz kapcsolodo
 ON Loan (item_id)
 WHERE return_date IS NULL;
 
@@ -123,4 +127,372 @@ ON Reservation (book_id, queue_number);
 
 CREATE UNIQUE INDEX unique_active_reservation_idx
 ON Reservation (book_id, user_id)
-WHERE status IN ('pending', 'ready');
\ No newline at end of file
+WHERE status IN ('pending', 'ready');
+
+--Konyvenkenti es konyvtarankenti peldanyszamok (katalogus listazashoz)
+--Az Item es Loan triggerek tartjak karban ugyanabban a tranzakcioban;
+--ujraepites / ellenorzes: flask --app app book-availability rebuild|verify
+CREATE TABLE book_availability (
+    book_id INT NOT NULL,
+    library_id INT NOT NULL,
+    total_items INT NOT NULL DEFAULT 0,
+    loaned_items INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (book_id, library_id),
+    CONSTRAINT fk_availability_book
+        FOREIGN KEY (book_id)
+        REFERENCES Book (book_id)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_availability_library
+        FOREIGN KEY (library_id)
+        REFERENCES Library (library_id)
+        ON DELETE CASCADE,
+    CONSTRAINT check_availability_counts
+        CHECK (total_items >= 0 AND loaned_items >= 0)
+);
+
+--aktiv kolcsonzes szamlalo novelese/csokkentese a peldany konyve+konyvtara szerint
+CREATE OR REPLACE FUNCTION book_availability_add_loaned(p_item_id INT, p_delta INT)
+RETURNS void AS $$
+    UPDATE book_availability a
+    SET loaned_items = a.loaned_items + p_delta
+    FROM Item i
+    WHERE i.item_id = p_item_id
+      AND a.book_id = i.book_id
+      AND a.library_id = i.library_id;
+$$ LANGUAGE sql;
+
+--INSERT / DELETE: utasitasonkent egyszer, (konyv, konyvtar) szerint osszesitve
+--(tomeges import, catalog_import.py)
+CREATE OR REPLACE FUNCTION book_availability_item_stmt_trg()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        --uj peldanynak meg nincs aktiv kolcsonzese
+        INSERT INTO book_availability (book_id, library_id, total_items, loaned_items)
+        SELECT book_id, library_id, COUNT(*), 0
+        FROM new_items
+        GROUP BY book_id, library_id
+        ON CONFLICT (book_id, library_id) DO UPDATE
+        SET total_items = book_availability.total_items + EXCLUDED.total_items;
+    ELSE
+        UPDATE book_availability a
+        SET total_items = a.total_items - o.items
+        FROM (
+            SELECT book_id, library_id, COUNT(*)::int AS items
+            FROM old_items
+            GROUP BY book_id, library_id
+        ) o
+        WHERE a.book_id = o.book_id
+          AND a.library_id = o.library_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+--peldany athelyezese masik konyvhoz / konyvtarba, aktiv kolcsonzesevel egyutt
+CREATE OR REPLACE FUNCTION book_availability_item_move_trg()
+RETURNS trigger AS $$
+DECLARE
+    active INT := (SELECT COUNT(*) FROM Loan WHERE item_id = OLD.item_id AND return_date IS NULL);
+BEGIN
+    UPDATE book_availability
+    SET total_items = total_items - 1,
+        loaned_items = loaned_items - active
+    WHERE book_id = OLD.book_id
+      AND library_id = OLD.library_id;
+
+    INSERT INTO book_availability (book_id, library_id, total_items, loaned_items)
+    VALUES (NEW.book_id, NEW.library_id, 1, active)
+    ON CONFLICT (book_id, library_id) DO UPDATE
+    SET total_items = book_availability.total_items + 1,
+        loaned_items = book_availability.loaned_items + active;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_item_availability_insert
+AFTER INSERT ON Item
+REFERENCING NEW TABLE AS new_items
+FOR EACH STATEMENT EXECUTE FUNCTION book_availability_item_stmt_trg();
+
+CREATE TRIGGER trg_item_availability_delete
+AFTER DELETE ON Item
+REFERENCING OLD TABLE AS old_items
+FOR EACH STATEMENT EXECUTE FUNCTION book_availability_item_stmt_trg();
+
+--oszloplistas UPDATE trigger nem hasznalhat transition table-t, ez soronkenti marad
+CREATE TRIGGER trg_item_availability_move
+AFTER UPDATE OF book_id, library_id ON Item
+FOR EACH ROW
+WHEN (OLD.book_id IS DISTINCT FROM NEW.book_id OR OLD.library_id IS DISTINCT FROM NEW.library_id)
+EXECUTE FUNCTION book_availability_item_move_trg();
+
+CREATE OR REPLACE FUNCTION book_availability_loan_trg()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.return_date IS NULL THEN
+        PERFORM book_availability_add_loaned(OLD.item_id, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.return_date IS NULL THEN
+        PERFORM book_availability_add_loaned(NEW.item_id, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_loan_availability
+AFTER INSERT OR DELETE ON Loan
+FOR EACH ROW EXECUTE FUNCTION book_availability_loan_trg();
+
+CREATE TRIGGER trg_loan_availability_change
+AFTER UPDATE OF item_id, return_date ON Loan
+FOR EACH ROW
+WHEN ((OLD.return_date IS NULL) IS DISTINCT FROM (NEW.return_date IS NULL)
+      OR OLD.item_id IS DISTINCT FROM NEW.item_id)
+EXECUTE FUNCTION book_availability_loan_trg();
+
+
+--Katalogus kereses (GET /api/books?q=): ekezetfuggetlen full-text + trigram
+--(a unaccent es pg_trgm a Postgres contrib csomag resze)
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+--unaccent() csak STABLE, generalt oszlophoz / indexhez IMMUTABLE wrapper kell
+CREATE OR REPLACE FUNCTION search_normalize(text)
+RETURNS text AS $$
+    SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+ALTER TABLE Book
+    ADD COLUMN search_text TEXT
+        GENERATED ALWAYS AS (search_normalize(title || ' ' || author)) STORED,
+    ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', search_normalize(title)), 'A')
+            || setweight(to_tsvector('simple', search_normalize(author)), 'B')
+        ) STORED;
+
+CREATE INDEX idx_book_search_vector ON Book USING GIN (search_vector); --szavas kereses
+CREATE INDEX idx_book_search_trgm ON Book USING GIN (search_text gin_trgm_ops); --reszszo / elgepeles
+
+
+--Keyset lapozas (GET /api/books?cursor=&sort=): (rendezesi kulcs, book_id) indexek
+CREATE INDEX idx_book_title_id ON Book (title, book_id);
+CREATE INDEX idx_book_author_id ON Book (author, book_id);
+CREATE INDEX idx_book_year_id ON Book ((COALESCE(publication_year, 0)), book_id);
+
+
+--Verzio szamlalok (ETag / If-None-Match): minden modositas noveli a sor verziojat
+ALTER TABLE Book ADD COLUMN version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE App_User ADD COLUMN version BIGINT NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_row_version()
+RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+--csak ha a UPDATE maga nem allitotta a verziot
+CREATE TRIGGER trg_book_version
+BEFORE UPDATE ON Book
+FOR EACH ROW
+WHEN (OLD.version = NEW.version)
+EXECUTE FUNCTION bump_row_version();
+
+CREATE TRIGGER trg_user_version
+BEFORE UPDATE ON App_User
+FOR EACH ROW
+WHEN (OLD.version = NEW.version)
+EXECUTE FUNCTION bump_row_version();
+
+--peldanyszam valtozas (kolcsonzes, visszahozas, uj peldany) a konyv verziojat is noveli;
+--utasitasonkent egyszer, a tranzakcioban mar irt (pl. most importalt) konyv verzioja
+--mar kulonbozik a commitolt allapottol, azt nem kell ujra irni
+CREATE OR REPLACE FUNCTION book_availability_version_stmt_trg()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE Book SET version = version + 1
+    WHERE book_id IN (SELECT DISTINCT book_id FROM changed_rows)
+      AND xmin <> pg_current_xact_id()::xid;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_availability_book_version_insert
+AFTER INSERT ON book_availability
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION book_availability_version_stmt_trg();
+
+CREATE TRIGGER trg_availability_book_version_update
+AFTER UPDATE ON book_availability
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION book_availability_version_stmt_trg();
+
+--Kategoria facet szamlalok (GET /api/books?include=facets,total, szuro nelkul)
+--'' = kategoria nelkuli konyvek (csak a total-ba szamit)
+CREATE TABLE book_category_count (
+    category VARCHAR(50) PRIMARY KEY,
+    book_count INT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION book_category_count_add(p_category TEXT, p_delta INT)
+RETURNS void AS $$
+    INSERT INTO book_category_count (category, book_count)
+    VALUES (COALESCE(p_category, ''), p_delta)
+    ON CONFLICT (category) DO UPDATE
+    SET book_count = book_category_count.book_count + EXCLUDED.book_count;
+$$ LANGUAGE sql;
+
+--INSERT / DELETE: utasitasonkent egyszer, kategoriankent osszesitve (tomeges import)
+CREATE OR REPLACE FUNCTION book_category_count_stmt_trg()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM book_category_count_add(category, COUNT(*)::int)
+        FROM new_rows GROUP BY category;
+    ELSE
+        PERFORM book_category_count_add(category, -COUNT(*)::int)
+        FROM old_rows GROUP BY category;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION book_category_count_upd_trg()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM book_category_count_add(OLD.category, -1);
+    PERFORM book_category_count_add(NEW.category, 1);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_book_category_count_insert
+AFTER INSERT ON Book
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION book_category_count_stmt_trg();
+
+CREATE TRIGGER trg_book_category_count_delete
+AFTER DELETE ON Book
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION book_category_count_stmt_trg();
+
+--csak valodi kategoria valtozasnal (a version frissites nem erinti)
+CREATE TRIGGER trg_book_category_count_update
+AFTER UPDATE OF category ON Book
+FOR EACH ROW
+WHEN (OLD.category IS DISTINCT FROM NEW.category)
+EXECUTE FUNCTION book_category_count_upd_trg();
+
+--meglevo adatbazisnal a kezdo ertekek
+INSERT INTO book_category_count (category, book_count)
+SELECT COALESCE(category, ''), COUNT(*) FROM Book GROUP BY 1
+ON CONFLICT (category) DO NOTHING;
+
+
+--"Akik ezt kolcsonoztek, ezt is": konyvenkent a TOP_K leghasonlobb konyv
+--(kozos olvasok alapjan, koszinusz hasonlosag), a Loan tortenetbol szamolva;
+--frissites: flask --app app similar-books refresh [--full]
+CREATE TABLE book_similarity (
+    book_id INT NOT NULL,
+    rank SMALLINT NOT NULL,
+    similar_book_id INT NOT NULL,
+    score REAL NOT NULL,
+    co_borrowers INT NOT NULL,
+
+    PRIMARY KEY (book_id, rank), --GET /api/books/<id>/similar sorrendben olvassa
+    CONSTRAINT fk_similarity_book
+        FOREIGN KEY (book_id)
+        REFERENCES Book (book_id)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_similarity_similar_book
+        FOREIGN KEY (similar_book_id)
+        REFERENCES Book (book_id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX idx_similarity_similar_book ON book_similarity (similar_book_id); --konyv torleshez
+
+--a legutobbi frissitesbe mar beszamolt utolso loan_id (inkrementalis frissiteshez)
+CREATE TABLE book_similarity_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id), --egyetlen sor
+    last_loan_id INT NOT NULL,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+--olvasonkenti kolcsonzesek (hasonlosag frissites, felhasznalo kolcsonzesei)
+CREATE INDEX idx_loan_user ON Loan (user_id, item_id);
+
+--Napi kolcsonzes szamlalok konyvenkent es konyvtarankent (GET /api/books/popular):
+--a Loan trigger a kolcsonzes tranzakciojaban noveli, a toplista par szamlalo sor
+--osszege a teljes Loan GROUP BY helyett; nap = a kolcsonzes UTC datuma
+CREATE TABLE book_loan_daily (
+    day DATE NOT NULL,
+    book_id INT NOT NULL,
+    library_id INT NOT NULL,
+    loans INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (day, book_id, library_id), --idoablak: day tartomany
+    CONSTRAINT fk_loan_daily_book
+        FOREIGN KEY (book_id)
+        REFERENCES Book (book_id)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_loan_daily_library
+        FOREIGN KEY (library_id)
+        REFERENCES Library (library_id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX idx_loan_daily_book ON book_loan_daily (book_id); --konyv torleshez
+
+--utasitasonkent egyszer, (nap, konyv, konyvtar) szerint osszesitve
+CREATE OR REPLACE FUNCTION book_loan_daily_stmt_trg()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO book_loan_daily (day, book_id, library_id, loans)
+        SELECT (l.loan_date AT TIME ZONE 'UTC')::date, i.book_id, i.library_id, COUNT(*)
+        FROM new_loans l
+        JOIN Item i ON i.item_id = l.item_id
+        GROUP BY 1, 2, 3
+        ON CONFLICT (day, book_id, library_id) DO UPDATE
+        SET loans = book_loan_daily.loans + EXCLUDED.loans;
+    ELSE
+        UPDATE book_loan_daily d
+        SET loans = d.loans - o.loans
+        FROM (
+            SELECT (l.loan_date AT TIME ZONE 'UTC')::date AS day, i.book_id, i.library_id,
+                   COUNT(*) AS loans
+            FROM old_loans l
+            JOIN Item i ON i.item_id = l.item_id
+            GROUP BY 1, 2, 3
+        ) o
+        WHERE d.day = o.day
+          AND d.book_id = o.book_id
+          AND d.library_id = o.library_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_loan_daily_insert
+AFTER INSERT ON Loan
+REFERENCING NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION book_loan_daily_stmt_trg();
+
+CREATE TRIGGER trg_loan_daily_delete
+AFTER DELETE ON Loan
+REFERENCING OLD TABLE AS old_loans
+FOR EACH STATEMENT EXECUTE FUNCTION book_loan_daily_stmt_trg();
+
+--meglevo adatbazisnal a kezdo ertekek
+INSERT INTO book_loan_daily (day, book_id, library_id, loans)
+SELECT (l.loan_date AT TIME ZONE 'UTC')::date, i.book_id, i.library_id, COUNT(*)
+FROM Loan l
+JOIN Item i ON i.item_id = l.item_id
+GROUP BY 1, 2, 3
+ON CONFLICT (day, book_id, library_id) DO NOTHING;